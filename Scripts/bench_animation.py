@@ -0,0 +1,107 @@
+"""
+Benchmark for the animated meme pipeline.
+
+Captions a generated animation twice, each in a fresh process: once the naive
+way (every frame decoded into a list, captioned one by one and saved by
+Pillow, which picks a palette per frame) and once through
+bot.features.memes.animation. Reports time, peak RSS and output size of each.
+
+Usage:
+    python Scripts/bench_animation.py
+    python Scripts/bench_animation.py --frames 240 --width 640 --height 480 --effect grayscale
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+from PIL import Image, ImageDraw, ImageSequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+CAPTION = "me watching the loading bar"
+
+def render(path, mode, effect):
+    """Caption the animation, then print time, peak RSS and size as JSON"""
+    from bot.features.memes.render_engine import build_render_job
+    from bot.features.memes.animation import render_animated_job
+    from bot.features.memes.effects import apply_effect
+    from bot.utils.text_utils import draw_caption
+
+    start = time.perf_counter()
+    if mode == 'naive':
+        with Image.open(path) as im:
+            frames = [frame.convert('RGB') for frame in ImageSequence.Iterator(im)]
+        for index, frame in enumerate(frames):
+            if effect:
+                frame = apply_effect(frame, effect, 0.7).convert('RGB')
+            frames[index] = draw_caption(frame, CAPTION, position='top')
+        buffer = io.BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True, append_images=frames[1:], duration=40, loop=0)
+        size = buffer.tell()
+    else:
+        job = build_render_job(path, top_text=CAPTION, effect=effect, intensity=0.7)
+        size = render_animated_job(job)['bytes']
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'seconds': elapsed, 'peak_mb': peak_kb / 1024, 'bytes': size}))
+
+def make_animation(path, frames, width, height):
+    """A ball bouncing over a static photo-like background, held still for a while at the end"""
+    background = Image.radial_gradient('L').convert('RGB').resize((width, height))
+    held = frames // 4
+    images = []
+    for i in range(frames - held):
+        frame = background.copy()
+        x = (i * 12) % max(1, width - 60)
+        ImageDraw.Draw(frame).ellipse((x, height // 2 - 30, x + 60, height // 2 + 30), fill=(230, 40, 40))
+        images.append(frame)
+    images += [images[-1]] * held
+    images[0].save(path, save_all=True, append_images=images[1:], duration=40, loop=0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the animated meme pipeline")
+    parser.add_argument('--frames', type=int, default=120)
+    parser.add_argument('--width', type=int, default=480)
+    parser.add_argument('--height', type=int, default=360)
+    parser.add_argument('--effect', default=None)
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    parser.add_argument('--make', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        path, mode, effect = args.child
+        render(path, mode, effect if effect != '-' else None)
+        return
+    if args.make:
+        make_animation(args.make, args.frames, args.width, args.height)
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Built in its own process too: Linux carries peak RSS across exec,
+        # so children would otherwise report this process's peak
+        path = os.path.join(temp_dir, 'bench.gif')
+        subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--make', path, '--frames', str(args.frames),
+             '--width', str(args.width), '--height', str(args.height)],
+            cwd=ROOT, check=True
+        )
+        print(f"Source: {args.frames} frames {args.width}x{args.height}, {os.path.getsize(path) // 1024} KB")
+
+        for mode in ('naive', 'pipeline'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', path, mode, args.effect or '-'],
+                capture_output=True, text=True, cwd=ROOT, check=True
+            ).stdout.strip().splitlines()[-1]
+            stats = json.loads(output)
+            print(f"{mode:9} {stats['seconds'] * 1000:7.0f} ms  peak RSS {stats['peak_mb']:7.1f} MB"
+                  f"  output {stats['bytes'] // 1024} KB")
+
+if __name__ == "__main__":
+    main()
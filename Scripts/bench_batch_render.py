@@ -0,0 +1,57 @@
+"""
+Benchmark for batch caption rendering.
+
+Renders N captions on one template as N single jobs and as one batch job
+(in-process, so the template and layout caches are warm for both) and
+reports the time per meme.
+
+Usage:
+    python Scripts/bench_batch_render.py
+    python Scripts/bench_batch_render.py --template templates/drake.jpg --count 40 --effects deep_fry:0.5
+"""
+
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from bot.features.memes.render_engine import (
+    build_render_job, render_job, build_batch_job, render_batch_job
+)
+from bot.features.memes.effect_chain import parse_effect_chain
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch caption rendering")
+    parser.add_argument('--template', default=os.path.join(ROOT, 'templates', 'change_my_mind.jpg'))
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--effects', default=None, help="Effect chain, e.g. 'deep_fry:0.5+grayscale'")
+    args = parser.parse_args()
+
+    effects = parse_effect_chain(args.effects) if args.effects else None
+    captions = [{'top_text': f'when the build fails {i}', 'bottom_text': f'for the {i}th time today'}
+                for i in range(args.count)]
+
+    # Warm the template, font and layout caches for every path
+    render_job(build_render_job(args.template, effects=effects, **captions[0]))
+    job = build_batch_job(args.template, captions, effects=effects)
+    render_batch_job(job)
+
+    start = time.perf_counter()
+    for caption in captions:
+        render_job(build_render_job(args.template, effects=effects, **caption))
+    single = (time.perf_counter() - start) / args.count
+
+    start = time.perf_counter()
+    render_batch_job(job)
+    batch = (time.perf_counter() - start) / args.count
+
+    print(f"{args.count} captions on {os.path.basename(args.template)}"
+          f"{' with ' + args.effects if args.effects else ''}")
+    print(f"single jobs      {single * 1000:6.1f} ms/meme")
+    print(f"batch job        {batch * 1000:6.1f} ms/meme")
+
+if __name__ == "__main__":
+    main()
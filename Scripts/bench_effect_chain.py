@@ -0,0 +1,70 @@
+"""
+Microbenchmark for fused effect chains.
+
+Runs each effect chain one whole effect at a time (the old way) and through
+the stage planner in bot.features.memes.effect_chain, then reports the
+full-frame passes, time per render and the pixel difference between the two.
+
+Usage:
+    python Scripts/bench_effect_chain.py
+    python Scripts/bench_effect_chain.py --image templates/drake.jpg --size 1200 --rounds 5
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.features.memes.effect_chain import (
+    parse_effect_chain, plan_chain, count_passes, apply_effect_chain, apply_effect_chain_sequential
+)
+
+CHAINS = [
+    'grayscale+invert',
+    'sepia:1+invert',
+    'invert+grayscale+sepia:0.3',
+    'vaporwave:0.8',
+    'vaporwave+grayscale',
+    'deep_fry:0.3+vaporwave',
+    'deep_fry:0.8+sepia:0.3',
+]
+
+def timed(func, img, chain, rounds):
+    """Run a chain several times and return (last result, ms per run)"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = func(img, chain)
+    return result, (time.perf_counter() - start) * 1000 / rounds
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fused effect chains")
+    parser.add_argument('--image', default=None, help="Source image (default: a synthetic gradient)")
+    parser.add_argument('--size', type=int, default=1200, help="Square size the image is resized to")
+    parser.add_argument('--rounds', type=int, default=3, help="Renders per chain and path")
+    args = parser.parse_args()
+
+    if args.image:
+        img = Image.open(args.image).convert('RGB').resize((args.size, args.size))
+    else:
+        ramp = np.linspace(0, 255, args.size, dtype=np.float32)
+        data = np.stack(np.broadcast_arrays(ramp[None, :], ramp[:, None], ramp[::-1][None, :]), axis=-1)
+        img = Image.fromarray(data.astype(np.uint8))
+
+    print(f"Image: {args.image or 'gradient'} {img.size[0]}x{img.size[1]} | {args.rounds} rounds")
+    print(f"{'chain':30}{'passes':>10}{'seq ms':>10}{'fused ms':>10}{'mean diff':>11}{'max diff':>10}")
+    for spec in CHAINS:
+        chain = parse_effect_chain(spec)
+        sequential_passes, fused_passes = count_passes(plan_chain(chain))
+        old, old_ms = timed(apply_effect_chain_sequential, img, chain, args.rounds)
+        new, new_ms = timed(apply_effect_chain, img, chain, args.rounds)
+        diff = np.abs(np.asarray(old, dtype=np.int16) - np.asarray(new, dtype=np.int16))
+        print(f"{spec:30}{f'{sequential_passes}->{fused_passes}':>10}{old_ms:>10.1f}{new_ms:>10.1f}"
+              f"{diff.mean():>11.3f}{diff.max():>10}")
+    print("Chains with noise differ by their random draws, not by the planner.")
+
+if __name__ == "__main__":
+    main()
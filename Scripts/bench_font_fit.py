@@ -0,0 +1,109 @@
+"""
+Microbenchmark for caption font fitting.
+
+Compares the old linear best-fit search (a fresh font load and scratch canvas
+at every size step) with the font registry and binary search in
+bot.utils.font_utils. Checks that both pick the same size for every case, and
+reports font loads, text measurements and time per call.
+
+Usage:
+    python Scripts/bench_font_fit.py
+    python Scripts/bench_font_fit.py --font path/to/font.ttf --rounds 20
+"""
+
+import os
+import sys
+import time
+import argparse
+from unittest.mock import patch
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.utils import font_utils
+
+CAPTIONS = [
+    "me when",
+    "when the code compiles on the first try",
+    "nobody:\nabsolutely nobody:\nme at 3am",
+    "ONE DOES NOT SIMPLY WALK INTO MORDOR",
+    "x",
+]
+
+BOXES = [(580, 120), (300, 80), (1200, 300), (150, 60)]
+
+def legacy_best_fit_font(text, font_path, max_width, max_height, start_size=48, min_size=10):
+    """The linear search get_best_fit_font used before the font registry"""
+    def load_font(size):
+        if not font_path:
+            return ImageFont.load_default(size=size)
+        return ImageFont.truetype(font_path, size)
+
+    size = start_size
+    while size >= min_size:
+        font = load_font(size)
+        img = Image.new('RGB', (1, 1))
+        draw = ImageDraw.Draw(img)
+        widths, heights = [], []
+        for line in text.split('\n'):
+            if not line:
+                heights.append(size)
+                widths.append(0)
+                continue
+            bbox = draw.textbbox((0, 0), line, font=font)
+            widths.append(bbox[2] - bbox[0])
+            heights.append(bbox[3] - bbox[1])
+        if max(widths) <= max_width and sum(heights) <= max_height:
+            return font
+        size -= 2
+    return load_font(min_size)
+
+class Counter:
+    """Counts calls to the font loading and measuring entry points"""
+
+    def __init__(self):
+        self.loads = 0
+        self.measures = 0
+
+    def wrap(self, func, kind):
+        def wrapper(*args, **kwargs):
+            setattr(self, kind, getattr(self, kind) + 1)
+            return func(*args, **kwargs)
+        return wrapper
+
+def run(fit, font_path, rounds):
+    """Run every caption/box case and return (sizes, loads, measures, seconds)"""
+    counter = Counter()
+    sizes = []
+    with patch.object(ImageFont, 'truetype', counter.wrap(ImageFont.truetype, 'loads')), \
+         patch.object(ImageFont, 'load_default', counter.wrap(ImageFont.load_default, 'loads')), \
+         patch.object(ImageFont.FreeTypeFont, 'getbbox', counter.wrap(ImageFont.FreeTypeFont.getbbox, 'measures')):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in CAPTIONS:
+                for w, h in BOXES:
+                    sizes.append(fit(text, font_path, w, h).size)
+        elapsed = time.perf_counter() - start
+    return sizes, counter.loads, counter.measures, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark caption font fitting")
+    parser.add_argument('--font', default=None, help="Font file (default: Pillow's bundled font)")
+    parser.add_argument('--rounds', type=int, default=10, help="Repetitions of the case list")
+    args = parser.parse_args()
+
+    # Resolve the same file for both searches
+    font_path = args.font or font_utils.font_registry._find_file(font_utils.DEFAULT_FACE)
+    calls = args.rounds * len(CAPTIONS) * len(BOXES)
+
+    old_sizes, old_loads, old_measures, old_time = run(legacy_best_fit_font, font_path, args.rounds)
+    new_sizes, new_loads, new_measures, new_time = run(font_utils.get_best_fit_font, font_path, args.rounds)
+
+    print(f"Font: {font_path or 'Pillow default'} | {calls} fits")
+    print(f"{'':10}{'loads':>10}{'measures':>10}{'ms/fit':>10}")
+    print(f"{'linear':10}{old_loads:>10}{old_measures:>10}{old_time * 1000 / calls:>10.3f}")
+    print(f"{'registry':10}{new_loads:>10}{new_measures:>10}{new_time * 1000 / calls:>10.3f}")
+    print(f"Same sizes chosen: {old_sizes == new_sizes}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark for reduced-resolution template decoding.
+
+Renders a captioned meme from a large generated photo twice, each in a fresh
+process: once decoding the template at full size (the old path) and once
+through bot.utils.image_loader. Reports time and peak RSS of each.
+
+Usage:
+    python Scripts/bench_image_decode.py
+    python Scripts/bench_image_decode.py --width 6000 --height 4000 --format png
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+def render(path, mode):
+    """Decode and caption the image, then print time and peak RSS as JSON"""
+    from bot.utils.image_loader import load_image
+    from bot.utils.text_utils import draw_caption
+    from bot.utils.optimize import encode_image
+
+    start = time.perf_counter()
+    if mode == 'full':
+        with Image.open(path) as src:
+            img = src.convert('RGB')
+    else:
+        img = load_image(path, max_bytes=None)
+    img = draw_caption(img, "when the phone camera has 200 megapixels", position='top')
+    result = encode_image(img, report_savings=False)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'seconds': elapsed, 'peak_mb': peak_kb / 1024, 'size': img.size, 'bytes': result['bytes']}))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reduced-resolution decoding")
+    parser.add_argument('--width', type=int, default=6000)
+    parser.add_argument('--height', type=int, default=4000)
+    parser.add_argument('--format', default='jpeg', choices=['jpeg', 'png'])
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        render(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, f"big.{'jpg' if args.format == 'jpeg' else 'png'}")
+        rng = np.random.default_rng(0)
+        small = Image.fromarray(rng.integers(0, 255, (args.height // 10, args.width // 10, 3), dtype=np.uint8))
+        small.resize((args.width, args.height), Image.Resampling.BICUBIC).save(path)
+        print(f"Source: {args.width}x{args.height} {args.format}, {os.path.getsize(path) // 1024} KB")
+
+        for mode in ('full', 'reduced'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', path, mode],
+                capture_output=True, text=True, cwd=ROOT, check=True
+            ).stdout.strip().splitlines()[-1]
+            stats = json.loads(output)
+            print(f"{mode:8} {stats['size'][0]}x{stats['size'][1]}  {stats['seconds'] * 1000:7.0f} ms"
+                  f"  peak RSS {stats['peak_mb']:7.1f} MB  output {stats['bytes'] // 1024} KB")
+
+if __name__ == "__main__":
+    main()
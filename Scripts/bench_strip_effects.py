@@ -0,0 +1,108 @@
+"""
+Benchmark for strip-based effects.
+
+Runs noise, sepia and glitch on a large generated image, each in a fresh
+process, once with the old whole-frame NumPy code (float64 temporaries the
+size of the image) and once with the strip implementations in the bot.
+Reports time and the peak memory the effect added on top of the input image.
+
+Usage:
+    python Scripts/bench_strip_effects.py
+    python Scripts/bench_strip_effects.py --width 4000 --height 3000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import subprocess
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+EFFECTS = ('noise', 'sepia', 'glitch')
+
+def whole_noise(img):
+    """add_noise before strips: float64 image plus float64 noise"""
+    data = np.array(img).astype(np.float64)
+    data = data + np.random.default_rng(1).normal(0, 25.5, data.shape)
+    return Image.fromarray(np.clip(data, 0, 255).astype(np.uint8))
+
+def whole_sepia(img):
+    """meme_effects.sepia before strips: three float64 planes plus a stack"""
+    data = np.array(img)
+    r, g, b = data[:, :, 0], data[:, :, 1], data[:, :, 2]
+    tr = np.clip(0.393 * r + 0.769 * g + 0.189 * b, 0, 255)
+    tg = np.clip(0.349 * r + 0.686 * g + 0.168 * b, 0, 255)
+    tb = np.clip(0.272 * r + 0.534 * g + 0.131 * b, 0, 255)
+    return Image.fromarray(np.stack([tr, tg, tb], axis=2).astype('uint8'))
+
+def whole_glitch(img):
+    """meme_effects.glitch before strips: full copies plus a roll per channel"""
+    rng = random.Random(1)
+    width, height = img.size
+    data = np.array(img)
+    shifts = [rng.randint(-20, 20) for _ in range(3)]
+    for _ in range(rng.randint(5, 15)):
+        y_pos, h_slice, x_shift = rng.randint(0, height - 10), rng.randint(5, 20), rng.randint(-15, 15)
+        if y_pos + h_slice < height:
+            slice_data = data[y_pos:y_pos + h_slice, :].copy()
+            if x_shift > 0:
+                data[y_pos:y_pos + h_slice, x_shift:] = slice_data[:, :-x_shift]
+            elif x_shift < 0:
+                data[y_pos:y_pos + h_slice, :x_shift] = slice_data[:, -x_shift:]
+    channels = [np.roll(data[:, :, c], s, axis=1) if s > 0 else data[:, :, c] for c, s in enumerate(shifts)]
+    return Image.merge('RGB', [Image.fromarray(c) for c in channels])
+
+def run(effect, mode, width, height):
+    """Apply one effect, then print time and added peak RSS as JSON"""
+    from bot.features.memes.effects import add_noise
+    from bot.utils import meme_effects
+
+    strip = {
+        'noise': lambda img: add_noise(img, 0.1, np.random.default_rng(1)),
+        'sepia': meme_effects.sepia,
+        'glitch': lambda img: meme_effects.glitch(img, 1),
+    }
+    whole = {'noise': whole_noise, 'sepia': whole_sepia, 'glitch': whole_glitch}
+    fn = (strip if mode == 'strips' else whole)[effect]
+
+    gradient = Image.radial_gradient('L').resize((width, height))
+    img = Image.merge('RGB', (gradient, gradient.transpose(Image.FLIP_TOP_BOTTOM), gradient.rotate(90)))
+    del gradient
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    fn(img)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'seconds': elapsed, 'added_mb': (peak - before) / 1024}))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark strip-based effects")
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run(*args.child, args.width, args.height)
+        return
+
+    print(f"{args.width}x{args.height} RGB ({args.width * args.height * 3 / 1024 / 1024:.1f} MB as uint8)")
+    for effect in EFFECTS:
+        for mode in ('whole', 'strips'):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--child', effect, mode,
+                 '--width', str(args.width), '--height', str(args.height)],
+                capture_output=True, text=True, cwd=ROOT, check=True
+            ).stdout.strip().splitlines()[-1]
+            stats = json.loads(output)
+            print(f"{effect:7} {mode:7} {stats['seconds'] * 1000:7.0f} ms  +{stats['added_mb']:7.1f} MB peak")
+
+if __name__ == "__main__":
+    main()
@@ -85,3 +85,92 @@ MONGO_URI = os.environ.get('MONGO_URI', 'mongodb://localhost:27017')
 MONGO_DB_NAME = os.environ.get('MONGO_DB_NAME', 'discord_meme_bot')
 # Enable/disable MongoDB (use SQLite for everything if False)
 USE_MONGO_FOR_AI = os.environ.get('USE_MONGO_FOR_AI', 'True').lower() in ('true', '1', 't')
+
+# Meme render engine (worker processes for Pillow/NumPy work)
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', max(1, min(4, (os.cpu_count() or 2) - 1))))
+RENDER_TIMEOUT = float(os.environ.get('RENDER_TIMEOUT', '30'))
+RENDER_MAX_PENDING = int(os.environ.get('RENDER_MAX_PENDING', '32'))
+
+# Image decoding limits (larger images are rejected, not decoded)
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 50_000_000))
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', 25 * 1024 * 1024))
+# Longest side images are decoded at for rendering
+RENDER_MAX_DIMENSION = int(os.environ.get('RENDER_MAX_DIMENSION', '1600'))
+
+# Scratch memory per strip for effects that run in horizontal strips
+EFFECT_STRIP_BYTES = int(os.environ.get('EFFECT_STRIP_BYTES', 1024 * 1024))
+
+# Animated templates (GIF/WebP/APNG) are rendered frame by frame in chunks
+ANIMATION_MAX_DIMENSION = int(os.environ.get('ANIMATION_MAX_DIMENSION', '480'))
+ANIMATION_MAX_FRAMES = int(os.environ.get('ANIMATION_MAX_FRAMES', '300'))
+ANIMATION_CHUNK_FRAMES = int(os.environ.get('ANIMATION_CHUNK_FRAMES', '16'))
+ANIMATION_THREADS = int(os.environ.get('ANIMATION_THREADS', '2'))
+# Byte budget for an animated meme (Discord's smallest upload limit is 10 MB)
+ANIMATION_MAX_BYTES = int(os.environ.get('ANIMATION_MAX_BYTES', 8 * 1024 * 1024))
+
+# Video captions (ffmpeg decode -> caption -> encode, all through pipes)
+VIDEO_MAX_SECONDS = float(os.environ.get('VIDEO_MAX_SECONDS', '30'))
+VIDEO_MAX_DIMENSION = int(os.environ.get('VIDEO_MAX_DIMENSION', '720'))
+VIDEO_MAX_FPS = int(os.environ.get('VIDEO_MAX_FPS', '30'))
+VIDEO_MAX_BYTES = int(os.environ.get('VIDEO_MAX_BYTES', 8 * 1024 * 1024))
+VIDEO_TIMEOUT = float(os.environ.get('VIDEO_TIMEOUT', '120'))
+# Threads each ffmpeg process may use
+VIDEO_FFMPEG_THREADS = int(os.environ.get('VIDEO_FFMPEG_THREADS', '2'))
+# Hosts videos may be fetched from (Reddit video and Discord attachments)
+VIDEO_SOURCE_HOSTS = [h.strip() for h in os.environ.get(
+    'VIDEO_SOURCE_HOSTS', 'v.redd.it,cdn.discordapp.com,media.discordapp.net'
+).split(',') if h.strip()]
+
+# Decoded template cache (per render worker)
+TEMPLATE_CACHE_MAX_BYTES = int(os.environ.get('TEMPLATE_CACHE_MAX_BYTES', 128 * 1024 * 1024))
+TEMPLATE_CACHE_PREWARM = int(os.environ.get('TEMPLATE_CACHE_PREWARM', '8'))
+
+# Longest side uploaded templates are stored at
+TEMPLATE_MAX_DIMENSION = int(os.environ.get('TEMPLATE_MAX_DIMENSION', '2048'))
+
+# Templates per page of the template_browse contact sheet (9 to 16)
+TEMPLATE_SHEET_SIZE = max(9, min(16, int(os.environ.get('TEMPLATE_SHEET_SIZE', '12'))))
+
+# Pre-rendered watermark and sticker layers (per render worker)
+LAYER_CACHE_MAX_BYTES = int(os.environ.get('LAYER_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# Watermark drawn on every rendered meme (off when empty)
+WATERMARK_TEXT = os.environ.get('WATERMARK_TEXT', '')
+WATERMARK_POSITION = os.environ.get('WATERMARK_POSITION', 'bottom_right')
+WATERMARK_OPACITY = int(os.environ.get('WATERMARK_OPACITY', '128'))
+WATERMARK_FONT_SIZE = int(os.environ.get('WATERMARK_FONT_SIZE', '24'))
+
+# Images whose perceptual hashes differ in at most this many of 64 bits are
+# treated as the same image (duplicate templates, Reddit reposts)
+IMAGE_DUPLICATE_DISTANCE = int(os.environ.get('IMAGE_DUPLICATE_DISTANCE', '6'))
+
+# Byte budget for an encoded meme (also capped by the guild's upload limit)
+OUTPUT_MAX_BYTES = int(os.environ.get('OUTPUT_MAX_BYTES', 2 * 1024 * 1024))
+
+# Measure each render against the old JPEG q95 output for the bytes-saved stat
+# (off by default: it costs an extra full-size encode per render)
+REPORT_ENCODE_SAVINGS = os.environ.get('REPORT_ENCODE_SAVINGS', 'False').lower() in ('true', '1', 't')
+
+# Rendered meme cache (encoded bytes plus per-guild attachment URLs)
+RENDER_CACHE_MAX_BYTES = int(os.environ.get('RENDER_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+RENDER_CACHE_TTL = float(os.environ.get('RENDER_CACHE_TTL', 6 * 60 * 60))
+
+# Keep a copy of every rendered meme in SAVED_MEMES_DIR (written in the background after sending)
+SAVE_RENDERED_MEMES = os.environ.get('SAVE_RENDERED_MEMES', 'True').lower() in ('true', '1', 't')
+
+# Reddit client (one pooled aiohttp session for every Reddit request)
+REDDIT_TIMEOUT = float(os.environ.get('REDDIT_TIMEOUT', '10'))
+REDDIT_MAX_CONNECTIONS = int(os.environ.get('REDDIT_MAX_CONNECTIONS', '8'))
+
+# Autopost polling (seconds). Each subreddit starts at AUTOPOST_INTERVAL and
+# moves between the bounds with how fast it gets new posts.
+AUTOPOST_INTERVAL = int(os.environ.get('AUTOPOST_INTERVAL', '300'))
+AUTOPOST_MIN_INTERVAL = int(os.environ.get('AUTOPOST_MIN_INTERVAL', '60'))
+AUTOPOST_MAX_INTERVAL = int(os.environ.get('AUTOPOST_MAX_INTERVAL', '3600'))
+
+# Seen Reddit posts per autopost subscription: the newest SEEN_POSTS_CAPACITY
+# are kept exactly; SEEN_POSTS_BLOOM_BITS > 0 adds a Bloom filter for older
+# ones. Rows older than SEEN_POSTS_RETENTION_DAYS are deleted.
+SEEN_POSTS_CAPACITY = int(os.environ.get('SEEN_POSTS_CAPACITY', '1000'))
+SEEN_POSTS_BLOOM_BITS = int(os.environ.get('SEEN_POSTS_BLOOM_BITS', '0'))
+SEEN_POSTS_RETENTION_DAYS = int(os.environ.get('SEEN_POSTS_RETENTION_DAYS', '30'))
@@ -21,10 +21,21 @@ def init_db():
         creator_name TEXT,
         width INTEGER,
         height INTEGER,
+        usage_count INTEGER DEFAULT 0,
+        content_hash TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     ''')
     
+    # Add columns introduced after the first release
+    _add_missing_columns(c, 'templates', {
+        'usage_count': 'INTEGER DEFAULT 0',
+        'content_hash': 'TEXT'
+    })
+    
+    # Template files are shared by every row with the same content
+    c.execute("CREATE INDEX IF NOT EXISTS idx_templates_file_path ON templates (file_path)")
+    
     c.execute('''
     CREATE TABLE IF NOT EXISTS memes (
         id INTEGER PRIMARY KEY,
@@ -51,6 +62,15 @@ def init_db():
     
     logging.info("Database initialized")
 
+def _add_missing_columns(c, table, columns):
+    """Add any of the given columns that an older database is missing"""
+    c.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in c.fetchall()}
+    for name, definition in columns.items():
+        if name not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            logging.info(f"Added column {table}.{name}")
+
 def add_default_templates():
     """Add default templates to the database if they don't exist"""
     conn = sqlite3.connect(DB_PATH)
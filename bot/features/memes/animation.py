@@ -0,0 +1,321 @@
+"""
+Animated Meme Rendering
+
+This module captions and applies effects to animated templates (GIF, WebP,
+APNG). Frames stream from the decoder to a GIF writer in chunks that are
+processed in parallel, so memory is bounded by the chunk size rather than the
+length of the animation:
+
+- the caption layer is drawn once and pasted onto every frame
+- frames identical to the previous one are merged into its duration
+- with pointwise effects, only the region that changed is processed
+- every frame is mapped onto one shared palette instead of its own
+"""
+
+import io
+import os
+import math
+import logging
+import concurrent.futures
+from typing import Dict, Any, List, Optional, Tuple, Callable, Iterator
+import numpy as np
+from PIL import Image, ImageChops
+from bot.core.config import (
+    ANIMATION_MAX_DIMENSION, ANIMATION_MAX_FRAMES, ANIMATION_CHUNK_FRAMES,
+    ANIMATION_THREADS, ANIMATION_MAX_BYTES
+)
+from bot.features.memes.effect_chain import (
+    EFFECT_STAGES, apply_effect_chain, chain_means, is_pointwise
+)
+from bot.utils.gif_meme import GifWriter, build_palette, quantize
+from bot.utils.image_loader import is_animated, iter_frames
+from bot.utils.text_utils import draw_caption
+from bot.utils.compositing import layer_pieces
+
+# Extensions worth checking for more than one frame
+ANIMATED_EXTENSIONS = ('.gif', '.webp', '.png', '.apng')
+
+# Frames (spread over the animation) used to build the shared palette
+PALETTE_SAMPLES = 8
+
+# Smallest scale tried when an animation is over its byte budget
+MIN_SCALE = 0.25
+
+Box = Tuple[int, int, int, int]
+
+class AnimationTooLargeError(ValueError):
+    """Raised when an animation cannot fit its byte budget"""
+    pass
+
+class _OverBudget(Exception):
+    """Raised by the writer loop once the output passes the byte budget"""
+
+    def __init__(self, frames_done: int, bytes_written: int):
+        super().__init__(f"Over budget after {frames_done} frames")
+        self.frames_done = frames_done
+        self.bytes_written = bytes_written
+
+def is_animated_template(file_path: str) -> bool:
+    """
+    Check whether a template has more than one frame
+
+    Args:
+        file_path: Path to the template image
+
+    Returns:
+        True for animated GIF/WebP/APNG templates
+    """
+    if os.path.splitext(file_path)[1].lower() not in ANIMATED_EXTENSIONS:
+        return False
+    try:
+        return is_animated(file_path)
+    except OSError:
+        return False
+
+def job_chain(job: Dict[str, Any]) -> List[Tuple[str, float]]:
+    """
+    Get the effect chain of a job spec (a single effect becomes a one-step chain)
+
+    Raises:
+        ValueError: If an effect is unknown
+    """
+    if job.get('effects'):
+        chain = list(job['effects'])
+    elif job.get('effect'):
+        chain = [(job['effect'], job.get('intensity', 1.0))]
+    else:
+        return []
+    for name, _ in chain:
+        if name not in EFFECT_STAGES:
+            raise ValueError(f"Effect '{name}' not found or could not be applied.")
+    return chain
+
+def _intersect(a: Box, b: Box) -> Optional[Box]:
+    """Intersection of two boxes, or None if they do not overlap"""
+    box = (max(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), min(a[3], b[3]))
+    return box if box[0] < box[2] and box[1] < box[3] else None
+
+def _chunks(frames: Iterator, size: int) -> Iterator[List]:
+    """Group an iterator into lists of at most size items"""
+    chunk = []
+    for item in frames:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def caption_pieces(job: Dict[str, Any], background: Image.Image) -> List[Tuple[Image.Image, Box]]:
+    """
+    Draw a job's captions once, each on its own transparent layer, followed
+    by its watermark and sticker layers
+
+    Args:
+        job: Job spec with top_text, bottom_text, caption styling and layers
+        background: Frame the auto-contrast colors are picked from
+
+    Returns:
+        List of (RGBA caption or layer cropped to what was drawn, its box in the frame)
+    """
+    pieces = []
+    for position in ('top', 'bottom'):
+        text = job.get(f'{position}_text')
+        if not text:
+            continue
+        layer = Image.new('RGBA', background.size, (0, 0, 0, 0))
+        draw_caption(
+            layer,
+            text,
+            position=position,
+            font_size=job.get('font_size'),
+            font_color=job.get('font_color'),
+            outline_color=job.get('outline_color'),
+            background=background
+        )
+        box = layer.getbbox()
+        if box is not None:
+            pieces.append((layer.crop(box), box))
+    return pieces + layer_pieces(job.get('layers'), background.size)
+
+class FrameProcessor:
+    """Applies a job's effects and caption layer to frames or frame regions"""
+
+    def __init__(self, job: Dict[str, Any], reference: Image.Image):
+        """
+        Prepare the per-animation state from the first frame
+
+        Args:
+            job: Job spec from build_render_job
+            reference: First frame, at render size
+        """
+        self.chain = job_chain(job)
+        self.seed = job.get('seed')
+        self.pointwise = is_pointwise(self.chain) if self.chain else True
+        # Contrast uses the first frame's gray level on every frame, so it
+        # neither flickers nor depends on which region is being processed
+        self.means = chain_means(reference, self.chain, self._rng(0)) if self.chain else None
+        styled = apply_effect_chain(reference, self.chain, self._rng(0), self.means) if self.chain else reference
+        self.captions = caption_pieces(job, styled)
+
+    def _rng(self, index: int) -> np.random.Generator:
+        """Random generator for one frame, repeatable for seeded jobs"""
+        if self.seed is None:
+            return np.random.default_rng()
+        return np.random.default_rng([self.seed, index])
+
+    def process(self, frame: Image.Image, index: int, box: Optional[Box] = None) -> Image.Image:
+        """
+        Render one frame, or one region of it
+
+        Args:
+            frame: Source frame (RGB, render size)
+            index: Frame number (seeds random effects)
+            box: Region to render (default: the whole frame)
+
+        Returns:
+            The rendered frame or region
+        """
+        if box is None:
+            box = (0, 0) + frame.size
+            patch = frame.copy()
+        else:
+            patch = frame.crop(box)
+        if self.chain:
+            patch = apply_effect_chain(patch, self.chain, self._rng(index), self.means)
+
+        for caption, caption_box in self.captions:
+            overlap = _intersect(box, caption_box)
+            if overlap:
+                x, y = caption_box[:2]
+                piece = caption.crop((overlap[0] - x, overlap[1] - y, overlap[2] - x, overlap[3] - y))
+                patch.paste(piece, (overlap[0] - box[0], overlap[1] - box[1]), piece)
+        return patch
+
+def _sample_frames(file_path: str, max_size: Tuple[int, int], count: int) -> List[Image.Image]:
+    """Pick up to count frames spread evenly over the animation"""
+    with Image.open(file_path) as im:
+        total = getattr(im, 'n_frames', 1)
+    step = max(1, math.ceil(total / count))
+    return [frame for frame, _ in iter_frames(file_path, max_size, ANIMATION_MAX_FRAMES, step=step)]
+
+def _render_gif(job: Dict[str, Any], max_size: Tuple[int, int], max_bytes: int,
+                check: Optional[Callable[[], None]]) -> Dict[str, Any]:
+    """Render an animated template at one size (raises _OverBudget past max_bytes)"""
+    path = job['template_path']
+    samples = _sample_frames(path, max_size, PALETTE_SAMPLES)
+    processor = FrameProcessor(job, samples[0])
+    palette = build_palette([processor.process(sample, 0) for sample in samples])
+    del samples
+
+    def render(task):
+        frame, index, box, _ = task
+        if frame is None:
+            return None
+        return quantize(processor.process(frame, index, box), palette)
+
+    buffer = io.BytesIO()
+    writer = GifWriter(buffer)
+    previous_source = None
+    previous_output = None
+    stats = {'frames': 0, 'identical': 0, 'partial': 0}
+    frames = enumerate(iter_frames(path, max_size, ANIMATION_MAX_FRAMES))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, ANIMATION_THREADS)) as executor:
+        for chunk in _chunks(frames, max(1, ANIMATION_CHUNK_FRAMES)):
+            if check:
+                check()
+
+            # Work out what each frame needs before rendering the chunk in parallel
+            tasks = []
+            for index, (frame, duration) in chunk:
+                box = None
+                if previous_source is not None:
+                    box = ImageChops.difference(previous_source, frame).getbbox()
+                    if box is None:
+                        # Nothing changed: the writer merges it into the previous frame
+                        tasks.append((None, index, None, duration))
+                        stats['identical'] += 1
+                        continue
+                    if not processor.pointwise or box == (0, 0) + frame.size:
+                        box = None
+                tasks.append((frame, index, box, duration))
+                previous_source = frame
+            del chunk
+
+            for (_, _, box, duration), patch in zip(tasks, executor.map(render, tasks)):
+                if patch is None:
+                    output = previous_output
+                elif box is None:
+                    output = patch
+                else:
+                    output = previous_output.copy()
+                    output.paste(patch, box[:2])
+                    stats['partial'] += 1
+                writer.add_frame(output, duration)
+                previous_output = output
+                stats['frames'] += 1
+                if buffer.tell() > max_bytes:
+                    raise _OverBudget(stats['frames'], buffer.tell())
+
+    writer.close()
+    data = buffer.getvalue()
+    if len(data) > max_bytes:
+        raise _OverBudget(stats['frames'], len(data))
+    logging.info(
+        f"Rendered {stats['frames']} frames ({writer.frames} written, {stats['identical']} identical, "
+        f"{stats['partial']} partial) at {previous_output.size[0]}x{previous_output.size[1]}"
+    )
+    return {
+        'data': data,
+        'format': 'GIF',
+        'extension': 'gif',
+        'quality': None,
+        'size': previous_output.size,
+        'bytes': len(data),
+        'baseline_bytes': None,
+        'frames': writer.frames,
+    }
+
+def render_animated_job(job: Dict[str, Any], check: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Render a job whose template is animated
+
+    Output is always a GIF, within ANIMATION_MAX_BYTES rather than the still
+    image budget, or within the job's own max_bytes when that is smaller (a
+    batch shares one upload). When it is over the budget the animation is
+    rendered again at a smaller size estimated from how far the first attempt
+    got.
+
+    Args:
+        job: Job spec from build_render_job
+        check: Called between chunks; raises to abort the render
+
+    Returns:
+        Encoded animation dictionary (same keys as encode_image, plus frames)
+
+    Raises:
+        AnimationTooLargeError: If even the smallest size is over budget
+        ValueError: If an effect is unknown
+    """
+    max_bytes = min(ANIMATION_MAX_BYTES, job.get('max_bytes') or ANIMATION_MAX_BYTES)
+    with Image.open(job['template_path']) as im:
+        total = getattr(im, 'n_frames', 1)
+        longest = max(im.size)
+
+    start = min(ANIMATION_MAX_DIMENSION, longest)
+    scale = 1.0
+    while True:
+        side = max(16, int(start * scale))
+        try:
+            return _render_gif(job, (side, side), max_bytes, check)
+        except _OverBudget as e:
+            # Bytes grow with area, so shrink by the square root of the overshoot
+            projected = e.bytes_written * total / max(1, e.frames_done)
+            next_scale = scale * min(0.9, 0.9 * math.sqrt(max_bytes / projected))
+            if next_scale < MIN_SCALE:
+                raise AnimationTooLargeError(
+                    f"The animated meme is over {max_bytes / (1024 * 1024):.1f} MB even at a small size"
+                )
+            logging.info(f"Animated meme over budget at {side}px, retrying at {next_scale:.2f}x")
+            scale = next_scale
@@ -1,20 +1,44 @@
 import discord
 from discord import app_commands
 from discord.ext import commands
+import io
 import os
 import logging
 import asyncio
 import random
 import string
 from typing import Optional, List, Dict, Any
-from PIL import Image
 from bot.features.memes.template_manager import (
     get_template_list, get_template_by_name, get_template_by_id,
-    add_template, create_template_embed, save_template_image
+    add_template, create_template_embed, release_template_file,
+    get_most_used_templates, record_template_use, index_template_hashes, index_template_features,
+    search_template_names
 )
-from bot.features.memes.effects import apply_effect, get_available_effects
-from bot.utils.text_utils import draw_wrapped_text
-from bot.core.config import SAVED_MEMES_DIR
+from bot.features.memes.effects import get_available_effects
+from bot.features.memes.effect_chain import parse_effect_chain
+from bot.features.memes.render_engine import (
+    render_engine, build_render_job, build_batch_job, parse_caption_batch, RenderError, RenderTimeout
+)
+from bot.features.memes.render_cache import render_cache
+from bot.features.memes.animation import is_animated_template
+from bot.features.memes.video import build_video_job, check_source, VideoError
+from bot.features.memes.template_features import feature_index, index_template
+from bot.features.memes.template_ingest import ingest_attachment, IngestError
+from bot.features.memes.template_thumbnails import (
+    sheet_cache, sheet_page, get_thumbnail, generate_thumbnails, SHEET_CELL, THUMBNAIL_SIZES
+)
+from bot.core.config import (
+    SAVED_MEMES_DIR, SAVE_RENDERED_MEMES, TEMPLATE_CACHE_PREWARM, IMAGE_MAX_BYTES, IMAGE_MAX_PIXELS,
+    TEMPLATE_SHEET_SIZE, VIDEO_MAX_BYTES, VIDEO_MAX_SECONDS, VIDEO_TIMEOUT, OUTPUT_MAX_BYTES,
+    ANIMATION_MAX_BYTES, IMAGE_DUPLICATE_DISTANCE
+)
+from bot.utils.image_hash import hash_index, find_duplicate
+
+# Discord allows 10 attachments per message
+MAX_BATCH_MEMES = 10
+
+# Most templates /template_similar lists
+MAX_SIMILAR_TEMPLATES = 48
 
 def init_saved_memes_dir():
     """Initialize the saved memes directory if it doesn't exist"""
@@ -22,13 +46,283 @@ def init_saved_memes_dir():
         os.makedirs(SAVED_MEMES_DIR)
         logging.info(f"Created saved memes directory: {SAVED_MEMES_DIR}")
 
+def write_saved_meme(filename: str, data: bytes):
+    """Write an encoded meme into the saved memes directory"""
+    try:
+        with open(os.path.join(SAVED_MEMES_DIR, filename), 'wb') as f:
+            f.write(data)
+    except OSError as e:
+        logging.error(f"Error saving meme {filename}: {e}")
+
+def meme_filename(label: Optional[str] = None, extension: str = 'jpg') -> str:
+    """Generate a random filename for a rendered meme"""
+    random_str = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
+    return f"meme_{label}_{random_str}.{extension}" if label else f"meme_{random_str}.{extension}"
+
+class MemeTextModal(discord.ui.Modal, title="Create Meme"):
+    """Asks for captions and creates a meme from a template"""
+
+    def __init__(self, cog, template_name: str):
+        super().__init__()
+        self.cog = cog
+        self.template_name = template_name
+        
+    top_text = discord.ui.TextInput(
+        label="Top Text",
+        placeholder="Enter text for the top of the meme",
+        required=False,
+        max_length=100
+    )
+    
+    bottom_text = discord.ui.TextInput(
+        label="Bottom Text",
+        placeholder="Enter text for the bottom of the meme",
+        required=False,
+        max_length=100
+    )
+    
+    async def on_submit(self, interaction: discord.Interaction):
+        # Check if at least one text is provided
+        if not self.top_text.value and not self.bottom_text.value:
+            await interaction.response.send_message(
+                "Please provide at least one of: Top Text or Bottom Text.",
+                ephemeral=True
+            )
+            return
+            
+        # Create the meme (meme_create defers the response itself)
+        await self.cog.meme_create.callback(
+            self.cog,
+            interaction,
+            template=self.template_name,
+            top_text=self.top_text.value or None,
+            bottom_text=self.bottom_text.value or None
+        )
+
+class TemplateSelect(discord.ui.Select):
+    """Picks a template from the current contact sheet"""
+
+    def __init__(self, cog, templates: List[Dict[str, Any]]):
+        super().__init__(
+            placeholder="Use a template from this page",
+            options=[
+                discord.SelectOption(label=t['name'][:100], description=f"#{t['id']}", value=str(t['id']))
+                for t in templates
+            ]
+        )
+        self.cog = cog
+
+    async def callback(self, interaction: discord.Interaction):
+        # Option values are capped at 100 characters, so templates are picked by ID
+        template = get_template_by_id(int(self.values[0]))
+        if not template:
+            await interaction.response.send_message("That template no longer exists.", ephemeral=True)
+            return
+        await interaction.response.send_modal(MemeTextModal(self.cog, template['name']))
+
+class TemplateBrowser(discord.ui.View):
+    """
+    Pages through templates by editing one message
+
+    Pages show a pre-built thumbnail (single layout) or a cached contact
+    sheet (grid layout). Once an image has been uploaded its attachment URL
+    is reused, so paging back and forth does not upload it again.
+    """
+
+    def __init__(self, cog, templates: List[Dict[str, Any]], page: int = 1, layout: str = 'single'):
+        super().__init__(timeout=120)
+        self.cog = cog
+        self.templates = templates
+        self.layout = layout
+        self.per_page = TEMPLATE_SHEET_SIZE if layout == 'grid' else 1
+        _, self.page, self.max_pages = sheet_page(templates, page, self.per_page)
+        self.select = None
+        if layout == 'grid':
+            self.remove_item(self.use_button)
+
+    def current_templates(self) -> List[Dict[str, Any]]:
+        """Templates on the current page"""
+        return sheet_page(self.templates, self.page, self.per_page)[0]
+
+    def update_items(self):
+        """Enable the buttons that make sense on this page"""
+        self.prev_button.disabled = self.page <= 1
+        self.next_button.disabled = self.page >= self.max_pages
+        if self.layout == 'grid':
+            if self.select is not None:
+                self.remove_item(self.select)
+            self.select = TemplateSelect(self.cog, self.current_templates())
+            self.add_item(self.select)
+
+    async def build_page(self):
+        """
+        Build the embed for the current page
+
+        Returns:
+            (embed, file to upload or None, image cache key or None)
+        """
+        page_templates = self.current_templates()
+        key = await asyncio.to_thread(sheet_cache.make_key, page_templates,
+                                      SHEET_CELL if self.layout == 'grid' else THUMBNAIL_SIZES[0])
+
+        if self.layout == 'grid':
+            embed = discord.Embed(
+                title=f"Templates (page {self.page}/{self.max_pages})",
+                description="\n".join(f"`#{t['id']}` {t['name']}" for t in page_templates),
+                color=discord.Color.blue()
+            )
+            filename = f"templates_{key[:12]}.jpg"
+            path = None
+        else:
+            template = page_templates[0]
+            embed = create_template_embed(template, self.cog.bot.user)
+            embed.title = f"Template {self.page}/{self.max_pages}: {template['name']}"
+            filename = f"template_{template['id']}.jpg"
+            path = await asyncio.to_thread(get_thumbnail, template, THUMBNAIL_SIZES[0])
+            if path is None:
+                embed.set_image(url=None)
+                embed.description = f"Template file not found: {template['file_path']}"
+                return embed, None, None
+
+        url = sheet_cache.get_url(key)
+        if url:
+            embed.set_image(url=url)
+            return embed, None, key
+
+        if path is None:
+            data = await asyncio.to_thread(sheet_cache.get_sheet, key, page_templates)
+            file = discord.File(io.BytesIO(data), filename=filename)
+        else:
+            file = discord.File(path, filename=filename)
+        embed.set_image(url=f"attachment://{filename}")
+        return embed, file, key
+
+    async def show(self, interaction: discord.Interaction, first: bool = False):
+        """Send the current page, or edit the browser message to show it"""
+        embed, file, key = await self.build_page()
+        self.update_items()
+        if first:
+            kwargs = {'file': file} if file else {}
+            await interaction.response.send_message(embed=embed, view=self, **kwargs)
+        else:
+            await interaction.response.edit_message(embed=embed, view=self, attachments=[file] if file else [])
+
+        # Remember where Discord put the upload
+        if file and key:
+            message = await interaction.original_response()
+            if message.attachments:
+                sheet_cache.put_url(key, message.attachments[0].url)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.gray)
+    async def prev_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(1, self.page - 1)
+        await self.show(interaction)
+        
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.gray)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = min(self.max_pages, self.page + 1)
+        await self.show(interaction)
+        
+    @discord.ui.button(label="Use This Template", style=discord.ButtonStyle.green)
+    async def use_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        # Create a modal for entering meme text
+        modal = MemeTextModal(self.cog, self.current_templates()[0]['name'])
+        await interaction.response.send_modal(modal)
+
 class MemeCommands(commands.Cog):
     """Meme generation commands"""
     
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        init_saved_memes_dir()
-        
+        self.pending_saves = set()
+        if SAVE_RENDERED_MEMES:
+            init_saved_memes_dir()
+        self.start_render_engine()
+
+    def start_render_engine(self):
+        """Start the render workers with the most used templates pre-decoded"""
+        try:
+            warm_paths = [t['file_path'] for t in get_most_used_templates(TEMPLATE_CACHE_PREWARM)]
+        except Exception as e:
+            logging.error(f"Error loading templates to pre-warm: {e}")
+            warm_paths = []
+        render_engine.start(warm_paths=warm_paths)
+
+    async def cog_load(self):
+        """Index templates added before the hash and feature indexes existed"""
+        for backfill in (index_template_hashes, index_template_features):
+            task = asyncio.create_task(asyncio.to_thread(backfill))
+            self.pending_saves.add(task)
+            task.add_done_callback(self.pending_saves.discard)
+
+    async def cog_unload(self):
+        """Stop the render workers and finish pending saves when the cog is unloaded"""
+        render_engine.shutdown()
+        if self.pending_saves:
+            await asyncio.gather(*self.pending_saves, return_exceptions=True)
+
+    async def send_rendered_meme(
+        self,
+        interaction: discord.Interaction,
+        job: Dict[str, Any],
+        embed: discord.Embed,
+        label: Optional[str] = None,
+        timeout_message: str = "Rendering the meme took too long. Please try again."
+    ):
+        """
+        Render a job (or reuse a cached render) and send it as a followup
+
+        A repeat of a meme already uploaded in this guild is sent by URL
+        alone; one rendered recently elsewhere is uploaded from cached bytes.
+        """
+        # Never go over what the guild lets us upload (a job without a budget
+        # gets the default for its output)
+        if interaction.guild is not None:
+            budget = job['max_bytes'] or (
+                ANIMATION_MAX_BYTES if is_animated_template(job['template_path']) else OUTPUT_MAX_BYTES
+            )
+            if budget > interaction.guild.filesize_limit:
+                job = dict(job, max_bytes=interaction.guild.filesize_limit)
+
+        cache_key = render_cache.make_key(job)
+        cached_url = render_cache.get_url(cache_key, interaction.guild_id)
+        if cached_url:
+            embed.set_image(url=cached_url)
+            await interaction.followup.send(embed=embed)
+            return
+
+        result = render_cache.get(cache_key)
+        fresh = result is None
+        if fresh:
+            try:
+                result = await render_engine.render(job, interaction=interaction)
+            except RenderTimeout:
+                await interaction.followup.send(timeout_message)
+                return
+            except RenderError as e:
+                await interaction.followup.send(str(e))
+                return
+            render_cache.put(cache_key, result)
+
+        filename = meme_filename(label, result['extension'])
+        embed.set_image(url=f"attachment://{filename}")
+        message = await interaction.followup.send(
+            embed=embed,
+            file=discord.File(io.BytesIO(result['data']), filename=filename)
+        )
+        if message is not None and message.attachments:
+            render_cache.put_url(cache_key, interaction.guild_id, message.attachments[0].url)
+        if fresh:
+            self.save_meme_later(filename, result['data'])
+
+    def save_meme_later(self, filename: str, data: bytes):
+        """Write a rendered meme to disk in the background once it has been sent"""
+        if not SAVE_RENDERED_MEMES:
+            return
+        task = asyncio.create_task(asyncio.to_thread(write_saved_meme, filename, data))
+        self.pending_saves.add(task)
+        task.add_done_callback(self.pending_saves.discard)
+
     @app_commands.command(
         name='meme_create',
         description='Create a meme from a template'
@@ -39,7 +333,8 @@ class MemeCommands(commands.Cog):
         bottom_text='Text for the bottom of the meme',
         font_size='Font size (default: auto)',
         font_color='Font color (default: auto-contrast)',
-        outline_color='Text outline color (default: auto-contrast)'
+        outline_color='Text outline color (default: auto-contrast)',
+        auto_place='Put a single caption wherever the template is least busy'
     )
     async def meme_create(
         self, 
@@ -49,7 +344,8 @@ class MemeCommands(commands.Cog):
         bottom_text: Optional[str] = None,
         font_size: Optional[int] = None,
         font_color: Optional[str] = None,
-        outline_color: Optional[str] = None
+        outline_color: Optional[str] = None,
+        auto_place: bool = False
     ):
         """Create a meme from a template"""
         # Defer the response since this might take a moment
@@ -76,6 +372,8 @@ class MemeCommands(commands.Cog):
                 "Please provide at least one of: top_text or bottom_text."
             )
             return
+
+        record_template_use(template_obj['id'])
             
         # Load the template image
         try:
@@ -86,39 +384,16 @@ class MemeCommands(commands.Cog):
                 )
                 return
                 
-            img = Image.open(template_path)
-            
-            # Convert to RGB if needed
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-                
-            # Draw text on the image
-            if top_text:
-                img = draw_wrapped_text(
-                    img, 
-                    top_text, 
-                    position='top',
-                    font_size=font_size,
-                    font_color=font_color,
-                    outline_color=outline_color
-                )
-                
-            if bottom_text:
-                img = draw_wrapped_text(
-                    img, 
-                    bottom_text, 
-                    position='bottom',
-                    font_size=font_size,
-                    font_color=font_color,
-                    outline_color=outline_color
-                )
-                
-            # Generate a random filename
-            random_str = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-            output_path = os.path.join(SAVED_MEMES_DIR, f"meme_{random_str}.jpg")
-            
-            # Save the meme
-            img.save(output_path, 'JPEG', quality=95)
+            # Render in the worker pool so the event loop stays responsive
+            job = build_render_job(
+                template_path,
+                top_text=top_text,
+                bottom_text=bottom_text,
+                font_size=font_size,
+                font_color=font_color,
+                outline_color=outline_color,
+                auto_place=auto_place
+            )
             
             # Create embed
             embed = discord.Embed(
@@ -132,9 +407,9 @@ class MemeCommands(commands.Cog):
             )
             
             # Send the meme
-            await interaction.followup.send(
-                embed=embed,
-                file=discord.File(output_path)
+            await self.send_rendered_meme(
+                interaction, job, embed,
+                timeout_message="Creating the meme took too long. Please try again."
             )
             
         except Exception as e:
@@ -165,6 +440,15 @@ class MemeCommands(commands.Cog):
                 ephemeral=True
             )
             return
+
+        # Check the size before downloading anything
+        if image.size > IMAGE_MAX_BYTES or (image.width or 0) * (image.height or 0) > IMAGE_MAX_PIXELS:
+            await interaction.response.send_message(
+                f"That image is too large. Templates can be up to {IMAGE_MAX_BYTES // (1024 * 1024)} MB "
+                f"and {IMAGE_MAX_PIXELS // 1_000_000} megapixels.",
+                ephemeral=True
+            )
+            return
             
         # Check if the template name already exists
         existing_template = get_template_by_name(name)
@@ -179,33 +463,59 @@ class MemeCommands(commands.Cog):
         await interaction.response.defer()
         
         try:
-            # Save the template image
-            file_path = await save_template_image(image, name)
-            if not file_path:
-                await interaction.followup.send(
-                    "Failed to save the template image. Please try again."
-                )
+            # Stream, validate, normalize and store the image (caption maps are built too)
+            try:
+                ingested = await ingest_attachment(image)
+            except (IngestError, RenderError) as e:
+                await interaction.followup.send(str(e))
                 return
+            file_path = ingested['file_path']
                 
-            # Add the template to the database
-            template_id = add_template(
+            # Refuse images that are already a template under another name
+            duplicate_id = find_duplicate('template', ingested['image_hash'], IMAGE_DUPLICATE_DISTANCE)
+            if duplicate_id:
+                duplicate = get_template_by_id(int(duplicate_id))
+                if duplicate:
+                    release_template_file(file_path)
+                    await interaction.followup.send(
+                        f"That image is already a template: '{duplicate['name']}' (ID {duplicate['id']})."
+                    )
+                    return
+                # The template is gone, so its hash is stale
+                hash_index.remove('template', duplicate_id)
+
+            # Add the template, its hash and its features
+            template_id = await asyncio.to_thread(
+                add_template,
                 name,
                 file_path,
                 str(interaction.user.id),
-                interaction.user.display_name
+                interaction.user.display_name,
+                width=ingested['width'],
+                height=ingested['height'],
+                content_hash=ingested['content_hash'],
+                image_hash=ingested['image_hash'],
+                features=ingested['features']
             )
             
+            # Build the thumbnail pyramid once, at ingest
+            try:
+                await asyncio.to_thread(generate_thumbnails, template_id, file_path)
+            except Exception as e:
+                logging.error(f"Error generating thumbnails for template {template_id}: {e}")
+            
             # Get the template object
             template_obj = get_template_by_id(template_id)
             
             # Create embed
             embed = create_template_embed(template_obj, self.bot.user)
             
-            # Send confirmation
+            # Send confirmation with a preview instead of the full-size upload
+            preview = await asyncio.to_thread(get_thumbnail, template_obj, THUMBNAIL_SIZES[0]) or file_path
             await interaction.followup.send(
                 content=f"Template '{name}' has been added! Use `/meme_create template:{name}` to create memes with it.",
                 embed=embed,
-                file=discord.File(file_path)
+                file=discord.File(preview, filename=os.path.basename(file_path))
             )
             
         except Exception as e:
@@ -219,15 +529,23 @@ class MemeCommands(commands.Cog):
         description='Browse available meme templates'
     )
     @app_commands.describe(
-        page='Page number to view'
+        page='Page number to view',
+        layout='One template per page, or a grid of templates'
+    )
+    @app_commands.choices(
+        layout=[
+            app_commands.Choice(name='single', value='single'),
+            app_commands.Choice(name='grid', value='grid')
+        ]
     )
     async def template_browse(
         self,
         interaction: discord.Interaction,
-        page: int = 1
+        page: int = 1,
+        layout: str = 'single'
     ):
         """Browse available meme templates"""
-        # Get all templates
+        # Get all templates once; the browser pages through this list
         templates = get_template_list()
         
         if not templates:
@@ -237,110 +555,62 @@ class MemeCommands(commands.Cog):
             )
             return
             
-        # Calculate pagination
-        items_per_page = 1
-        max_pages = (len(templates) + items_per_page - 1) // items_per_page
-        
-        # Validate page number
-        if page < 1:
-            page = 1
-        elif page > max_pages:
-            page = max_pages
-            
-        # Get the template for this page
-        start_idx = (page - 1) * items_per_page
-        template = templates[start_idx]
-        
-        # Create embed
-        embed = create_template_embed(template, self.bot.user)
-        embed.title = f"Template {page}/{max_pages}: {template['name']}"
-        
-        # Create navigation buttons
-        class TemplateNavigation(discord.ui.View):
-            def __init__(self, cog, current_page, max_pages):
-                super().__init__(timeout=60)
-                self.cog = cog
-                self.current_page = current_page
-                self.max_pages = max_pages
-                
-                # Disable prev button on first page
-                if current_page == 1:
-                    self.prev_button.disabled = True
-                    
-                # Disable next button on last page
-                if current_page == max_pages:
-                    self.next_button.disabled = True
-                
-            @discord.ui.button(label="Previous", style=discord.ButtonStyle.gray)
-            async def prev_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-                await interaction.response.defer()
-                await self.cog.template_browse(interaction, page=self.current_page - 1)
-                
-            @discord.ui.button(label="Next", style=discord.ButtonStyle.gray)
-            async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-                await interaction.response.defer()
-                await self.cog.template_browse(interaction, page=self.current_page + 1)
-                
-            @discord.ui.button(label="Use This Template", style=discord.ButtonStyle.green)
-            async def use_button(self, interaction: discord.Interaction, button: discord.ui.Button):
-                # Create a modal for entering meme text
-                modal = MemeTextModal(templates[start_idx]['name'])
-                await interaction.response.send_modal(modal)
-        
-        # Create a modal for entering meme text
-        class MemeTextModal(discord.ui.Modal, title="Create Meme"):
-            def __init__(self, template_name):
-                super().__init__()
-                self.template_name = template_name
-                
-            top_text = discord.ui.TextInput(
-                label="Top Text",
-                placeholder="Enter text for the top of the meme",
-                required=False,
-                max_length=100
-            )
-            
-            bottom_text = discord.ui.TextInput(
-                label="Bottom Text",
-                placeholder="Enter text for the bottom of the meme",
-                required=False,
-                max_length=100
-            )
-            
-            async def on_submit(self, interaction: discord.Interaction):
-                # Check if at least one text is provided
-                if not self.top_text.value and not self.bottom_text.value:
-                    await interaction.response.send_message(
-                        "Please provide at least one of: Top Text or Bottom Text.",
-                        ephemeral=True
-                    )
-                    return
-                    
-                # Create the meme
-                await interaction.response.defer()
-                await self.cog.meme_create(
-                    interaction,
-                    template=self.template_name,
-                    top_text=self.top_text.value,
-                    bottom_text=self.bottom_text.value
-                )
-        
-        # Send the embed with navigation
-        file_path = template['file_path']
-        view = TemplateNavigation(self, page, max_pages)
-        
-        if os.path.exists(file_path):
+        browser = TemplateBrowser(self, templates, page=page, layout=layout)
+        await browser.show(interaction, first=True)
+
+    @app_commands.command(
+        name='template_similar',
+        description='Find templates that look like another template'
+    )
+    @app_commands.describe(
+        template='Template name or ID',
+        count='Number of templates to show',
+        layout='One template per page, or a grid of templates'
+    )
+    @app_commands.choices(
+        layout=[
+            app_commands.Choice(name='single', value='single'),
+            app_commands.Choice(name='grid', value='grid')
+        ]
+    )
+    async def template_similar(
+        self,
+        interaction: discord.Interaction,
+        template: str,
+        count: int = TEMPLATE_SHEET_SIZE,
+        layout: str = 'grid'
+    ):
+        """Find templates that look like another template"""
+        template_obj = get_template_by_name(template)
+        if not template_obj:
+            try:
+                template_obj = get_template_by_id(int(template))
+            except ValueError:
+                pass
+
+        if not template_obj:
             await interaction.response.send_message(
-                embed=embed,
-                view=view,
-                file=discord.File(file_path)
+                f"Template '{template}' not found. Use `/template_browse` to see available templates.",
+                ephemeral=True
             )
-        else:
+            return
+
+        count = max(1, min(MAX_SIMILAR_TEMPLATES, count))
+        matches = await asyncio.to_thread(feature_index.similar, template_obj['id'], count)
+        if not matches and await asyncio.to_thread(index_template, template_obj['id'], template_obj['file_path']):
+            matches = await asyncio.to_thread(feature_index.similar, template_obj['id'], count)
+
+        # Templates deleted since they were indexed are skipped
+        templates = [t for t in (get_template_by_id(template_id) for template_id, _ in matches) if t]
+        if not templates:
             await interaction.response.send_message(
-                content=f"Template file not found: {file_path}",
-                embed=embed,
-                view=view
+                f"No templates similar to '{template_obj['name']}' were found.",
+                ephemeral=True
             )
+            return
+
+        browser = TemplateBrowser(self, templates, layout=layout)
+        await browser.show(interaction, first=True)
             
     @app_commands.command(
         name='meme_effects',
@@ -351,7 +621,8 @@ class MemeCommands(commands.Cog):
         effect='Effect to apply',
         intensity='Effect intensity (0.1 to 1.0)',
         top_text='Text for the top of the meme',
-        bottom_text='Text for the bottom of the meme'
+        bottom_text='Text for the bottom of the meme',
+        more_effects="Extra effects to chain after it, e.g. 'grayscale+sepia:0.3'"
     )
     @app_commands.choices(
         effect=[
@@ -366,7 +637,8 @@ class MemeCommands(commands.Cog):
         effect: str,
         intensity: Optional[float] = 0.5,
         top_text: Optional[str] = None,
-        bottom_text: Optional[str] = None
+        bottom_text: Optional[str] = None,
+        more_effects: Optional[str] = None
     ):
         """Apply special effects to a meme template"""
         # Validate intensity
@@ -376,6 +648,16 @@ class MemeCommands(commands.Cog):
                 ephemeral=True
             )
             return
+
+        # Build the effect chain (extra effects default to the same intensity)
+        effects = [(effect, intensity)]
+        if more_effects:
+            try:
+                effects += parse_effect_chain(more_effects, default_intensity=intensity)
+            except ValueError as e:
+                await interaction.response.send_message(str(e), ephemeral=True)
+                return
+        effect_label = '+'.join(name for name, _ in effects)
             
         # Defer the response since this might take a moment
         await interaction.response.defer()
@@ -394,6 +676,8 @@ class MemeCommands(commands.Cog):
                 f"Template '{template}' not found. Use `/template_browse` to see available templates."
             )
             return
+
+        record_template_use(template_obj['id'])
             
         # Load the template image
         try:
@@ -404,37 +688,17 @@ class MemeCommands(commands.Cog):
                 )
                 return
                 
-            img = Image.open(template_path)
-            
-            # Convert to RGB if needed
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-                
-            # Apply the effect
-            img = apply_effect(img, effect, intensity)
-            if img is None:
-                await interaction.followup.send(
-                    f"Effect '{effect}' not found or could not be applied."
-                )
-                return
-                
-            # Draw text on the image if provided
-            if top_text:
-                img = draw_wrapped_text(img, top_text, position='top')
-                
-            if bottom_text:
-                img = draw_wrapped_text(img, bottom_text, position='bottom')
-                
-            # Generate a random filename
-            random_str = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-            output_path = os.path.join(SAVED_MEMES_DIR, f"meme_{effect}_{random_str}.jpg")
-            
-            # Save the meme
-            img.save(output_path, 'JPEG', quality=95)
+            # Apply the effect and draw text in the worker pool
+            job = build_render_job(
+                template_path,
+                top_text=top_text,
+                bottom_text=bottom_text,
+                effects=effects
+            )
             
             # Create embed
             embed = discord.Embed(
-                title=f"Meme: {template_obj['name']} with {effect} effect",
+                title=f"Meme: {template_obj['name']} with {effect_label} effect",
                 color=discord.Color.green()
             )
             
@@ -444,9 +708,10 @@ class MemeCommands(commands.Cog):
             )
             
             # Send the meme
-            await interaction.followup.send(
-                embed=embed,
-                file=discord.File(output_path)
+            await self.send_rendered_meme(
+                interaction, job, embed,
+                label=effect_label.replace('+', '_'),
+                timeout_message="Applying the effect took too long. Please try a lower intensity."
             )
             
         except Exception as e:
@@ -455,6 +720,202 @@ class MemeCommands(commands.Cog):
                 f"An error occurred while creating the meme: {str(e)}"
             )
 
+    @app_commands.command(
+        name='meme_batch',
+        description='Create several memes from one template at once'
+    )
+    @app_commands.describe(
+        template='Template name or ID',
+        captions="Memes separated by ';', top and bottom text by '|', e.g. 'top|bottom; another top'",
+        effects="Effects applied to every meme, e.g. 'deep_fry:0.3+grayscale'"
+    )
+    async def meme_batch(
+        self,
+        interaction: discord.Interaction,
+        template: str,
+        captions: str,
+        effects: Optional[str] = None
+    ):
+        """Create several memes from one template at once"""
+        try:
+            caption_specs = parse_caption_batch(captions)
+            effect_chain = parse_effect_chain(effects) if effects else None
+        except ValueError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+        if len(caption_specs) > MAX_BATCH_MEMES:
+            await interaction.response.send_message(
+                f"You can create up to {MAX_BATCH_MEMES} memes at once.",
+                ephemeral=True
+            )
+            return
+
+        # Defer the response since this might take a moment
+        await interaction.response.defer()
+
+        # Get the template
+        template_obj = get_template_by_name(template)
+        if not template_obj:
+            try:
+                template_id = int(template)
+                template_obj = get_template_by_id(template_id)
+            except ValueError:
+                pass
+
+        if not template_obj:
+            await interaction.followup.send(
+                f"Template '{template}' not found. Use `/template_browse` to see available templates."
+            )
+            return
+
+        template_path = template_obj['file_path']
+        if not os.path.exists(template_path):
+            await interaction.followup.send(
+                f"Template file not found: {template_path}"
+            )
+            return
+        record_template_use(template_obj['id'])
+
+        # All the memes go in one message, so they share the guild's upload limit
+        max_bytes = OUTPUT_MAX_BYTES
+        if interaction.guild is not None:
+            max_bytes = min(max_bytes, interaction.guild.filesize_limit // len(caption_specs))
+        job = build_batch_job(template_path, caption_specs, effects=effect_chain, max_bytes=max_bytes)
+
+        # Only render the memes that are not cached already
+        keys = [render_cache.make_key(item) for item in job['items']]
+        results = [render_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            try:
+                rendered = await render_engine.render_batch(
+                    dict(job, items=[job['items'][i] for i in missing]),
+                    interaction=interaction
+                )
+            except RenderTimeout:
+                await interaction.followup.send("Creating the memes took too long. Please try fewer at once.")
+                return
+            except RenderError as e:
+                await interaction.followup.send(str(e))
+                return
+            for i, result in zip(missing, rendered):
+                render_cache.put(keys[i], result)
+                results[i] = result
+
+        # Each meme was rendered within its share, but check the whole upload
+        total_bytes = sum(len(result['data']) for result in results)
+        if interaction.guild is not None and total_bytes > interaction.guild.filesize_limit:
+            await interaction.followup.send(
+                f"The memes come to {total_bytes / (1024 * 1024):.1f} MB, over this server's upload limit. "
+                "Please try fewer at once."
+            )
+            return
+
+        files = []
+        for i, result in enumerate(results):
+            filename = meme_filename(f"batch{i + 1}", result['extension'])
+            files.append(discord.File(io.BytesIO(result['data']), filename=filename))
+            if i in missing:
+                self.save_meme_later(filename, result['data'])
+        try:
+            await interaction.followup.send(
+                content=f"{len(files)} memes from **{template_obj['name']}** by {interaction.user.display_name}",
+                files=files
+            )
+        except discord.HTTPException as e:
+            logging.warning(f"Failed to send meme batch: {e}")
+            await interaction.followup.send("The memes could not be uploaded. Please try fewer at once.")
+
+    @app_commands.command(
+        name='meme_video',
+        description='Caption a short video clip'
+    )
+    @app_commands.describe(
+        top_text='Text for the top of the video',
+        bottom_text='Text for the bottom of the video',
+        video='Video file to caption',
+        url='Link to the video (Reddit video or Discord attachment)'
+    )
+    async def meme_video(
+        self,
+        interaction: discord.Interaction,
+        top_text: Optional[str] = None,
+        bottom_text: Optional[str] = None,
+        video: Optional[discord.Attachment] = None,
+        url: Optional[str] = None
+    ):
+        """Caption a short video clip"""
+        # Check if at least one text is provided
+        if not top_text and not bottom_text:
+            await interaction.response.send_message(
+                "Please provide at least one of: top_text or bottom_text.",
+                ephemeral=True
+            )
+            return
+
+        if video is not None:
+            if not video.content_type or not video.content_type.startswith('video/'):
+                await interaction.response.send_message(
+                    "Please upload a video file (MP4, WebM, etc.).",
+                    ephemeral=True
+                )
+                return
+            url = video.url
+        if not url:
+            await interaction.response.send_message(
+                "Please attach a video or give a link to one.",
+                ephemeral=True
+            )
+            return
+        try:
+            check_source(url)
+        except VideoError as e:
+            await interaction.response.send_message(str(e), ephemeral=True)
+            return
+
+        # Defer the response since this might take a while
+        await interaction.response.defer()
+
+        # Never go over what the guild lets us upload
+        max_bytes = VIDEO_MAX_BYTES
+        if interaction.guild is not None:
+            max_bytes = min(max_bytes, interaction.guild.filesize_limit)
+        job = build_video_job(url, top_text=top_text, bottom_text=bottom_text, max_bytes=max_bytes)
+
+        try:
+            result = await render_engine.render(job, timeout=VIDEO_TIMEOUT, interaction=interaction)
+        except RenderTimeout:
+            await interaction.followup.send(
+                f"Captioning the video took too long. Try a clip shorter than {VIDEO_MAX_SECONDS:.0f} seconds."
+            )
+            return
+        except RenderError as e:
+            await interaction.followup.send(str(e))
+            return
+
+        filename = meme_filename('video', result['extension'])
+        await interaction.followup.send(
+            content=f"Captioned by {interaction.user.display_name}",
+            file=discord.File(io.BytesIO(result['data']), filename=filename)
+        )
+        self.save_meme_later(filename, result['data'])
+
+    @meme_create.autocomplete('template')
+    @meme_effects.autocomplete('template')
+    @meme_batch.autocomplete('template')
+    @template_similar.autocomplete('template')
+    async def template_autocomplete(
+        self,
+        interaction: discord.Interaction,
+        current: str
+    ) -> List[app_commands.Choice[str]]:
+        """Suggest template names as the user types, from the in-memory name index"""
+        # Choice values are capped at 100 characters; longer names are passed by ID
+        return [
+            app_commands.Choice(name=t['name'][:100], value=t['name'] if len(t['name']) <= 100 else str(t['id']))
+            for t in search_template_names(current, limit=25)
+        ]
+
 async def setup(bot: commands.Bot):
     """Add the meme commands cog to the bot"""
     cog = MemeCommands(bot)
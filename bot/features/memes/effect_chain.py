@@ -0,0 +1,404 @@
+"""
+Effect Chains for Meme Generation
+
+This module applies several effects in one go, e.g. 'deep_fry+vaporwave+grayscale'
+or 'deep_fry:0.8+sepia:0.3'. Every effect is broken into stages. The planner
+fuses each run of per-pixel color stages (contrast, saturation, tint, invert,
+grayscale, sepia...) into as few lookup table or color matrix passes as it can
+without changing the result, and runs the spatial stages (sharpen, noise, blur,
+JPEG artifacts...) once each on the working image.
+"""
+
+import io
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from PIL import Image, ImageChops, ImageEnhance, ImageFilter
+import numpy as np
+from bot.features.memes.effects import add_noise, apply_effect, get_available_effects
+
+# Target pixel count of the thumbnail used to measure image statistics
+PROBE_PIXELS = 256 * 256
+
+# A stage is (operation name, parameters)
+Stage = Tuple[str, Dict[str, Any]]
+
+def _clamp(intensity: float) -> float:
+    """Clamp an intensity the way the single effects do"""
+    return max(0.1, min(1.0, intensity))
+
+def _deep_fry_stages(intensity: float) -> List[Stage]:
+    intensity = _clamp(intensity)
+    stages = [
+        ('contrast', {'factor': 1.0 + 2.0 * intensity}),
+        ('saturation', {'factor': 1.0 + 1.5 * intensity}),
+        ('sharpness', {'factor': 1.0 + 5.0 * intensity}),
+    ]
+    if intensity > 0.5:
+        stages.append(('noise', {'amount': intensity * 0.1}))
+    if intensity > 0.3:
+        stages.append(('jpeg', {'quality': int(30 - intensity * 25)}))
+    return stages
+
+def _vaporwave_stages(intensity: float) -> List[Stage]:
+    intensity = _clamp(intensity)
+    stages = []
+    shift = int(10 * intensity)
+    if shift > 0:
+        stages.append(('channel_shift', {'shift': shift}))
+    stages.append(('saturation', {'factor': 1.0 + intensity}))
+    stages.append(('tint', {'color': (255, 105, 180), 'amount': intensity * 0.3}))
+    return stages
+
+# Stage breakdown of every effect in bot.features.memes.effects
+EFFECT_STAGES: Dict[str, Callable[[float], List[Stage]]] = {
+    'deep_fry': _deep_fry_stages,
+    'vaporwave': _vaporwave_stages,
+    'pixelate': lambda i: [('pixelate', {'intensity': _clamp(i)})],
+    'noise': lambda i: [('noise', {'amount': i})],
+    'grayscale': lambda i: [('grayscale', {})],
+    'invert': lambda i: [('invert', {})],
+    'sepia': lambda i: [('sepia', {'amount': _clamp(i)})],
+    'blur': lambda i: [('blur', {'radius': _clamp(i) * 5})],
+}
+
+SEPIA_MATRIX = np.array([
+    [0.393, 0.769, 0.189],
+    [0.349, 0.686, 0.168],
+    [0.272, 0.534, 0.131],
+])
+
+# Pillow's RGB -> L weights
+LUMA = np.array([19595, 38470, 7471]) / 65536
+
+IDENTITY = np.eye(3)
+
+# Color stages map each pixel on its own, and every one of them is an affine
+# color transform (a 3x3 matrix plus an offset)
+COLOR_OPS = {'contrast', 'saturation', 'brightness', 'tint', 'invert', 'grayscale', 'sepia'}
+
+def _color_affine(op: str, params: Dict[str, Any], mean: float = 128.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Get the (matrix, offset) of a color stage
+
+    Args:
+        op: Color operation name
+        params: Stage parameters
+        mean: Mean gray level of the image, which contrast pivots on
+
+    Returns:
+        3x3 matrix and length-3 offset
+    """
+    zero = np.zeros(3)
+    if op == 'contrast':
+        f = params['factor']
+        return f * IDENTITY, np.full(3, (1 - f) * mean)
+    if op == 'saturation':
+        f = params['factor']
+        return f * IDENTITY + (1 - f) * np.outer(np.ones(3), LUMA), zero
+    if op == 'brightness':
+        return params['factor'] * IDENTITY, zero
+    if op == 'tint':
+        a = params['amount']
+        return (1 - a) * IDENTITY, a * np.array(params['color'], dtype=float)
+    if op == 'invert':
+        return -IDENTITY, np.full(3, 255.0)
+    if op == 'grayscale':
+        return np.outer(np.ones(3), LUMA), zero
+    if op == 'sepia':
+        a = params['amount']
+        return (1 - a) * IDENTITY + a * SEPIA_MATRIX, zero
+    raise ValueError(f"Unknown color operation '{op}'")
+
+def _interval(matrix: np.ndarray, offset: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Bounds of an affine transform over the box of colors [lo, hi]"""
+    pos = np.clip(matrix, 0, None)
+    neg = np.clip(matrix, None, 0)
+    return pos @ lo + neg @ hi + offset, pos @ hi + neg @ lo + offset
+
+def _in_range(lo: np.ndarray, hi: np.ndarray) -> bool:
+    return lo.min() >= 0 and hi.max() <= 255
+
+def _eval_stage(op: str, params: Dict[str, Any], colors: np.ndarray, mean: float) -> np.ndarray:
+    """Run one color stage on (N, 3) colors, rounding and clipping like an 8-bit image"""
+    if op == 'sepia':
+        # The sepia tone is clipped before it is blended back in
+        toned = np.clip(np.round(colors @ SEPIA_MATRIX.T), 0, 255)
+        out = colors + params['amount'] * (toned - colors)
+    else:
+        matrix, offset = _color_affine(op, params, mean)
+        out = colors @ matrix.T + offset
+    return np.clip(np.floor(out), 0, 255)
+
+def _jpeg(img: Image.Image, p: Dict[str, Any]) -> Image.Image:
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=p['quality'])
+    buffer.seek(0)
+    with Image.open(buffer) as reloaded:
+        return reloaded.convert('RGB')
+
+def _channel_shift(img: Image.Image, p: Dict[str, Any]) -> Image.Image:
+    r, g, b = img.split()
+    return Image.merge('RGB', (
+        ImageChops.offset(r, p['shift'], 0), g, ImageChops.offset(b, -p['shift'], 0)
+    ))
+
+def _pixelate(img: Image.Image, p: Dict[str, Any]) -> Image.Image:
+    width, height = img.size
+    pixel_size = max(2, int(min(width, height) * p['intensity'] / 20))
+    small = img.resize((max(1, width // pixel_size), max(1, height // pixel_size)), Image.NEAREST)
+    return small.resize(img.size, Image.NEAREST)
+
+# Spatial stages need neighbouring pixels (or randomness) and run as-is
+SPATIAL_OPS: Dict[str, Callable[[Image.Image, Dict[str, Any]], Image.Image]] = {
+    'sharpness': lambda img, p: ImageEnhance.Sharpness(img).enhance(p['factor']),
+    'noise': lambda img, p: add_noise(img, p['amount'], p.get('rng')),
+    'jpeg': _jpeg,
+    'channel_shift': _channel_shift,
+    'pixelate': _pixelate,
+    'blur': lambda img, p: img.filter(ImageFilter.GaussianBlur(p['radius'])),
+}
+
+def parse_effect_chain(spec: str, default_intensity: float = 0.5) -> List[Tuple[str, float]]:
+    """
+    Parse an effect chain such as 'deep_fry:0.8+vaporwave+grayscale'
+
+    Args:
+        spec: Effect names joined by '+', each with an optional ':intensity'
+        default_intensity: Intensity for effects without one
+
+    Returns:
+        List of (effect name, intensity) pairs
+
+    Raises:
+        ValueError: If an effect is unknown or an intensity is invalid
+    """
+    chain = []
+    for part in spec.split('+'):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, value = part.partition(':')
+        name = name.strip().lower().replace('-', '_')
+        if name not in EFFECT_STAGES:
+            raise ValueError(
+                f"Unknown effect '{name}'. Available effects: {', '.join(get_available_effects())}"
+            )
+        try:
+            intensity = float(value) if value.strip() else default_intensity
+        except ValueError:
+            raise ValueError(f"Invalid intensity '{value}' for effect '{name}'")
+        if not 0.0 <= intensity <= 1.0:
+            raise ValueError(f"Intensity for '{name}' must be between 0.0 and 1.0")
+        chain.append((name, intensity))
+    if not chain:
+        raise ValueError("No effects given")
+    return chain
+
+def plan_chain(chain: List[Tuple[str, float]]) -> List[Tuple[str, Any]]:
+    """
+    Plan an effect chain
+
+    Runs of color stages are grouped into as few full-frame passes as
+    possible without changing the result:
+
+    - 'lut': per-channel stages (contrast, brightness, tint, invert) become
+      one 256-entry table per channel, which reproduces clipping exactly
+    - 'matrix': stages that mix channels fuse into one color matrix as long
+      as no stage before the last could clip (checked with interval bounds)
+    - 'exact': a stage that clips internally (sepia on bright colors) runs alone
+
+    Args:
+        chain: List of (effect name, intensity) pairs
+
+    Returns:
+        List of steps: (kind, [stages]) for color passes, or ('spatial', stage)
+    """
+    plan = []
+    segment = None
+    lo, hi = np.zeros(3), np.full(3, 255.0)
+
+    def close():
+        if segment is not None:
+            kind = 'lut' if segment['diagonal'] else 'matrix' if segment['affine'] else 'exact'
+            plan.append((kind, segment['stages']))
+
+    for name, intensity in chain:
+        for stage in EFFECT_STAGES[name](intensity):
+            op, params = stage
+            if op not in COLOR_OPS:
+                close()
+                segment = None
+                plan.append(('spatial', stage))
+                lo, hi = np.zeros(3), np.full(3, 255.0)
+                continue
+
+            matrix, offset = _color_affine(op, params)
+            diagonal = op != 'sepia' and not np.any(matrix - np.diag(np.diag(matrix)))
+            inner_ok = op != 'sepia' or _in_range(*_interval(SEPIA_MATRIX, np.zeros(3), lo, hi))
+            raw_lo, raw_hi = _interval(matrix, offset, lo, hi)
+
+            if segment is not None:
+                as_lut = segment['diagonal'] and diagonal
+                as_matrix = segment['affine'] and segment['last_in_range'] and inner_ok
+                if as_lut or as_matrix:
+                    segment['stages'].append(stage)
+                    segment['diagonal'] = as_lut
+                    segment['affine'] = as_matrix
+                    segment['last_in_range'] = _in_range(raw_lo, raw_hi)
+                else:
+                    close()
+                    segment = None
+            if segment is None:
+                segment = {
+                    'stages': [stage],
+                    'diagonal': diagonal,
+                    'affine': inner_ok,
+                    'last_in_range': _in_range(raw_lo, raw_hi),
+                }
+            lo, hi = np.clip(raw_lo, 0, 255), np.clip(raw_hi, 0, 255)
+    close()
+    return plan
+
+def _probe(img: Image.Image) -> np.ndarray:
+    """Get a small box-filtered copy of the image as (N, 3) float pixels"""
+    factor = max(1, int((img.width * img.height / PROBE_PIXELS) ** 0.5))
+    small = img.reduce(factor) if factor > 1 else img
+    return np.asarray(small, dtype=np.float64).reshape(-1, 3)
+
+def _stage_means(img: Image.Image, stages: List[Stage]) -> List[float]:
+    """Mean gray level of the image as it enters each stage (only needed for contrast)"""
+    if not any(op == 'contrast' for op, _ in stages):
+        return [128.0] * len(stages)
+    probe = _probe(img)
+    means = []
+    for op, params in stages:
+        mean = float(np.floor((probe @ LUMA).mean() + 0.5))
+        means.append(mean)
+        probe = _eval_stage(op, params, probe, mean)
+    return means
+
+def _apply_color_step(img: Image.Image, kind: str, stages: List[Stage],
+                      means: Optional[List[float]] = None) -> Image.Image:
+    """Apply a planned run of color stages in one pass"""
+    if means is None:
+        means = _stage_means(img, stages)
+
+    if kind == 'lut':
+        ramp = np.repeat(np.arange(256, dtype=np.float64)[:, None], 3, axis=1)
+        for (op, params), mean in zip(stages, means):
+            ramp = _eval_stage(op, params, ramp, mean)
+        return img.point(ramp.T.astype(np.uint8).ravel().tolist())
+
+    if kind == 'matrix':
+        matrix, offset = IDENTITY, np.zeros(3)
+        for (op, params), mean in zip(stages, means):
+            stage_matrix, stage_offset = _color_affine(op, params, mean)
+            matrix, offset = stage_matrix @ matrix, stage_matrix @ offset + stage_offset
+        return img.convert('RGB', tuple(np.hstack([matrix, offset[:, None]]).ravel().tolist()))
+
+    # A single stage that has to clip part-way through
+    op, params = stages[0]
+    toned = img.convert('RGB', tuple(np.hstack([SEPIA_MATRIX, np.zeros((3, 1))]).ravel().tolist()))
+    return Image.blend(img, toned, params['amount'])
+
+def count_passes(plan: List[Tuple[str, Any]]) -> Tuple[int, int]:
+    """
+    Count full-frame passes of a plan
+
+    Returns:
+        (stages if each ran on its own, passes of the fused plan)
+    """
+    sequential = sum(1 if kind == 'spatial' else len(step) for kind, step in plan)
+    return sequential, len(plan)
+
+def is_pointwise(chain: List[Tuple[str, float]]) -> bool:
+    """
+    Check whether every stage of a chain maps each pixel on its own
+
+    Pointwise chains can be run on part of an image and give the same pixels
+    as running them on the whole image (given fixed stage means).
+    """
+    return all(kind != 'spatial' for kind, _ in plan_chain(chain))
+
+def chain_means(img: Image.Image, chain: List[Tuple[str, float]],
+                rng: Optional[np.random.Generator] = None) -> List[Optional[List[float]]]:
+    """
+    Measure the stage means of each color pass on a reference image
+
+    Passing the result to apply_effect_chain makes contrast stages use the
+    same gray level on every frame of an animation instead of flickering
+    with each frame's content.
+
+    Args:
+        img: Reference image (usually the first frame)
+        chain: List of (effect name, intensity) pairs
+        rng: Random generator for noise stages (default: unseeded)
+
+    Returns:
+        Per-step list of stage means (None for spatial steps)
+    """
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    means = []
+    for kind, step in plan_chain(chain):
+        if kind != 'spatial':
+            step_means = _stage_means(img, step)
+            means.append(step_means)
+            img = _apply_color_step(img, kind, step, step_means)
+        else:
+            means.append(None)
+            op, params = step
+            if op == 'noise' and rng is not None:
+                params = dict(params, rng=rng)
+            img = SPATIAL_OPS[op](img, params)
+    return means
+
+def apply_effect_chain(img: Image.Image, chain: List[Tuple[str, float]],
+                       rng: Optional[np.random.Generator] = None,
+                       means: Optional[List[Optional[List[float]]]] = None) -> Image.Image:
+    """
+    Apply an effect chain with fused color stages
+
+    Args:
+        img: The input image
+        chain: List of (effect name, intensity) pairs
+        rng: Random generator for noise stages (default: unseeded)
+        means: Stage means from chain_means (default: measured on img)
+
+    Returns:
+        The processed image
+    """
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    for index, (kind, step) in enumerate(plan_chain(chain)):
+        if kind != 'spatial':
+            img = _apply_color_step(img, kind, step, means[index] if means else None)
+        else:
+            op, params = step
+            if op == 'noise' and rng is not None:
+                params = dict(params, rng=rng)
+            img = SPATIAL_OPS[op](img, params)
+    return img
+
+def apply_effect_chain_sequential(img: Image.Image, chain: List[Tuple[str, float]],
+                                  rng: Optional[np.random.Generator] = None) -> Image.Image:
+    """
+    Apply an effect chain one whole effect at a time (reference path)
+
+    Args:
+        img: The input image
+        chain: List of (effect name, intensity) pairs
+        rng: Random generator for noise (default: unseeded)
+
+    Returns:
+        The processed image
+    """
+    for name, intensity in chain:
+        result = apply_effect(img, name, intensity, rng)
+        if result is None:
+            logging.error(f"Effect {name} not found")
+            continue
+        img = result.convert('RGB') if result.mode != 'RGB' else result
+    return img
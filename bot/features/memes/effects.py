@@ -5,21 +5,25 @@ This module provides various effects that can be applied to meme images,
 such as deep-frying, vaporwave, and more.
 """
 
-import os
+import io
 import random
 import logging
 from typing import Tuple, Optional
-from PIL import Image, ImageEnhance, ImageFilter, ImageOps, ImageDraw, ImageFont
+from PIL import Image, ImageChops, ImageEnhance, ImageFilter, ImageOps, ImageDraw
 import numpy as np
 from bot.utils.color_utils import get_contrasting_color
+from bot.utils.font_utils import get_font
+from bot.utils.strips import noise_strips
 
-def deep_fry(img: Image.Image, intensity: float = 1.0) -> Image.Image:
+def deep_fry(img: Image.Image, intensity: float = 1.0,
+             rng: Optional[np.random.Generator] = None) -> Image.Image:
     """
     Apply a 'deep-fried' effect to an image
     
     Args:
         img: The input image
         intensity: Effect intensity (0.0 to 1.0)
+        rng: Random generator for the noise (default: unseeded)
         
     Returns:
         The processed image
@@ -44,7 +48,7 @@ def deep_fry(img: Image.Image, intensity: float = 1.0) -> Image.Image:
     
     # Add noise
     if intensity > 0.5:
-        img = add_noise(img, intensity * 0.1)
+        img = add_noise(img, intensity * 0.1, rng)
     
     # Add JPEG artifacts by saving at low quality and reloading
     if intensity > 0.3:
@@ -52,19 +56,13 @@ def deep_fry(img: Image.Image, intensity: float = 1.0) -> Image.Image:
         if img.mode != 'RGB':
             img = img.convert('RGB')
             
-        # Save with low quality
-        temp_path = "temp_deepfry.jpg"
+        # Round-trip through an in-memory JPEG at low quality
         quality = int(30 - intensity * 25)  # Quality from 5 to 30
-        img.save(temp_path, quality=quality, optimize=True)
-        
-        # Reload the image
-        img = Image.open(temp_path)
-        
-        # Clean up
-        try:
-            os.remove(temp_path)
-        except:
-            pass
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=quality, optimize=True)
+        buffer.seek(0)
+        with Image.open(buffer) as reloaded:
+            img = reloaded.convert('RGB')
     
     return img
 
@@ -142,34 +140,21 @@ def pixelate(img: Image.Image, intensity: float = 1.0) -> Image.Image:
     
     return small_img.resize(img.size, Image.NEAREST)
 
-def add_noise(img: Image.Image, intensity: float = 0.1) -> Image.Image:
+def add_noise(img: Image.Image, intensity: float = 0.1,
+              rng: Optional[np.random.Generator] = None) -> Image.Image:
     """
     Add random noise to an image
     
     Args:
         img: The input image
         intensity: Noise intensity (0.0 to 1.0)
+        rng: Random generator to draw from (default: unseeded)
         
     Returns:
         The processed image with noise
     """
-    # Make a copy to avoid modifying the original
-    img = img.copy()
-    
-    # Convert to numpy array
-    img_array = np.array(img).astype(np.float64)
-    
-    # Generate noise
-    noise = np.random.normal(0, 255 * intensity, img_array.shape)
-    
-    # Add noise to image
-    img_array = img_array + noise
-    
-    # Clip values to valid range
-    img_array = np.clip(img_array, 0, 255).astype(np.uint8)
-    
-    # Convert back to PIL image
-    return Image.fromarray(img_array)
+    # Noise is added in float32 strips, so no full-frame float copy is made
+    return noise_strips(img, intensity, rng)
 
 def add_color_tint(img: Image.Image, color: Tuple[int, int, int], intensity: float = 0.5) -> Image.Image:
     """
@@ -216,6 +201,32 @@ def invert(img: Image.Image) -> Image.Image:
     """
     return ImageOps.invert(img)
 
+def sepia(img: Image.Image, intensity: float = 1.0) -> Image.Image:
+    """
+    Apply an old-fashioned sepia tone to an image
+    
+    Args:
+        img: The input image
+        intensity: Effect intensity (0.0 to 1.0)
+        
+    Returns:
+        Sepia-toned version of the image
+    """
+    # Scale intensity
+    intensity = max(0.1, min(1.0, intensity))
+    
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # Standard sepia color matrix
+    toned = img.convert('RGB', (
+        0.393, 0.769, 0.189, 0,
+        0.349, 0.686, 0.168, 0,
+        0.272, 0.534, 0.131, 0
+    ))
+    
+    return Image.blend(img, toned, intensity)
+
 def blur(img: Image.Image, intensity: float = 1.0) -> Image.Image:
     """
     Apply blur to an image
@@ -269,18 +280,15 @@ def add_caption(img: Image.Image, text: str, position: str = 'top') -> Image.Ima
     # Create a drawing context
     draw = ImageDraw.Draw(new_img)
     
-    # Try to load Impact font, fall back to default
-    try:
-        font_size = int(caption_height * 0.7)
-        font = ImageFont.truetype("Impact", font_size)
-    except:
-        font_size = int(caption_height * 0.7)
-        font = ImageFont.load_default()
+    # Load the Impact-style caption font (falls back to a bundled font)
+    font_size = int(caption_height * 0.7)
+    font = get_font('impact', font_size)
     
     # Draw the caption
-    text_width, text_height = draw.textsize(text, font=font)
-    text_x = (width - text_width) // 2
-    text_y = caption_y + (caption_height - text_height) // 2
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    text_width, text_height = right - left, bottom - top
+    text_x = (width - text_width) // 2 - left
+    text_y = caption_y + (caption_height - text_height) // 2 - top
     
     # Draw text with black outline
     for offset_x, offset_y in [(-2, -2), (-2, 2), (2, -2), (2, 2)]:
@@ -291,7 +299,8 @@ def add_caption(img: Image.Image, text: str, position: str = 'top') -> Image.Ima
     
     return new_img
 
-def apply_effect(img: Image.Image, effect_name: str, intensity: float = 1.0) -> Optional[Image.Image]:
+def apply_effect(img: Image.Image, effect_name: str, intensity: float = 1.0,
+                 rng: Optional[np.random.Generator] = None) -> Optional[Image.Image]:
     """
     Apply a named effect to an image
     
@@ -299,17 +308,20 @@ def apply_effect(img: Image.Image, effect_name: str, intensity: float = 1.0) ->
         img: The input image
         effect_name: Name of the effect to apply
         intensity: Effect intensity (0.0 to 1.0)
+        rng: Random generator for effects with noise, so the same seed
+            gives the same output (default: unseeded)
         
     Returns:
         Processed image or None if effect not found
     """
     effect_map = {
-        'deep_fry': deep_fry,
+        'deep_fry': lambda img, i: deep_fry(img, i, rng),
         'vaporwave': vaporwave,
         'pixelate': pixelate,
-        'noise': add_noise,
+        'noise': lambda img, i: add_noise(img, i, rng),
         'grayscale': lambda img, _: grayscale(img),
         'invert': lambda img, _: invert(img),
+        'sepia': sepia,
         'blur': blur
     }
     
@@ -336,5 +348,6 @@ def get_available_effects() -> list:
         'noise',
         'grayscale',
         'invert',
+        'sepia',
         'blur'
     ]
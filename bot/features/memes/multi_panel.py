@@ -1,12 +1,13 @@
 from PIL import Image
 import os
+from bot.utils.image_loader import load_image
 
 def create_multi_panel(template_paths, output_path, direction='horizontal'):
     """
     Combine multiple images into a single multi-panel meme.
     direction: 'horizontal' or 'vertical'
     """
-    images = [Image.open(p).convert('RGB') for p in template_paths]
+    images = [load_image(p) for p in template_paths]
     if direction == 'horizontal':
         total_width = sum(img.width for img in images)
         max_height = max(img.height for img in images)
@@ -0,0 +1,209 @@
+"""
+Render Result Cache for Meme Generation
+
+This module caches encoded memes by a hash of their normalized render spec,
+so identical requests skip the render workers. After a meme has been uploaded,
+the attachment URL Discord returns is kept per guild, so a repeat in the same
+guild can skip the upload as well.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse, parse_qs
+from bot.core.config import RENDER_CACHE_MAX_BYTES, RENDER_CACHE_TTL
+from bot.features.memes.render_engine import render_spec_hash
+
+# Seconds before a signed attachment URL expires that it stops being reused
+URL_EXPIRY_MARGIN = 5 * 60
+
+def attachment_url_expiry(url: str) -> Optional[float]:
+    """
+    Get the expiry time of a signed Discord CDN attachment URL
+
+    Args:
+        url: Attachment URL (signed URLs carry a hex 'ex' timestamp)
+
+    Returns:
+        Unix time the URL expires, or None if it is not signed
+    """
+    try:
+        values = parse_qs(urlparse(url).query).get('ex')
+        return float(int(values[0], 16)) if values else None
+    except ValueError:
+        return None
+
+class RenderCache:
+    """
+    Byte-capped, TTL-bounded LRU cache of rendered memes
+
+    Each entry holds the encoded image and the attachment URLs it has been
+    uploaded to, keyed by guild ID.
+    """
+
+    def __init__(self, max_bytes: int = RENDER_CACHE_MAX_BYTES, ttl: float = RENDER_CACHE_TTL):
+        """
+        Initialize the cache
+
+        Args:
+            max_bytes: Upper bound on the total encoded bytes held
+            ttl: Seconds an entry stays valid after it was rendered
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.hits = 0
+        self.url_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(job: Dict[str, Any]) -> str:
+        """
+        Get the cache key of a render job
+
+        The template file's mtime and size are part of the key, so replacing
+        a template never serves memes rendered from the old image.
+
+        Args:
+            job: Job spec from build_render_job
+
+        Returns:
+            Cache key
+        """
+        try:
+            st = os.stat(job['template_path'])
+            stamp = f"{st.st_mtime_ns}:{st.st_size}"
+        except OSError:
+            stamp = 'missing'
+        return f"{render_spec_hash(job)}:{stamp}"
+
+    def _get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a live entry and mark it as recently used (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry['created'] > self.ttl:
+            self._remove(key)
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str):
+        """Drop an entry (caller holds the lock)"""
+        entry = self._entries.pop(key, None)
+        if entry:
+            self.current_bytes -= entry['result']['bytes']
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached render
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Encoded image dictionary from render_job, or None on a miss
+        """
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry['result']
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """
+        Store a render, evicting least recently used entries
+
+        Args:
+            key: Cache key from make_key
+            result: Encoded image dictionary from render_job
+        """
+        size = result['bytes']
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[key] = {'result': result, 'created': time.time(), 'urls': {}}
+            self.current_bytes += size
+
+    def get_url(self, key: str, guild_id: Optional[int]) -> Optional[str]:
+        """
+        Get the attachment URL a render was uploaded to in a guild
+
+        Args:
+            key: Cache key from make_key
+            guild_id: Guild ID (None for DMs)
+
+        Returns:
+            Attachment URL, or None if there is no usable one
+        """
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is None:
+                return None
+            url, expires = entry['urls'].get(guild_id, (None, None))
+            if url is None:
+                return None
+            if expires is not None and time.time() > expires - URL_EXPIRY_MARGIN:
+                del entry['urls'][guild_id]
+                return None
+            self.url_hits += 1
+            return url
+
+    def put_url(self, key: str, guild_id: Optional[int], url: str):
+        """
+        Remember the attachment URL a render was uploaded to
+
+        Args:
+            key: Cache key from make_key
+            guild_id: Guild ID (None for DMs)
+            url: Attachment URL Discord returned
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['urls'][guild_id] = (url, attachment_url_expiry(url))
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hits, URL hits, misses, evictions, expirations,
+            entries, bytes and hit rate (URL hits count as hits)
+        """
+        served = self.hits + self.url_hits
+        total = served + self.misses
+        return {
+            'hits': self.hits,
+            'url_hits': self.url_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expired': self.expired,
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hit_rate': served / total if total else 0.0
+        }
+
+# Create a singleton instance
+render_cache = RenderCache()
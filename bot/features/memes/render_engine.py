@@ -0,0 +1,590 @@
+"""
+Render Engine for Meme Generation
+
+This module runs the Pillow/NumPy side of meme generation (decode, effects,
+captions, encode) in a bounded pool of worker processes so a heavy render never
+blocks the bot's event loop. Callers ship a small job spec and get the encoded
+image back, in whichever format suits it best within a byte budget.
+"""
+
+import time
+import json
+import hashlib
+import os
+import asyncio
+import logging
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional, Tuple
+import discord
+import numpy as np
+from PIL import Image
+from bot.core.config import (
+    RENDER_WORKERS, RENDER_TIMEOUT, RENDER_MAX_PENDING, OUTPUT_MAX_BYTES, REPORT_ENCODE_SAVINGS
+)
+from bot.features.memes.effects import apply_effect
+from bot.features.memes.effect_chain import apply_effect_chain
+from bot.features.memes.animation import is_animated_template, render_animated_job, AnimationTooLargeError
+from bot.features.memes.video import render_video_job, VideoError
+from bot.features.memes.template_manager import load_template_image, warm_template_cache
+from bot.features.memes.template_maps import get_template_maps
+from bot.utils.text_utils import draw_caption
+from bot.utils.compositing import composite_layers, default_layers
+from bot.utils.image_maps import ImageMaps
+from bot.utils.optimize import encode_image, MAX_QUALITY
+from bot.utils.image_loader import ImageTooLargeError
+
+# Discord interaction tokens are valid for 15 minutes
+INTERACTION_TTL = 15 * 60
+
+# Seconds kept in reserve to send the followup once a render finishes
+INTERACTION_GRACE = 5
+
+# Fewest batch items worth handing to another worker
+BATCH_ITEMS_PER_WORKER = 4
+
+class RenderError(Exception):
+    """Raised when a render job cannot be completed"""
+    pass
+
+class RenderTimeout(RenderError):
+    """Raised when a render job misses its deadline"""
+    pass
+
+def build_render_job(
+    template_path: str,
+    top_text: Optional[str] = None,
+    bottom_text: Optional[str] = None,
+    effect: Optional[str] = None,
+    intensity: float = 1.0,
+    font_size: Optional[int] = None,
+    font_color: Optional[str] = None,
+    outline_color: Optional[str] = None,
+    quality: int = MAX_QUALITY,
+    max_bytes: Optional[int] = None,
+    output_format: Optional[str] = None,
+    effects: Optional[List[Tuple[str, float]]] = None,
+    seed: Optional[int] = None,
+    layers: Optional[List[Dict[str, Any]]] = None,
+    auto_place: bool = False
+) -> Dict[str, Any]:
+    """
+    Build the job spec sent to a render worker
+
+    Args:
+        template_path: Path to the template image
+        top_text: Caption for the top of the meme
+        bottom_text: Caption for the bottom of the meme
+        effect: Name of the effect to apply before captioning
+        intensity: Effect intensity (0.1 to 1.0)
+        font_size: Starting font size (default: auto)
+        font_color: Caption color (default: auto-contrast)
+        outline_color: Caption outline color (default: auto-contrast)
+        quality: Highest lossy quality the encoder may use
+        max_bytes: Byte budget for the encoded result (default:
+            OUTPUT_MAX_BYTES, or ANIMATION_MAX_BYTES for animated templates)
+        output_format: 'JPEG', 'WEBP' or 'PNG' (default: picked from the image)
+        effects: Effect chain as (name, intensity) pairs, run with fused
+            color stages (takes the place of effect/intensity)
+        seed: Seed for random effects (default: derived from the spec, so the
+            same request always renders the same image)
+        layers: Watermark and sticker layer specs drawn over the captions
+            (default: the configured watermark, if any; [] for none)
+        auto_place: Put a lone caption in whichever of the top or bottom
+            band of the template is less busy
+
+    Returns:
+        Job spec dictionary
+    """
+    if layers is None:
+        layers = default_layers()
+    job = {
+        'template_path': template_path,
+        'top_text': top_text,
+        'bottom_text': bottom_text,
+        'effect': effect,
+        'intensity': intensity,
+        'font_size': font_size,
+        'font_color': font_color,
+        'outline_color': outline_color,
+        'quality': quality,
+        'max_bytes': max_bytes,
+        'output_format': output_format,
+        'effects': [tuple(step) for step in effects] if effects else None,
+        'layers': [dict(layer) for layer in layers] if layers else None,
+        'auto_place': auto_place,
+    }
+    job['seed'] = seed if seed is not None else int(render_spec_hash(job)[:16], 16)
+    return job
+
+def render_spec_hash(job: Dict[str, Any]) -> str:
+    """
+    Hash the parts of a job spec that decide the rendered image
+
+    Text is stripped, colors are lower-cased and intensities rounded, so
+    requests that render the same meme hash the same. Deadlines are ignored.
+
+    Args:
+        job: Job spec from build_render_job
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    def color(value):
+        return value.strip().lower() if value else None
+
+    def text(value):
+        return value.strip() if value else None
+
+    effects = job.get('effects')
+    if not effects and job.get('effect'):
+        effects = [(job['effect'], job.get('intensity', 1.0))]
+    spec = {
+        'template': os.path.abspath(job['template_path']),
+        'top': text(job.get('top_text')),
+        'bottom': text(job.get('bottom_text')),
+        'effects': [[name, round(float(intensity), 3)] for name, intensity in effects or []],
+        'font_size': job.get('font_size'),
+        'font_color': color(job.get('font_color')),
+        'outline_color': color(job.get('outline_color')),
+        'quality': job.get('quality', MAX_QUALITY),
+        'max_bytes': job.get('max_bytes'),
+        'output_format': job.get('output_format'),
+        'seed': job.get('seed'),
+        'layers': job.get('layers'),
+        'auto_place': job.get('auto_place', False),
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _check_deadline(job: Dict[str, Any]):
+    """Abort a job whose caller has already given up on it"""
+    deadline = job.get('deadline')
+    if deadline is not None and time.time() > deadline:
+        raise RenderTimeout("Render job expired before it finished")
+
+def render_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Render a job spec to an encoded image
+
+    This runs inside a worker process, so it only takes and returns plain,
+    picklable values.
+
+    Args:
+        job: Job spec from build_render_job (or build_video_job)
+
+    Returns:
+        Encoded image dictionary from encode_image (data, format, extension,
+        bytes, baseline_bytes...), an animated GIF for animated templates, or
+        an MP4 for video jobs
+    """
+    _check_deadline(job)
+
+    if job.get('kind') == 'video':
+        try:
+            return render_video_job(job, check=lambda: _check_deadline(job))
+        except VideoError as e:
+            raise RenderError(str(e))
+
+    if is_animated_template(job['template_path']):
+        try:
+            return render_animated_job(job, check=lambda: _check_deadline(job))
+        except AnimationTooLargeError as e:
+            raise RenderError(str(e))
+        except ImageTooLargeError as e:
+            raise RenderError(f"Template animation is too large to render: {e}")
+        except ValueError as e:
+            raise RenderError(f"Effects could not be applied: {e}")
+
+    try:
+        img = load_template_image(job['template_path'])
+    except ImageTooLargeError as e:
+        raise RenderError(f"Template image is too large to render: {e}")
+    img = _apply_job_effects(img, job)
+    _check_deadline(job)
+
+    img = _draw_job_captions(img, job)
+    composite_layers(img, job.get('layers'))
+    _check_deadline(job)
+
+    return _encode_job(img, job)
+
+def _apply_job_effects(img: Image.Image, job: Dict[str, Any]) -> Image.Image:
+    """Apply a job's effect chain (or single effect) to the decoded template"""
+    seed = job.get('seed')
+    rng = np.random.default_rng(seed) if seed is not None else None
+
+    if job.get('effects'):
+        try:
+            img = apply_effect_chain(img, job['effects'], rng)
+        except (KeyError, ValueError) as e:
+            raise RenderError(f"Effect chain could not be applied: {e}")
+    elif job.get('effect'):
+        img = apply_effect(img, job['effect'], job.get('intensity', 1.0), rng)
+        if img is None:
+            raise RenderError(f"Effect '{job['effect']}' not found or could not be applied.")
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+    return img
+
+def _job_maps(job: Dict[str, Any]) -> Optional[ImageMaps]:
+    """
+    Get the luminance/edge maps of a job's (possibly styled) template
+
+    Unstyled templates use the maps built at ingestion. Effects change the
+    luminance, so styled images only get maps when they are drawn on many
+    times (batches) and otherwise fall back to scanning the caption area.
+    """
+    if not (job.get('effects') or job.get('effect')):
+        return get_template_maps(job['template_path'])
+    return None
+
+def _draw_job_captions(img: Image.Image, job: Dict[str, Any],
+                       maps: Optional[ImageMaps] = None) -> Image.Image:
+    """Draw a job's top and bottom captions"""
+    maps = maps or _job_maps(job)
+    captions = [(position, job.get(f'{position}_text')) for position in ('top', 'bottom')]
+    captions = [(position, text) for position, text in captions if text]
+    for position, text in captions:
+        img = draw_caption(
+            img,
+            text,
+            position='auto' if job.get('auto_place') and len(captions) == 1 else position,
+            font_size=job.get('font_size'),
+            font_color=job.get('font_color'),
+            outline_color=job.get('outline_color'),
+            maps=maps
+        )
+    return img
+
+def _encode_job(img: Image.Image, job: Dict[str, Any], fmt: Optional[str] = None,
+                report_savings: Optional[bool] = None) -> Dict[str, Any]:
+    """Encode a finished image within the job's byte budget (measuring savings if the job or config asks)"""
+    if report_savings is None:
+        report_savings = job.get('report_savings', REPORT_ENCODE_SAVINGS)
+    return encode_image(
+        img,
+        max_bytes=job.get('max_bytes') or OUTPUT_MAX_BYTES,
+        fmt=fmt or job.get('output_format'),
+        max_quality=job.get('quality', MAX_QUALITY),
+        report_savings=report_savings
+    )
+
+def build_batch_job(
+    template_path: str,
+    captions: List[Dict[str, Any]],
+    effects: Optional[List[Tuple[str, float]]] = None,
+    quality: int = MAX_QUALITY,
+    max_bytes: int = OUTPUT_MAX_BYTES,
+    output_format: Optional[str] = None,
+    layers: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Build the job spec for rendering one template with many captions
+
+    Each item is an ordinary render job, so items can be looked up in and
+    stored to the render cache one by one. All items share one seed, because
+    the effects are applied once for the whole batch.
+
+    Args:
+        template_path: Path to the template image
+        captions: One dict per meme with top_text, bottom_text and optionally
+            font_size, font_color and outline_color
+        effects: Effect chain applied to the template once, before captioning
+        quality: Highest lossy quality the encoder may use
+        max_bytes: Byte budget for each encoded meme
+        output_format: 'JPEG', 'WEBP' or 'PNG' (default: picked once from
+            the first meme and reused for the rest)
+        layers: Watermark and sticker layers drawn on every meme
+            (default: the configured watermark, if any)
+
+    Returns:
+        Batch job spec dictionary
+    """
+    shared = build_render_job(template_path, effects=effects, quality=quality,
+                              max_bytes=max_bytes, output_format=output_format)
+    items = [
+        build_render_job(
+            template_path,
+            top_text=caption.get('top_text'),
+            bottom_text=caption.get('bottom_text'),
+            font_size=caption.get('font_size'),
+            font_color=caption.get('font_color'),
+            outline_color=caption.get('outline_color'),
+            quality=quality,
+            max_bytes=max_bytes,
+            output_format=output_format,
+            effects=effects,
+            seed=shared['seed'],
+            layers=layers
+        )
+        for caption in captions
+    ]
+    return {'kind': 'batch', 'template_path': template_path, 'items': items}
+
+def parse_caption_batch(spec: str) -> List[Dict[str, Any]]:
+    """
+    Parse captions such as 'top one|bottom one; just a top; |just a bottom'
+
+    Memes are separated by ';' and top/bottom text by '|'.
+
+    Raises:
+        ValueError: If no meme has any text
+    """
+    captions = []
+    for part in spec.split(';'):
+        top, _, bottom = part.partition('|')
+        top, bottom = top.strip() or None, bottom.strip() or None
+        if top or bottom:
+            captions.append({'top_text': top, 'bottom_text': bottom})
+    if not captions:
+        raise ValueError("No captions given. Separate memes with ';' and top/bottom text with '|'.")
+    return captions
+
+def render_batch_job(job: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Render one template with many captions
+
+    The template is decoded and its effects applied once; each item then only
+    costs a copy, its captions and the encode. Fonts and layouts come from this
+    worker's caches, so repeated sizes and captions are not measured again.
+
+    Args:
+        job: Batch job spec from build_batch_job
+
+    Returns:
+        Encoded image dictionaries, in item order
+    """
+    _check_deadline(job)
+    items = job['items']
+    if not items:
+        return []
+    if is_animated_template(job['template_path']):
+        # Frames are streamed, so there is no decoded template to share
+        return [render_job(dict(item, deadline=job.get('deadline'))) for item in items]
+
+    try:
+        base = load_template_image(job['template_path'])
+    except ImageTooLargeError as e:
+        raise RenderError(f"Template image is too large to render: {e}")
+    base = _apply_job_effects(base, items[0])
+    maps = _job_maps(items[0]) or ImageMaps.from_image(base)
+
+    results = []
+    fmt = items[0].get('output_format')
+    for item in items:
+        _check_deadline(job)
+        img = composite_layers(_draw_job_captions(base.copy(), item, maps), item.get('layers'))
+        result = _encode_job(img, item, fmt, report_savings=None if not results else False)
+        if results:
+            # Captions barely change the template, so the baseline size is measured once
+            result['baseline_bytes'] = results[0]['baseline_bytes']
+        # ...nor which format suits it best
+        fmt = fmt or result['format']
+        results.append(result)
+    return results
+
+def interaction_time_left(interaction: discord.Interaction) -> float:
+    """
+    Get the seconds left before an interaction token expires
+
+    Args:
+        interaction: The Discord interaction
+
+    Returns:
+        Seconds remaining, minus a grace period for sending the reply
+    """
+    expires_at = interaction.created_at.timestamp() + INTERACTION_TTL
+    return expires_at - INTERACTION_GRACE - time.time()
+
+class RenderEngine:
+    """Bounded process pool for meme rendering"""
+
+    def __init__(self, max_workers: int = RENDER_WORKERS, timeout: float = RENDER_TIMEOUT,
+                 max_pending: int = RENDER_MAX_PENDING):
+        """
+        Initialize the render engine
+
+        Args:
+            max_workers: Number of worker processes
+            timeout: Default per-job timeout in seconds
+            max_pending: Maximum number of queued or running jobs
+        """
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self.max_pending = max(1, max_pending)
+        self.pending = 0
+        self.renders = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+        self.warm_paths = []
+        self._executor = None
+
+    def start(self, warm_paths: Optional[List[str]] = None):
+        """
+        Start the worker pool
+
+        Args:
+            warm_paths: Template paths each worker decodes into its template
+                cache before taking jobs
+        """
+        if warm_paths is not None:
+            self.warm_paths = list(warm_paths)
+        self._get_executor()
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        """Start the worker pool on first use"""
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=warm_template_cache,
+                initargs=(self.warm_paths,)
+            )
+            logging.info(f"Started render engine with {self.max_workers} worker(s)")
+        return self._executor
+
+    async def render(self, job: Dict[str, Any], timeout: Optional[float] = None,
+                     interaction: Optional[discord.Interaction] = None) -> Dict[str, Any]:
+        """
+        Render a job in the worker pool
+
+        Args:
+            job: Job spec from build_render_job
+            timeout: Per-job timeout in seconds (default: engine timeout)
+            interaction: Interaction the render answers; the job is cancelled
+                when its token is about to expire
+
+        Returns:
+            Encoded image dictionary from render_job
+
+        Raises:
+            RenderTimeout: If the job misses its deadline
+            RenderError: If the pool is saturated or a worker fails
+        """
+        result = await self._run(render_job, job, self._timeout(timeout, interaction))
+        self._record_output(result)
+        return result
+
+    async def render_batch(self, job: Dict[str, Any], timeout: Optional[float] = None,
+                           interaction: Optional[discord.Interaction] = None) -> List[Dict[str, Any]]:
+        """
+        Render a batch job in the worker pool
+
+        Large batches are split across workers, each of which decodes the
+        template once for its share of the captions.
+
+        Args:
+            job: Batch job spec from build_batch_job
+            timeout: Timeout in seconds for the whole batch (default: engine timeout)
+            interaction: Interaction the render answers
+
+        Returns:
+            Encoded image dictionaries, in item order
+
+        Raises:
+            RenderTimeout: If the batch misses its deadline
+            RenderError: If the pool is saturated or a worker fails
+        """
+        timeout = self._timeout(timeout, interaction)
+        items = job['items']
+        parts = max(1, min(self.max_workers, len(items) // BATCH_ITEMS_PER_WORKER))
+        size = -(-len(items) // parts)
+        if self.pending + parts > self.max_pending:
+            raise RenderError("The meme renderer is busy. Please try again in a moment.")
+
+        chunks = await asyncio.gather(*(
+            self._run(render_batch_job, dict(job, items=items[i:i + size]), timeout)
+            for i in range(0, len(items), size)
+        ))
+        results = [result for chunk in chunks for result in chunk]
+        for result in results:
+            self._record_output(result)
+        return results
+
+    async def run(self, fn, job: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run another worker function (such as template ingestion) in the pool
+
+        Args:
+            fn: Module-level function taking the job dictionary
+            job: Picklable job dictionary
+            timeout: Timeout in seconds (default: engine timeout)
+
+        Returns:
+            Whatever fn returns
+
+        Raises:
+            RenderTimeout: If the job misses its deadline
+            RenderError: If the pool is saturated or a worker fails
+        """
+        return await self._run(fn, job, self._timeout(timeout, None))
+
+    def _timeout(self, timeout: Optional[float], interaction: Optional[discord.Interaction]) -> float:
+        """Get the time a job may take, capped by the interaction token"""
+        timeout = self.timeout if timeout is None else timeout
+        if interaction is not None:
+            timeout = min(timeout, interaction_time_left(interaction))
+        if timeout <= 0:
+            raise RenderTimeout("Interaction expired before rendering started")
+        return timeout
+
+    async def _run(self, fn, job: Dict[str, Any], timeout: float):
+        """Run a worker function on a job with a deadline"""
+        if self.pending >= self.max_pending:
+            raise RenderError("The meme renderer is busy. Please try again in a moment.")
+
+        # Workers check the deadline between stages and give up on stale jobs
+        job = dict(job, deadline=time.time() + timeout)
+
+        future = self._get_executor().submit(fn, job)
+        self.pending += 1
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise RenderTimeout(f"Rendering took longer than {timeout:.0f}s")
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BrokenProcessPool:
+            logging.error("Render worker crashed, restarting the pool")
+            self.shutdown()
+            raise RenderError("The meme renderer crashed. Please try again.")
+        finally:
+            self.pending -= 1
+
+    def _record_output(self, result: Dict[str, Any]):
+        """Count the bytes a render sends and saves against the old JPEG q95 output"""
+        self.renders += 1
+        self.bytes_sent += result['bytes']
+        saved = 0
+        if result.get('baseline_bytes') is not None:
+            saved = result['baseline_bytes'] - result['bytes']
+            self.bytes_saved += saved
+        width, height = result['size']
+        logging.info(
+            f"Encoded meme as {result['format']} {width}x{height} (quality {result.get('quality')}): "
+            f"{result['bytes']} bytes, {saved} bytes saved"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get render counters
+
+        Returns:
+            Dictionary with pending jobs, renders, bytes sent and bytes saved
+        """
+        return {
+            'pending': self.pending,
+            'renders': self.renders,
+            'bytes_sent': self.bytes_sent,
+            'bytes_saved': self.bytes_saved,
+        }
+
+    def shutdown(self):
+        """Stop the worker pool and drop any queued jobs"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Create a singleton instance
+render_engine = RenderEngine()
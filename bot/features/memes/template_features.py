@@ -0,0 +1,276 @@
+"""
+Template Feature Index
+
+Every template is reduced to a short, unit-length feature vector: a coarse
+color histogram plus a grid of gradient strength. The vectors of all
+templates are kept as one contiguous float32 matrix saved under the cache
+directory, so "templates similar to this one" is a single matrix-vector
+product (cosine similarity) instead of comparing images.
+
+The matrix is memory-mapped on startup rather than recomputed, and is
+updated as templates are added and deleted; a backfill of many templates
+is saved once.
+"""
+
+import os
+import logging
+import threading
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from bot.core.config import CACHE_DIR
+from bot.utils.image_loader import load_image
+
+FEATURE_DIR = os.path.join(CACHE_DIR, 'features')
+
+# Side of the square image features are computed from
+FEATURE_IMAGE_SIZE = 64
+
+# Color levels per channel (4 -> 64 histogram bins)
+COLOR_LEVELS = 4
+
+# Cells per side of the gradient grid (8 -> 64 values)
+GRADIENT_GRID = 8
+
+FEATURE_DIMS = COLOR_LEVELS ** 3 + GRADIENT_GRID ** 2
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    """Scale a vector to unit length (zero vectors stay zero)"""
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def image_features(img: Image.Image) -> np.ndarray:
+    """
+    Get the feature vector of an image
+
+    The color histogram is square-rooted (so the dot product of two is the
+    Bhattacharyya coefficient), and the gradient grid is mean-centred (so
+    the dot product of two is their correlation). Both halves are unit
+    length and weigh the same.
+
+    Args:
+        img: The image
+
+    Returns:
+        Unit-length float32 vector of FEATURE_DIMS values
+    """
+    size = FEATURE_IMAGE_SIZE
+    small = img.convert('RGB').resize((size + 1, size + 1), Image.BOX)
+
+    levels = np.asarray(small, dtype=np.uint16)[:size, :size] * COLOR_LEVELS // 256
+    bins = (levels[..., 0] * COLOR_LEVELS + levels[..., 1]) * COLOR_LEVELS + levels[..., 2]
+    histogram = np.bincount(bins.ravel(), minlength=COLOR_LEVELS ** 3).astype(np.float32)
+    color = np.sqrt(histogram / histogram.sum())
+
+    gray = np.asarray(small.convert('L'), dtype=np.float32)
+    gx = gray[:-1, 1:] - gray[:-1, :-1]
+    gy = gray[1:, :-1] - gray[:-1, :-1]
+    cell = size // GRADIENT_GRID
+    grid = np.hypot(gx, gy).reshape(GRADIENT_GRID, cell, GRADIENT_GRID, cell).mean(axis=(1, 3))
+    gradient = _unit(grid.ravel() - grid.mean())
+
+    return _unit(np.concatenate([_unit(color), gradient])).astype(np.float32)
+
+def template_features(file_path: str) -> np.ndarray:
+    """
+    Decode a template at a small size and get its feature vector
+
+    Args:
+        file_path: Path to the template image
+
+    Returns:
+        The feature vector
+    """
+    return image_features(load_image(file_path, max_size=(FEATURE_IMAGE_SIZE * 4, FEATURE_IMAGE_SIZE * 4)))
+
+class TemplateFeatureIndex:
+    """
+    Feature vectors of every template as one memory-mapped matrix
+
+    Row i of features.npy belongs to the template ID at position i of
+    ids.npy. Both files are replaced atomically on every change; the
+    matrix is read back with mmap_mode so pages are shared and loaded on
+    demand.
+    """
+
+    def __init__(self, directory: str = None):
+        """
+        Initialize the index
+
+        Args:
+            directory: Where the matrix is saved (defaults to FEATURE_DIR)
+        """
+        self.directory = directory
+        self._matrix = None
+        self._ids = None
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory or FEATURE_DIR, name)
+
+    def _load(self):
+        """Map the saved matrix on first use (caller holds the lock)"""
+        if self._ids is not None:
+            return
+        try:
+            ids = np.load(self._path('ids.npy'))
+            matrix = np.load(self._path('features.npy'), mmap_mode='r')
+            if matrix.shape != (len(ids), FEATURE_DIMS):
+                raise ValueError(f"feature matrix shape {matrix.shape} does not match {len(ids)} IDs")
+        except FileNotFoundError:
+            ids, matrix = np.zeros(0, dtype=np.int64), np.zeros((0, FEATURE_DIMS), dtype=np.float32)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding template feature index: {e}")
+            ids, matrix = np.zeros(0, dtype=np.int64), np.zeros((0, FEATURE_DIMS), dtype=np.float32)
+        self._set(ids, matrix)
+
+    def _set(self, ids: np.ndarray, matrix: np.ndarray):
+        self._ids, self._matrix = ids, matrix
+        self._rows = {int(template_id): row for row, template_id in enumerate(ids)}
+
+    def _save(self, ids: np.ndarray, matrix: np.ndarray):
+        """Replace the saved matrix and map the new one (caller holds the lock)"""
+        directory = self.directory or FEATURE_DIR
+        os.makedirs(directory, exist_ok=True)
+        # Drop the old mapping first so the file can be replaced on every platform
+        self._matrix = None
+        for name, array in (('features.npy', matrix), ('ids.npy', ids)):
+            temp_path = self._path(f"{name}.{os.getpid()}.tmp.npy")
+            np.save(temp_path, array)
+            os.replace(temp_path, self._path(name))
+        self._set(ids, np.load(self._path('features.npy'), mmap_mode='r'))
+
+    def add(self, template_id: int, vector: np.ndarray):
+        """
+        Store the feature vector of a template (replacing any earlier one)
+
+        Args:
+            template_id: The template's ID
+            vector: Its feature vector
+        """
+        self.add_many([(template_id, vector)])
+
+    def add_many(self, items: Iterable[Tuple[int, np.ndarray]]) -> int:
+        """
+        Store the feature vectors of many templates, saving the matrix once
+
+        Args:
+            items: (template ID, feature vector) pairs; a later vector for
+                the same ID replaces an earlier one
+
+        Returns:
+            Number of vectors stored
+        """
+        vectors = {int(template_id): np.asarray(vector, dtype=np.float32).reshape(FEATURE_DIMS)
+                   for template_id, vector in items}
+        if not vectors:
+            return 0
+        with self._lock:
+            self._load()
+            matrix, ids = np.array(self._matrix), self._ids
+            new_ids = [template_id for template_id in vectors if template_id not in self._rows]
+            for template_id, vector in vectors.items():
+                row = self._rows.get(template_id)
+                if row is not None:
+                    matrix[row] = vector
+            if new_ids:
+                matrix = np.concatenate([matrix, np.stack([vectors[template_id] for template_id in new_ids])])
+                ids = np.append(ids, np.array(new_ids, dtype=np.int64))
+            self._save(ids, matrix)
+        return len(vectors)
+
+    def remove(self, template_id: int) -> bool:
+        """
+        Forget a template
+
+        Returns:
+            True if the template was in the index
+        """
+        with self._lock:
+            self._load()
+            row = self._rows.get(int(template_id))
+            if row is None:
+                return False
+            self._save(np.delete(self._ids, row), np.delete(self._matrix, row, axis=0))
+            return True
+
+    def ids(self) -> List[int]:
+        """Get the IDs of every indexed template"""
+        with self._lock:
+            self._load()
+            return [int(template_id) for template_id in self._ids]
+
+    def search(self, vector: np.ndarray, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Find the templates most similar to a feature vector
+
+        Args:
+            vector: Feature vector to compare against
+            k: Number of templates to return
+            exclude: Template ID to leave out (usually the query's own)
+
+        Returns:
+            List of (template ID, cosine similarity), most similar first
+        """
+        with self._lock:
+            self._load()
+            matrix, ids, rows = self._matrix, self._ids, self._rows
+        if not len(ids) or k <= 0:
+            return []
+
+        scores = matrix @ np.asarray(vector, dtype=np.float32)
+        if exclude is not None and int(exclude) in rows:
+            scores[rows[int(exclude)]] = -np.inf
+        k = min(k, len(ids) - (exclude is not None and int(exclude) in rows))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(ids[row]), float(scores[row])) for row in top]
+
+    def similar(self, template_id: int, k: int) -> List[Tuple[int, float]]:
+        """
+        Find the templates most similar to an indexed template
+
+        Args:
+            template_id: The template to compare against
+            k: Number of templates to return
+
+        Returns:
+            List of (template ID, cosine similarity), most similar first
+            (empty if the template is not indexed)
+        """
+        with self._lock:
+            self._load()
+            row = self._rows.get(int(template_id))
+            vector = None if row is None else np.array(self._matrix[row])
+        if vector is None:
+            return []
+        return self.search(vector, k, exclude=template_id)
+
+    def clear_cache(self):
+        """Drop the mapping (the matrix is mapped again on next use)"""
+        with self._lock:
+            self._matrix, self._ids, self._rows = None, None, {}
+
+# Create a singleton instance
+feature_index = TemplateFeatureIndex()
+
+def index_template(template_id: int, file_path: str) -> bool:
+    """
+    Compute a template's features and add them to the index
+
+    Args:
+        template_id: The template's ID
+        file_path: Path to the template image
+
+    Returns:
+        True if the template was indexed
+    """
+    try:
+        feature_index.add(template_id, template_features(file_path))
+        return True
+    except Exception as e:
+        logging.warning(f"Could not index features of template {template_id}: {e}")
+        return False
@@ -0,0 +1,226 @@
+"""
+Template Ingestion
+
+Uploaded templates go through one pipeline before they are added:
+
+1. The attachment is streamed to a temporary file, stopping as soon as it
+   goes over the byte cap.
+2. A render worker checks the image, applies its EXIF orientation, converts
+   it to RGB (or RGBA when it has transparency), shrinks it to the maximum
+   template size and re-encodes it without metadata. Animated templates are
+   kept as uploaded.
+3. The result is stored under its SHA-256 with an atomic rename, so the
+   same image uploaded twice is stored once and a name can never overwrite
+   another template's file.
+
+The worker also returns the perceptual hash and feature vector of the image
+and builds its caption maps, so nothing decodes the template again to add it.
+"""
+
+import os
+import io
+import asyncio
+import hashlib
+import logging
+import tempfile
+import contextlib
+from typing import Dict, Any
+import aiohttp
+import discord
+from PIL import Image
+from bot.core.config import TEMPLATE_DIR, IMAGE_MAX_BYTES, TEMPLATE_MAX_DIMENSION
+from bot.utils.image_loader import load_image, get_image_size, ImageTooLargeError
+from bot.utils.image_hash import dhash
+from bot.features.memes.template_features import image_features
+from bot.features.memes.template_maps import generate_template_maps
+from bot.features.memes.render_engine import render_engine
+
+# Seconds allowed to download an attachment
+DOWNLOAD_TIMEOUT = 30
+
+# Bytes read from the download stream at a time
+DOWNLOAD_CHUNK = 64 * 1024
+
+# JPEG quality for re-encoded JPEG templates
+TEMPLATE_JPEG_QUALITY = 95
+
+# Transposes for EXIF orientations 2 to 8
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Extensions of stored templates by format
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+class IngestError(ValueError):
+    """Raised when an upload cannot be used as a template (the message is shown to the user)"""
+    pass
+
+def incoming_dir(template_dir: str = TEMPLATE_DIR) -> str:
+    """Get the directory uploads are streamed into (on the same disk as the templates)"""
+    return os.path.join(template_dir, '.incoming')
+
+def content_path(digest: str, extension: str, template_dir: str = TEMPLATE_DIR) -> str:
+    """Get the path a template with the given SHA-256 is stored at"""
+    return os.path.join(template_dir, f"{digest[:32]}{extension}")
+
+async def download_attachment(attachment: discord.Attachment, max_bytes: int = IMAGE_MAX_BYTES,
+                              template_dir: str = TEMPLATE_DIR) -> str:
+    """
+    Stream an attachment to a temporary file
+
+    Args:
+        attachment: The Discord attachment
+        max_bytes: Largest download accepted
+        template_dir: Templates directory (the file goes in its incoming folder)
+
+    Returns:
+        Path to the temporary file (the caller removes it)
+
+    Raises:
+        IngestError: If the file is too large or cannot be downloaded
+    """
+    too_large = f"That image is too large. Templates can be up to {max_bytes // (1024 * 1024)} MB."
+    if attachment.size > max_bytes:
+        raise IngestError(too_large)
+
+    os.makedirs(incoming_dir(template_dir), exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=incoming_dir(template_dir), suffix='.part')
+    received = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            timeout = aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(attachment.url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK):
+                        received += len(chunk)
+                        if received > max_bytes:
+                            raise IngestError(too_large)
+                        f.write(chunk)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        os.remove(path)
+        logging.error(f"Error downloading template {attachment.filename}: {e}")
+        raise IngestError("Failed to download the template image. Please try again.")
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+def _store(data: bytes, extension: str, template_dir: str) -> Dict[str, str]:
+    """Write bytes under their SHA-256, unless an identical file is already stored"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = content_path(digest, extension, template_dir)
+    if not os.path.exists(path):
+        fd, temp_path = tempfile.mkstemp(dir=template_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            raise
+    return {'file_path': path, 'content_hash': digest}
+
+def normalize_template(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate, normalize and store an uploaded template
+
+    This runs inside a render worker.
+
+    Args:
+        job: {'source': downloaded file, 'template_dir': where templates are
+            stored, 'max_dimension': longest side kept}
+
+    Returns:
+        Dictionary with file_path, content_hash, width, height, format,
+        image_hash (dHash) and features (feature vector)
+
+    Raises:
+        IngestError: If the upload is not an image we can use
+    """
+    source = job['source']
+    template_dir = job.get('template_dir', TEMPLATE_DIR)
+    max_dimension = job.get('max_dimension', TEMPLATE_MAX_DIMENSION)
+
+    try:
+        get_image_size(source)
+        with Image.open(source) as im:
+            fmt = im.format
+            orientation = im.getexif().get(0x0112, 1)
+            alpha = 'A' in im.getbands() or 'transparency' in im.info
+            animated = getattr(im, 'is_animated', False)
+        img = load_image(source, max_size=(max_dimension, max_dimension), mode='RGBA' if alpha else 'RGB')
+    except ImageTooLargeError as e:
+        raise IngestError(f"That image is too large to use as a template: {e}")
+    except (OSError, SyntaxError, ValueError) as e:
+        logging.warning(f"Rejected template upload {source}: {e}")
+        raise IngestError("That file is not an image that can be used as a template.")
+
+    if animated and fmt in FORMAT_EXTENSIONS:
+        # Frames are checked and scaled when the template is rendered
+        with open(source, 'rb') as f:
+            stored = _store(f.read(), FORMAT_EXTENSIONS[fmt], template_dir)
+        width, height = get_image_size(source)
+    else:
+        if orientation in ORIENTATION_TRANSPOSE:
+            img = img.transpose(ORIENTATION_TRANSPOSE[orientation])
+        if alpha and img.getchannel('A').getextrema()[0] == 255:
+            img = img.convert('RGB')
+
+        # Photos (JPEG, or MPO from phone cameras) stay JPEG; everything else is lossless
+        out_format = 'JPEG' if fmt in ('JPEG', 'MPO') and img.mode == 'RGB' else 'PNG'
+        buffer = io.BytesIO()
+        if out_format == 'JPEG':
+            img.save(buffer, format='JPEG', quality=TEMPLATE_JPEG_QUALITY, optimize=True)
+        else:
+            img.save(buffer, format='PNG')
+        stored = _store(buffer.getvalue(), FORMAT_EXTENSIONS[out_format], template_dir)
+        width, height = img.size
+        fmt = out_format
+
+    try:
+        generate_template_maps(stored['file_path'])
+    except Exception as e:
+        logging.warning(f"Could not build maps for template {stored['file_path']}: {e}")
+
+    return dict(
+        stored,
+        width=width,
+        height=height,
+        format=fmt,
+        image_hash=dhash(img),
+        features=image_features(img)
+    )
+
+async def ingest_attachment(attachment: discord.Attachment) -> Dict[str, Any]:
+    """
+    Download an attachment and run it through the ingestion worker
+
+    Args:
+        attachment: The Discord attachment
+
+    Returns:
+        The stored template from normalize_template
+
+    Raises:
+        IngestError: If the upload cannot be used as a template
+        RenderError: If the worker pool is busy or the worker fails
+    """
+    source = await download_attachment(attachment)
+    try:
+        return await render_engine.run(normalize_template, {
+            'source': source,
+            'template_dir': TEMPLATE_DIR,
+            'max_dimension': TEMPLATE_MAX_DIMENSION
+        })
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(source)
@@ -8,10 +8,181 @@ and retrieving templates from the database.
 import os
 import logging
 import sqlite3
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple, Any
+import numpy as np
 from PIL import Image
 import discord
-from bot.core.config import TEMPLATE_DIR, DB_PATH
+from bot.core.config import TEMPLATE_DIR, DB_PATH, TEMPLATE_CACHE_MAX_BYTES
+from bot.utils.image_loader import load_image, get_image_size
+from bot.features.memes.template_maps import delete_template_maps
+from bot.features.memes.template_features import feature_index, template_features
+from bot.features.memes.template_search import template_names
+from bot.utils.image_hash import hash_index, hash_image
+
+class TemplateImageCache:
+    """
+    Memory-bounded LRU cache of decoded RGB template images
+
+    Entries are keyed by file path and stamped with the file's mtime and size,
+    so a template that changes on disk is re-decoded even in a process that
+    never saw the change happen.
+    """
+
+    def __init__(self, max_bytes: int = TEMPLATE_CACHE_MAX_BYTES):
+        """
+        Initialize the cache
+
+        Args:
+            max_bytes: Upper bound on the total pixel bytes held
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(file_path: str) -> Tuple[int, int]:
+        """Get the (mtime, size) pair used to detect changed files"""
+        st = os.stat(file_path)
+        return st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def _image_bytes(img: Image.Image) -> int:
+        """Get the size of an image's pixel buffer"""
+        return img.width * img.height * len(img.getbands())
+
+    def get(self, file_path: str) -> Image.Image:
+        """
+        Get a decoded RGB copy of a template image
+
+        The returned image is a private copy, so callers may draw on it.
+
+        Args:
+            file_path: Path to the template image
+
+        Returns:
+            The decoded image
+        """
+        key = os.path.abspath(file_path)
+        stamp = self._stamp(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1].copy()
+            if entry:
+                self._remove(key)
+            self.misses += 1
+
+        img = load_image(key)
+
+        self._put(key, stamp, img)
+        return img.copy()
+
+    def _put(self, key: str, stamp: Tuple[int, int], img: Image.Image):
+        """Store a decoded image, evicting least recently used entries"""
+        size = self._image_bytes(img)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            self._entries[key] = (stamp, img, size)
+            self.current_bytes += size
+
+    def _remove(self, key: str):
+        """Drop an entry (caller holds the lock)"""
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def invalidate(self, file_path: str):
+        """
+        Drop a template from the cache
+
+        Args:
+            file_path: Path to the template image
+        """
+        key = os.path.abspath(file_path)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Drop every cached template"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def warm(self, file_paths: List[str]) -> int:
+        """
+        Decode templates ahead of their first request
+
+        Args:
+            file_paths: Template paths, most important first
+
+        Returns:
+            Number of templates now cached
+        """
+        warmed = 0
+        for file_path in file_paths:
+            try:
+                key = os.path.abspath(file_path)
+                if key not in self._entries:
+                    self._put(key, self._stamp(key), load_image(key))
+                warmed += 1
+            except Exception as e:
+                logging.warning(f"Could not pre-warm template {file_path}: {e}")
+        return warmed
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hits, misses, evictions, entries, bytes and hit rate
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+# Create a singleton instance (one per process, so each render worker has its own)
+template_cache = TemplateImageCache()
+
+def load_template_image(file_path: str) -> Image.Image:
+    """
+    Load a template as a decoded RGB image, using the template cache
+
+    Args:
+        file_path: Path to the template image
+
+    Returns:
+        A private copy of the decoded image
+    """
+    return template_cache.get(file_path)
+
+def warm_template_cache(file_paths: List[str]):
+    """Pre-warm this process's template cache (used as a worker initializer)"""
+    warmed = template_cache.warm(file_paths)
+    logging.info(f"Pre-warmed {warmed} template(s) in process {os.getpid()}")
 
 def init_templates_dir():
     """Initialize the templates directory if it doesn't exist"""
@@ -31,7 +202,7 @@ def get_template_list() -> List[Dict[str, Any]]:
     c = conn.cursor()
 
     c.execute("""
-    SELECT id, name, file_path, creator_id, creator_name, width, height, created_at
+    SELECT id, name, file_path, creator_id, creator_name, width, height, usage_count, created_at
     FROM templates
     ORDER BY name
     """)
@@ -56,7 +227,7 @@ def get_template_by_name(name: str) -> Optional[Dict[str, Any]]:
     c = conn.cursor()
 
     c.execute("""
-    SELECT id, name, file_path, creator_id, creator_name, width, height, created_at
+    SELECT id, name, file_path, creator_id, creator_name, width, height, usage_count, created_at
     FROM templates
     WHERE name = ?
     """, (name,))
@@ -83,7 +254,7 @@ def get_template_by_id(template_id: int) -> Optional[Dict[str, Any]]:
     c = conn.cursor()
 
     c.execute("""
-    SELECT id, name, file_path, creator_id, creator_name, width, height, created_at
+    SELECT id, name, file_path, creator_id, creator_name, width, height, usage_count, created_at
     FROM templates
     WHERE id = ?
     """, (template_id,))
@@ -95,38 +266,129 @@ def get_template_by_id(template_id: int) -> Optional[Dict[str, Any]]:
         return dict(row)
     return None
 
-def add_template(name: str, file_path: str, creator_id: str, creator_name: str) -> int:
+def get_most_used_templates(limit: int = 8) -> List[Dict[str, Any]]:
+    """
+    Get the most frequently used templates
+
+    Args:
+        limit: Maximum number of templates to return
+
+    Returns:
+        List of template dictionaries, most used first
+    """
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+
+    c.execute("""
+    SELECT id, name, file_path, creator_id, creator_name, width, height, usage_count, created_at
+    FROM templates
+    ORDER BY usage_count DESC, id
+    LIMIT ?
+    """, (limit,))
+
+    templates = [dict(row) for row in c.fetchall()]
+    conn.close()
+
+    return templates
+
+def search_template_names(query: str, limit: int = 25) -> List[Dict[str, Any]]:
+    """
+    Find templates by partial name for autocomplete
+
+    The name index is loaded from the database on first use and kept in
+    step with later inserts, deletes and uses.
+
+    Args:
+        query: What the user has typed so far
+        limit: Maximum number of templates to return
+
+    Returns:
+        Template dictionaries with id, name and usage_count, best first
+    """
+    if not template_names.ready:
+        template_names.load(get_template_list())
+    return template_names.search(query, limit)
+
+def record_template_use(template_id: int):
+    """
+    Increment a template's usage counter
+
+    Args:
+        template_id: The ID of the template
+    """
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+
+    c.execute("UPDATE templates SET usage_count = usage_count + 1 WHERE id = ?", (template_id,))
+
+    conn.commit()
+    conn.close()
+
+    template_names.record_use(template_id)
+
+def add_template(name: str, file_path: str, creator_id: str, creator_name: str,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 content_hash: Optional[str] = None, image_hash: Optional[int] = None,
+                 features: Optional[np.ndarray] = None) -> int:
     """
     Add a new template to the database
 
+    The template row and its perceptual hash are written in one transaction;
+    the feature index is updated once it commits.
+
     Args:
         name: The name of the template
         file_path: The path to the template image
         creator_id: The Discord ID of the creator
         creator_name: The Discord name of the creator
+        width: Image width (read from the file header if not given)
+        height: Image height
+        content_hash: SHA-256 of the stored file
+        image_hash: Perceptual hash for the duplicate index
+        features: Feature vector for the similarity index (computed from the
+            file if not given)
 
     Returns:
         The ID of the newly created template
     """
-    # Get image dimensions
-    try:
-        with Image.open(file_path) as img:
-            width, height = img.size
-    except Exception as e:
-        logging.error(f"Error getting image dimensions: {e}")
-        width, height = 0, 0
+    if width is None or height is None:
+        # Get image dimensions (from the header only)
+        try:
+            width, height = get_image_size(file_path)
+        except Exception as e:
+            logging.error(f"Error getting image dimensions: {e}")
+            width, height = 0, 0
 
     conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    try:
+        c = conn.cursor()
 
-    c.execute("""
-    INSERT INTO templates (name, file_path, creator_id, creator_name, width, height)
-    VALUES (?, ?, ?, ?, ?, ?)
-    """, (name, file_path, creator_id, creator_name, width, height))
+        c.execute("""
+        INSERT INTO templates (name, file_path, creator_id, creator_name, width, height, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (name, file_path, creator_id, creator_name, width, height, content_hash))
 
-    template_id = c.lastrowid
-    conn.commit()
-    conn.close()
+        template_id = c.lastrowid
+        if image_hash is not None:
+            hash_index.add('template', template_id, image_hash, conn=conn)
+        conn.commit()
+    finally:
+        conn.close()
+    # Only searchable once the row is committed
+    if image_hash is not None:
+        hash_index.note('template', template_id, image_hash)
+    if features is None:
+        try:
+            features = template_features(file_path)
+        except Exception as e:
+            logging.warning(f"Could not index features of template {template_id}: {e}")
+    if features is not None:
+        feature_index.add(template_id, features)
+
+    # A new template may reuse the path of an old file
+    template_cache.invalidate(file_path)
+    template_names.add(template_id, name)
 
     return template_id
 
@@ -152,11 +414,17 @@ def delete_template(template_id: int) -> bool:
         # Delete the template from the database
         c.execute("DELETE FROM templates WHERE id = ?", (template_id,))
         conn.commit()
+        template_names.remove(template_id)
 
-        # Delete the file if it exists
+        # Delete the file unless another template uses the same image
         file_path = template['file_path']
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        release_template_file(file_path)
+
+        # Imported here because the thumbnail module builds on this one
+        from bot.features.memes.template_thumbnails import delete_thumbnails
+        delete_thumbnails(template_id)
+        hash_index.remove('template', template_id)
+        feature_index.remove(template_id)
 
         return True
     except Exception as e:
@@ -165,6 +433,74 @@ def delete_template(template_id: int) -> bool:
     finally:
         conn.close()
 
+def release_template_file(file_path: str) -> bool:
+    """
+    Delete a template file and its maps once no template uses it
+
+    Template files are stored by content, so several templates can share one.
+
+    Args:
+        file_path: Path to the template image
+
+    Returns:
+        True if the file was deleted
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        users = conn.execute("SELECT COUNT(*) FROM templates WHERE file_path = ?", (file_path,)).fetchone()[0]
+    finally:
+        conn.close()
+    if users:
+        return False
+
+    template_cache.invalidate(file_path)
+    delete_template_maps(file_path)
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+def index_template_hashes() -> int:
+    """
+    Hash every template that is not in the perceptual hash index yet
+
+    Returns:
+        Number of templates hashed
+    """
+    indexed = hash_index.refs('template')
+    hashed = 0
+    for template in get_template_list():
+        if str(template['id']) in indexed or not os.path.exists(template['file_path']):
+            continue
+        try:
+            hash_index.add('template', template['id'], hash_image(template['file_path']))
+            hashed += 1
+        except Exception as e:
+            logging.warning(f"Could not hash template {template['id']}: {e}")
+    return hashed
+
+def index_template_features() -> int:
+    """
+    Add every template that is not in the feature index yet
+
+    The new vectors are saved to the index together, so a large backfill
+    writes the matrix once.
+
+    Returns:
+        Number of templates indexed
+    """
+    indexed = set(feature_index.ids())
+    vectors = []
+    for template in get_template_list():
+        if template['id'] in indexed or not os.path.exists(template['file_path']):
+            continue
+        try:
+            vectors.append((template['id'], template_features(template['file_path'])))
+        except Exception as e:
+            logging.warning(f"Could not index features of template {template['id']}: {e}")
+    return feature_index.add_many(vectors)
+
 def create_template_embed(template: Dict[str, Any], bot_user: discord.User = None) -> discord.Embed:
     """
     Create a Discord embed for a template
@@ -243,37 +579,3 @@ def get_template_file(template_name_or_id: str) -> Optional[str]:
             return template['file_path']
 
     return None
-
-async def save_template_image(attachment: discord.Attachment, template_name: str) -> Optional[str]:
-    """
-    Save a template image from a Discord attachment
-
-    Args:
-        attachment: The Discord attachment
-        template_name: The name to give the template
-
-    Returns:
-        The file path where the image was saved, or None if failed
-    """
-    # Initialize templates directory
-    init_templates_dir()
-
-    # Clean template name for filename
-    clean_name = "".join(c if c.isalnum() or c in "._- " else "_" for c in template_name)
-    clean_name = clean_name.lower().replace(" ", "_")
-
-    # Get file extension from attachment
-    _, ext = os.path.splitext(attachment.filename)
-    if not ext:
-        ext = ".jpg"  # Default extension
-
-    # Create file path
-    file_path = os.path.join(TEMPLATE_DIR, f"{clean_name}{ext}")
-
-    try:
-        # Save the attachment
-        await attachment.save(file_path)
-        return file_path
-    except Exception as e:
-        logging.error(f"Error saving template image: {e}")
-        return None
@@ -0,0 +1,153 @@
+"""
+Template Luminance and Edge Maps
+
+Every template gets a summed-area table of luminance and one of edge pixels
+(see bot.utils.image_maps), built once when the template is ingested and
+saved next to its thumbnails. Render workers keep recently used maps in
+memory, so auto-contrast caption colors and caption placement are answered
+from the maps instead of scanning pixels for each meme.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import numpy as np
+from bot.core.config import CACHE_DIR
+from bot.utils.image_loader import load_image
+from bot.utils.image_maps import ImageMaps, MAP_SIZE
+
+MAP_DIR = os.path.join(CACHE_DIR, 'maps')
+
+# Number of templates whose maps each process keeps in memory (~1 MB each)
+MAX_MAPS = 64
+
+def maps_path(file_path: str) -> str:
+    """Get the path the maps of a template file are saved to"""
+    digest = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(MAP_DIR, f"{digest}.npz")
+
+def generate_template_maps(file_path: str) -> ImageMaps:
+    """
+    Build and save the maps of a template
+
+    Args:
+        file_path: Path to the template image
+
+    Returns:
+        The maps
+    """
+    maps = ImageMaps.from_image(load_image(file_path, max_size=(MAP_SIZE, MAP_SIZE)))
+    os.makedirs(MAP_DIR, exist_ok=True)
+    path = maps_path(file_path)
+    temp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(temp_path, luma=maps.luma, edges=maps.edges)
+    os.replace(temp_path, path)
+    return maps
+
+def load_template_maps(file_path: str) -> Optional[ImageMaps]:
+    """
+    Load the saved maps of a template if they are newer than the template
+
+    Args:
+        file_path: Path to the template image
+
+    Returns:
+        The maps, or None if they are missing or stale
+    """
+    path = maps_path(file_path)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(file_path):
+            return None
+        with np.load(path) as data:
+            return ImageMaps(data['luma'], data['edges'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+def delete_template_maps(file_path: str):
+    """Remove the saved maps of a template"""
+    try:
+        os.remove(maps_path(file_path))
+    except FileNotFoundError:
+        pass
+
+class TemplateMapCache:
+    """
+    LRU cache of template maps, keyed by file path and stamped with the
+    file's mtime and size like the template image cache
+    """
+
+    def __init__(self, max_entries: int = MAX_MAPS):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, file_path: str) -> ImageMaps:
+        """
+        Get the maps of a template, loading or building them on a miss
+
+        Args:
+            file_path: Path to the template image
+
+        Returns:
+            The maps
+        """
+        key = os.path.abspath(file_path)
+        st = os.stat(key)
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        maps = load_template_maps(key)
+        if maps is None:
+            maps = generate_template_maps(key)
+
+        with self._lock:
+            self._entries[key] = (stamp, maps)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return maps
+
+    def clear(self):
+        """Drop every cached map"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hits, misses and entries
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+# Create a singleton instance (one per process, so each render worker has its own)
+template_map_cache = TemplateMapCache()
+
+def get_template_maps(file_path: str) -> Optional[ImageMaps]:
+    """
+    Get the maps of a template, using the map cache
+
+    Args:
+        file_path: Path to the template image
+
+    Returns:
+        The maps, or None if they could not be built
+    """
+    try:
+        return template_map_cache.get(file_path)
+    except Exception as e:
+        logging.error(f"Error building maps for template {file_path}: {e}")
+        return None
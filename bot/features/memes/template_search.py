@@ -0,0 +1,167 @@
+"""
+Template Name Search
+
+An in-memory index of template names for slash command autocomplete. Names
+are kept in a prefix trie (the whole name and every word in it) and a
+trigram index for typos and mid-word fragments, so each keystroke is
+answered from memory without querying SQLite.
+
+Results are ranked by how they match (start of the name, start of a word,
+then shared trigrams) and then by how often the template is used.
+"""
+
+import heapq
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Set
+
+# Share of a query's trigrams a name must contain to be a fuzzy match
+MIN_TRIGRAM_SCORE = 0.4
+
+def normalize_name(name: str) -> str:
+    """Case-fold a name and collapse its whitespace"""
+    return " ".join(name.casefold().split())
+
+def trigrams(text: str) -> Set[str]:
+    """Get the trigrams of a normalized string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def word_starts(text: str) -> List[int]:
+    """Get the offsets where words start in a normalized string"""
+    return [i for i, ch in enumerate(text) if ch.isalnum() and (i == 0 or not text[i - 1].isalnum())]
+
+class TemplateNameIndex:
+    """
+    Prefix trie and trigram index over template names
+
+    Each trie node is [children by character, template IDs below it]. Every
+    word of a name is inserted from its start to the end of the name, so
+    "drake" finds "hotline drake" as well as "drake yes".
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._root = [{}, set()]
+        self._trigrams: Dict[str, Set[int]] = {}
+        self._templates: Dict[int, Dict[str, Any]] = {}
+        self._by_usage = None
+        self._lock = threading.Lock()
+
+    def load(self, templates: Iterable[Dict[str, Any]]):
+        """
+        Replace the index with a list of templates
+
+        Args:
+            templates: Template dictionaries with id, name and usage_count
+        """
+        with self._lock:
+            self._root = [{}, set()]
+            self._trigrams = {}
+            self._templates = {}
+            for template in templates:
+                self._add(template['id'], template['name'], template.get('usage_count') or 0)
+            self._by_usage = None
+            self.ready = True
+
+    def _add(self, template_id: int, name: str, usage_count: int):
+        """Index a template (caller holds the lock)"""
+        key = normalize_name(name)
+        self._templates[template_id] = {'id': template_id, 'name': name, 'key': key, 'usage_count': usage_count}
+        for start in word_starts(key):
+            node = self._root
+            for ch in key[start:]:
+                node = node[0].setdefault(ch, [{}, set()])
+                node[1].add(template_id)
+        for gram in trigrams(key):
+            self._trigrams.setdefault(gram, set()).add(template_id)
+
+    def _remove(self, template_id: int):
+        """Drop a template from the index (caller holds the lock)"""
+        template = self._templates.pop(template_id, None)
+        if template is None:
+            return
+        key = template['key']
+        for start in word_starts(key):
+            path = [self._root]
+            for ch in key[start:]:
+                node = path[-1][0].get(ch)
+                if node is None:
+                    break
+                node[1].discard(template_id)
+                path.append(node)
+            # Prune nodes no template passes through any more
+            for depth in range(len(path) - 1, 0, -1):
+                if path[depth][1]:
+                    break
+                del path[depth - 1][0][key[start + depth - 1]]
+        for gram in trigrams(key):
+            ids = self._trigrams.get(gram)
+            if ids is not None:
+                ids.discard(template_id)
+                if not ids:
+                    del self._trigrams[gram]
+
+    def add(self, template_id: int, name: str, usage_count: int = 0):
+        """Index a new or renamed template"""
+        with self._lock:
+            self._remove(template_id)
+            self._add(template_id, name, usage_count)
+            self._by_usage = None
+
+    def remove(self, template_id: int):
+        """Forget a deleted template"""
+        with self._lock:
+            self._remove(template_id)
+            self._by_usage = None
+
+    def record_use(self, template_id: int):
+        """Count a use of a template towards its ranking"""
+        with self._lock:
+            template = self._templates.get(template_id)
+            if template is not None:
+                template['usage_count'] += 1
+                self._by_usage = None
+
+    def _rank_key(self, template_id: int):
+        template = self._templates[template_id]
+        return -template['usage_count'], template['key']
+
+    def search(self, query: str, limit: int = 25) -> List[Dict[str, Any]]:
+        """
+        Find templates whose names match what the user has typed so far
+
+        Args:
+            query: The partial name
+            limit: Most templates to return
+
+        Returns:
+            Template dictionaries with id, name and usage_count, best first
+        """
+        query = normalize_name(query)
+        with self._lock:
+            if not query:
+                if self._by_usage is None:
+                    self._by_usage = sorted(self._templates, key=self._rank_key)
+                ranked = self._by_usage[:limit]
+            else:
+                node = self._root
+                for ch in query:
+                    node = node[0].get(ch)
+                    if node is None:
+                        break
+                matched = node[1] if node is not None else set()
+                ranked = heapq.nsmallest(limit, matched, key=lambda i: (
+                    not self._templates[i]['key'].startswith(query),) + self._rank_key(i))
+
+                if len(ranked) < limit and len(query) >= 3:
+                    grams = trigrams(query)
+                    shared = Counter(i for gram in grams for i in self._trigrams.get(gram, ()))
+                    fuzzy = [i for i, count in shared.items()
+                             if i not in matched and count >= len(grams) * MIN_TRIGRAM_SCORE]
+                    fuzzy.sort(key=lambda i: (-shared[i],) + self._rank_key(i))
+                    ranked += fuzzy[:limit - len(ranked)]
+
+            return [{k: self._templates[i][k] for k in ('id', 'name', 'usage_count')} for i in ranked]
+
+# Create a singleton instance
+template_names = TemplateNameIndex()
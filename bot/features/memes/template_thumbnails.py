@@ -0,0 +1,289 @@
+"""
+Template Thumbnails for Meme Generation
+
+This module keeps a small pyramid of thumbnails (128/256/512 px) for every
+template, built once when the template is ingested, and renders paged
+contact sheets of templates from them. Finished sheets and the attachment
+URLs Discord returns for them are cached, so browsing pages edits the message
+in place without re-rendering or re-uploading.
+"""
+
+import io
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+from PIL import Image, ImageDraw
+from bot.core.config import CACHE_DIR, TEMPLATE_SHEET_SIZE
+from bot.features.memes.render_cache import attachment_url_expiry, URL_EXPIRY_MARGIN
+from bot.utils.image_loader import load_image
+from bot.utils.font_utils import get_font
+from bot.utils.text_utils import text_width
+
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, 'thumbnails')
+
+# Longest side of each pyramid level, largest first
+THUMBNAIL_SIZES = (512, 256, 128)
+
+# Contact sheet layout
+SHEET_COLUMNS = 4
+SHEET_CELL = 256
+SHEET_LABEL_HEIGHT = 28
+SHEET_PADDING = 8
+SHEET_BACKGROUND = (47, 49, 54)
+
+# Number of rendered contact sheets kept in memory
+MAX_SHEETS = 32
+
+# Number of attachment URLs remembered
+MAX_URLS = 256
+
+def thumbnail_path(template_id: int, size: int) -> str:
+    """Get the path of one pyramid level of a template"""
+    return os.path.join(THUMBNAIL_DIR, f"{template_id}_{size}.jpg")
+
+def generate_thumbnails(template_id: int, file_path: str) -> Dict[int, str]:
+    """
+    Build the thumbnail pyramid of a template
+
+    The template is decoded once at the largest level and each smaller level
+    is scaled from the one above it.
+
+    Args:
+        template_id: ID of the template
+        file_path: Path to the template image
+
+    Returns:
+        Dictionary of size -> thumbnail path
+    """
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    img = load_image(file_path, max_size=(THUMBNAIL_SIZES[0], THUMBNAIL_SIZES[0]))
+    paths = {}
+    for size in THUMBNAIL_SIZES:
+        if img.width > size or img.height > size:
+            img.thumbnail((size, size), Image.Resampling.BICUBIC)
+        path = thumbnail_path(template_id, size)
+        img.save(path, 'JPEG', quality=85)
+        paths[size] = path
+    return paths
+
+def get_thumbnail(template: Dict[str, Any], size: int = 256) -> Optional[str]:
+    """
+    Get a thumbnail of a template, building the pyramid if it is missing or stale
+
+    Args:
+        template: The template dictionary
+        size: Pyramid level (128, 256 or 512)
+
+    Returns:
+        Path to the thumbnail, or None if the template file is missing
+    """
+    file_path = template['file_path']
+    if not os.path.exists(file_path):
+        return None
+    path = thumbnail_path(template['id'], size)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(file_path):
+        try:
+            generate_thumbnails(template['id'], file_path)
+        except Exception as e:
+            logging.error(f"Error generating thumbnails for template {template['id']}: {e}")
+            return None
+    return path
+
+def delete_thumbnails(template_id: int):
+    """Remove every pyramid level of a template"""
+    for size in THUMBNAIL_SIZES:
+        try:
+            os.remove(thumbnail_path(template_id, size))
+        except FileNotFoundError:
+            pass
+
+def sheet_page(templates: List[Dict[str, Any]], page: int,
+               per_page: int = TEMPLATE_SHEET_SIZE) -> Tuple[List[Dict[str, Any]], int, int]:
+    """
+    Get the templates on one contact sheet page
+
+    Args:
+        templates: All templates, in display order
+        page: 1-based page number (clamped to the valid range)
+        per_page: Templates per sheet
+
+    Returns:
+        (templates on the page, clamped page, number of pages)
+    """
+    max_pages = max(1, (len(templates) + per_page - 1) // per_page)
+    page = max(1, min(page, max_pages))
+    start = (page - 1) * per_page
+    return templates[start:start + per_page], page, max_pages
+
+def _fit_label(text: str, font, max_width: int) -> str:
+    """Shorten a label with an ellipsis until it fits"""
+    if text_width(text, font) <= max_width:
+        return text
+    while text and text_width(text + '…', font) > max_width:
+        text = text[:-1]
+    return text + '…'
+
+def render_contact_sheet(templates: List[Dict[str, Any]]) -> bytes:
+    """
+    Render a grid of template thumbnails with their IDs and names
+
+    Args:
+        templates: Templates on the sheet
+
+    Returns:
+        The encoded JPEG
+    """
+    rows = max(1, (len(templates) + SHEET_COLUMNS - 1) // SHEET_COLUMNS)
+    columns = min(SHEET_COLUMNS, max(1, len(templates)))
+    cell_h = SHEET_CELL + SHEET_LABEL_HEIGHT
+    sheet = Image.new('RGB', (
+        columns * (SHEET_CELL + SHEET_PADDING) + SHEET_PADDING,
+        rows * (cell_h + SHEET_PADDING) + SHEET_PADDING
+    ), SHEET_BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    font = get_font('sans', 16)
+
+    for index, template in enumerate(templates):
+        x = SHEET_PADDING + (index % SHEET_COLUMNS) * (SHEET_CELL + SHEET_PADDING)
+        y = SHEET_PADDING + (index // SHEET_COLUMNS) * (cell_h + SHEET_PADDING)
+
+        path = get_thumbnail(template, SHEET_CELL)
+        if path:
+            with Image.open(path) as thumb:
+                thumb.load()
+                sheet.paste(thumb, (x + (SHEET_CELL - thumb.width) // 2, y + (SHEET_CELL - thumb.height) // 2))
+
+        label = _fit_label(f"#{template['id']} {template['name']}", font, SHEET_CELL)
+        draw.text((x + SHEET_CELL // 2, y + SHEET_CELL + SHEET_LABEL_HEIGHT // 2), label,
+                  font=font, fill=(255, 255, 255), anchor='mm')
+
+    buffer = io.BytesIO()
+    sheet.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+class ContactSheetCache:
+    """
+    LRU cache of rendered contact sheets and the attachment URLs they were uploaded to
+
+    Sheets are keyed by the IDs on the page and the mtimes of their
+    thumbnails, so a changed template produces a new sheet.
+    """
+
+    def __init__(self, max_sheets: int = MAX_SHEETS, max_urls: int = MAX_URLS):
+        """
+        Initialize the cache
+
+        Args:
+            max_sheets: Number of rendered sheets kept in memory
+            max_urls: Number of attachment URLs remembered
+        """
+        self.max_sheets = max_sheets
+        self.max_urls = max_urls
+        self.hits = 0
+        self.url_hits = 0
+        self.misses = 0
+        self._sheets = OrderedDict()
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(templates: List[Dict[str, Any]], size: int = SHEET_CELL) -> str:
+        """
+        Get the cache key of a page of templates (builds missing thumbnails)
+
+        Args:
+            templates: Templates on the page
+            size: Pyramid level the page shows
+
+        Returns:
+            Cache key
+        """
+        parts = []
+        for template in templates:
+            path = get_thumbnail(template, size)
+            stamp = os.stat(path).st_mtime_ns if path else 0
+            parts.append(f"{template['id']}:{stamp}")
+        return hashlib.sha1(f"{size}|{'|'.join(parts)}".encode('utf-8')).hexdigest()
+
+    def get_sheet(self, key: str, templates: List[Dict[str, Any]]) -> bytes:
+        """
+        Get a rendered contact sheet, rendering it on a miss
+
+        Args:
+            key: Cache key from make_key
+            templates: Templates on the page
+
+        Returns:
+            The encoded sheet
+        """
+        with self._lock:
+            data = self._sheets.get(key)
+            if data is not None:
+                self._sheets.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        data = render_contact_sheet(templates)
+        with self._lock:
+            self._sheets[key] = data
+            while len(self._sheets) > self.max_sheets:
+                self._sheets.popitem(last=False)
+        return data
+
+    def get_url(self, key: str) -> Optional[str]:
+        """
+        Get the attachment URL an image was uploaded to, if it is still usable
+
+        Args:
+            key: Cache key of a sheet or thumbnail
+
+        Returns:
+            Attachment URL, or None
+        """
+        with self._lock:
+            url, expires = self._urls.get(key, (None, None))
+            if url is None:
+                return None
+            if expires is not None and time.time() > expires - URL_EXPIRY_MARGIN:
+                del self._urls[key]
+                return None
+            self._urls.move_to_end(key)
+            self.url_hits += 1
+            return url
+
+    def put_url(self, key: str, url: str):
+        """
+        Remember the attachment URL an image was uploaded to
+
+        Args:
+            key: Cache key of a sheet or thumbnail
+            url: Attachment URL Discord returned
+        """
+        with self._lock:
+            self._urls[key] = (url, attachment_url_expiry(url))
+            self._urls.move_to_end(key)
+            while len(self._urls) > self.max_urls:
+                self._urls.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hits, URL hits, misses, sheets and URLs
+        """
+        return {
+            'hits': self.hits,
+            'url_hits': self.url_hits,
+            'misses': self.misses,
+            'sheets': len(self._sheets),
+            'urls': len(self._urls),
+        }
+
+# Create a singleton instance
+sheet_cache = ContactSheetCache()
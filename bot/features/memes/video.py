@@ -0,0 +1,340 @@
+"""
+Video Captions for Meme Generation
+
+This module captions short video clips (Reddit videos, Discord attachments)
+without writing frames to disk. One ffmpeg process decodes the clip to raw
+RGB frames on its stdout, the caption bands (drawn once with the regular
+caption code) are pasted onto each frame in place, and a second ffmpeg
+process encodes the frames from its stdin. Audio is copied from the source
+without re-encoding. Clips are capped in length, size and frame rate, and the
+throughput of each job is reported in frames per second.
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+import tempfile
+import subprocess
+from fractions import Fraction
+from urllib.parse import urlparse
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from PIL import Image
+from bot.core.config import (
+    VIDEO_MAX_SECONDS, VIDEO_MAX_DIMENSION, VIDEO_MAX_FPS, VIDEO_MAX_BYTES,
+    VIDEO_FFMPEG_THREADS, VIDEO_SOURCE_HOSTS
+)
+from bot.features.memes.animation import caption_pieces
+
+# Protocols ffmpeg may use to read a source (never local files)
+PROTOCOLS = 'https,tls,tcp'
+
+# Give up on a source that stops sending data for this long (microseconds)
+READ_TIMEOUT_US = 15_000_000
+
+# Seconds allowed for probing a source
+PROBE_TIMEOUT = 15
+
+# x264 constant quality, capped by the bitrate the byte budget allows
+VIDEO_CRF = 23
+
+# Bitrate set aside for the copied audio track
+AUDIO_KBPS = 160
+
+# Lowest video bitrate worth encoding at
+MIN_VIDEO_KBPS = 150
+
+# Frames between deadline checks
+CHECK_EVERY = 30
+
+class VideoError(ValueError):
+    """Raised when a video cannot be captioned"""
+    pass
+
+def check_source(url: str):
+    """
+    Make sure a video URL is one ffmpeg may fetch
+
+    Args:
+        url: Video URL
+
+    Raises:
+        VideoError: If the URL is not HTTPS or not on an allowed host
+    """
+    parsed = urlparse(url)
+    if parsed.scheme != 'https' or parsed.hostname not in VIDEO_SOURCE_HOSTS:
+        raise VideoError(f"Videos can only be captioned from: {', '.join(VIDEO_SOURCE_HOSTS)}")
+
+def _parse_rate(rate: Optional[str]) -> Optional[Fraction]:
+    """Parse an ffprobe frame rate such as '30000/1001' (None for '0/0')"""
+    try:
+        value = Fraction(rate)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return value if value > 0 else None
+
+def probe_video(url: str) -> Dict[str, Any]:
+    """
+    Read the size, frame rate, duration and audio presence of a video
+
+    Args:
+        url: Video URL
+
+    Returns:
+        Dictionary with width, height, fps (Fraction), duration (seconds or
+        None) and has_audio
+    """
+    command = [
+        'ffprobe', '-v', 'error', '-protocol_whitelist', PROTOCOLS, '-rw_timeout', str(READ_TIMEOUT_US),
+        '-show_entries', 'stream=codec_type,width,height,avg_frame_rate,r_frame_rate:format=duration',
+        '-of', 'json', url
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, timeout=PROBE_TIMEOUT, check=True).stdout
+    except subprocess.TimeoutExpired:
+        raise VideoError("Timed out reading the video")
+    except subprocess.CalledProcessError as e:
+        raise VideoError(f"Could not read the video: {e.stderr.decode(errors='replace').strip()[:200]}")
+    info = json.loads(output or b'{}')
+
+    streams = info.get('streams', [])
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    if video is None or not video.get('width'):
+        raise VideoError("That file has no video stream")
+    try:
+        duration = float(info.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        duration = None
+    return {
+        'width': int(video['width']),
+        'height': int(video['height']),
+        'fps': _parse_rate(video.get('avg_frame_rate')) or _parse_rate(video.get('r_frame_rate')) or Fraction(30),
+        'duration': duration,
+        'has_audio': any(s.get('codec_type') == 'audio' for s in streams),
+    }
+
+def output_geometry(width: int, height: int, fps: Fraction) -> Tuple[int, int, Fraction]:
+    """
+    Fit a video inside the resolution and frame rate caps
+
+    Sizes are rounded down to even numbers, which yuv420p needs.
+
+    Returns:
+        (width, height, fps)
+    """
+    scale = min(1.0, VIDEO_MAX_DIMENSION / max(width, height))
+    out_w = max(2, int(width * scale) // 2 * 2)
+    out_h = max(2, int(height * scale) // 2 * 2)
+    return out_w, out_h, min(fps, Fraction(VIDEO_MAX_FPS))
+
+def video_bitrate(seconds: float, max_bytes: int, has_audio: bool) -> int:
+    """
+    Get the highest video bitrate (kbit/s) that keeps a clip inside its byte budget
+
+    Args:
+        seconds: Clip length
+        max_bytes: Byte budget for the whole file
+        has_audio: Whether an audio track is copied alongside
+
+    Returns:
+        Bitrate in kbit/s (10% is left for container overhead)
+    """
+    total = max_bytes * 8 / 1000 / max(seconds, 1.0) * 0.9
+    if has_audio:
+        total -= AUDIO_KBPS
+    return max(MIN_VIDEO_KBPS, int(total))
+
+def build_video_job(
+    source_url: str,
+    top_text: Optional[str] = None,
+    bottom_text: Optional[str] = None,
+    font_size: Optional[int] = None,
+    font_color: Optional[str] = None,
+    outline_color: Optional[str] = None,
+    max_bytes: int = VIDEO_MAX_BYTES
+) -> Dict[str, Any]:
+    """
+    Build the job spec sent to a render worker for a video caption
+
+    Args:
+        source_url: HTTPS URL of the clip
+        top_text: Caption for the top of the video
+        bottom_text: Caption for the bottom of the video
+        font_size: Starting font size (default: auto)
+        font_color: Caption color (default: auto-contrast with the first frame)
+        outline_color: Caption outline color (default: auto-contrast)
+        max_bytes: Byte budget for the encoded clip
+
+    Returns:
+        Job spec dictionary
+    """
+    return {
+        'kind': 'video',
+        'source_url': source_url,
+        'top_text': top_text,
+        'bottom_text': bottom_text,
+        'font_size': font_size,
+        'font_color': font_color,
+        'outline_color': outline_color,
+        'max_bytes': max_bytes,
+    }
+
+def decoder_command(url: str, width: int, height: int, fps: Fraction, seconds: float) -> List[str]:
+    """ffmpeg arguments that decode a clip to raw RGB frames on stdout"""
+    return [
+        'ffmpeg', '-nostdin', '-v', 'error',
+        '-protocol_whitelist', PROTOCOLS, '-rw_timeout', str(READ_TIMEOUT_US),
+        '-threads', str(VIDEO_FFMPEG_THREADS), '-t', f'{seconds:.3f}', '-i', url,
+        '-map', '0:v:0', '-an', '-sn',
+        '-vf', f'scale={width}:{height}:flags=bicubic,fps={fps}',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1',
+    ]
+
+def encoder_command(url: str, output_path: str, width: int, height: int, fps: Fraction,
+                    seconds: float, kbps: int, audio: bool) -> List[str]:
+    """ffmpeg arguments that encode raw RGB frames from stdin, copying the source's audio"""
+    command = [
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}', '-framerate', str(fps), '-i', 'pipe:0',
+    ]
+    if audio:
+        command += [
+            '-protocol_whitelist', PROTOCOLS, '-rw_timeout', str(READ_TIMEOUT_US),
+            '-t', f'{seconds:.3f}', '-i', url,
+            '-map', '0:v:0', '-map', '1:a:0', '-c:a', 'copy',
+        ]
+    else:
+        command += ['-map', '0:v:0']
+    command += [
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(VIDEO_CRF),
+        '-maxrate', f'{kbps}k', '-bufsize', f'{kbps * 2}k', '-pix_fmt', 'yuv420p',
+        '-threads', str(VIDEO_FFMPEG_THREADS), '-shortest', '-movflags', '+faststart', output_path,
+    ]
+    return command
+
+def composite_captions(frame: bytearray, width: int, pieces: List[Tuple[Image.Image, Tuple[int, int, int, int]]]):
+    """
+    Paste caption pieces onto a raw RGB frame in place
+
+    Only the rows a caption covers are converted to an image and back.
+
+    Args:
+        frame: Raw rgb24 frame
+        width: Frame width in pixels
+        pieces: Captions from caption_pieces
+    """
+    stride = width * 3
+    for piece, (x0, y0, x1, y1) in pieces:
+        start, end = y0 * stride, y1 * stride
+        band = Image.frombytes('RGB', (width, y1 - y0), bytes(frame[start:end]))
+        band.paste(piece, (x0, 0), piece)
+        frame[start:end] = band.tobytes()
+
+def _log_tail(path: str) -> str:
+    """Last line of an ffmpeg error log"""
+    try:
+        with open(path, 'rb') as f:
+            lines = f.read().decode(errors='replace').strip().splitlines()
+    except OSError:
+        return ''
+    return lines[-1][:200] if lines else ''
+
+def render_video_job(job: Dict[str, Any], check: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Caption a video clip
+
+    Clips longer than VIDEO_MAX_SECONDS are cut short, and larger or faster
+    ones are scaled down to VIDEO_MAX_DIMENSION and VIDEO_MAX_FPS.
+
+    Args:
+        job: Job spec from build_video_job
+        check: Called every CHECK_EVERY frames; raises to abort the job
+
+    Returns:
+        Encoded clip dictionary (same keys as encode_image, plus frames,
+        seconds and fps, the frames captioned per second)
+
+    Raises:
+        VideoError: If the clip cannot be read, encoded or kept under budget
+    """
+    if not shutil.which('ffmpeg') or not shutil.which('ffprobe'):
+        raise VideoError("ffmpeg is not installed, so videos cannot be captioned")
+    url = job['source_url']
+    check_source(url)
+
+    info = probe_video(url)
+    width, height, fps = output_geometry(info['width'], info['height'], info['fps'])
+    seconds = min(info['duration'] or VIDEO_MAX_SECONDS, VIDEO_MAX_SECONDS)
+    max_bytes = job.get('max_bytes') or VIDEO_MAX_BYTES
+    kbps = video_bitrate(seconds, max_bytes, info['has_audio'])
+    frame_size = width * height * 3
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, 'captioned.mp4')
+        decoder_log = os.path.join(temp_dir, 'decoder.log')
+        encoder_log = os.path.join(temp_dir, 'encoder.log')
+
+        start = time.perf_counter()
+        frames = 0
+        with open(decoder_log, 'wb') as dlog, open(encoder_log, 'wb') as elog:
+            decoder = subprocess.Popen(decoder_command(url, width, height, fps, seconds),
+                                       stdout=subprocess.PIPE, stderr=dlog)
+            encoder = subprocess.Popen(
+                encoder_command(url, output_path, width, height, fps, seconds, kbps, info['has_audio']),
+                stdin=subprocess.PIPE, stderr=elog
+            )
+            try:
+                pieces = None
+                while True:
+                    data = decoder.stdout.read(frame_size)
+                    if len(data) < frame_size:
+                        break
+                    frame = bytearray(data)
+                    if pieces is None:
+                        # Colors are picked from the first frame, then reused
+                        pieces = caption_pieces(job, Image.frombytes('RGB', (width, height), data))
+                    composite_captions(frame, width, pieces)
+                    encoder.stdin.write(frame)
+                    frames += 1
+                    if check and frames % CHECK_EVERY == 0:
+                        check()
+                encoder.stdin.close()
+                encoder.wait()
+                decoder.wait()
+            except BrokenPipeError:
+                encoder.wait()
+            finally:
+                for process in (decoder, encoder):
+                    if process.poll() is None:
+                        process.kill()
+                        process.wait()
+                decoder.stdout.close()
+
+        if frames == 0:
+            raise VideoError(f"Could not decode the video: {_log_tail(decoder_log) or 'no frames'}")
+        if encoder.returncode != 0:
+            raise VideoError(f"Could not encode the video: {_log_tail(encoder_log) or encoder.returncode}")
+        with open(output_path, 'rb') as f:
+            data = f.read()
+
+    elapsed = time.perf_counter() - start
+    throughput = frames / elapsed if elapsed > 0 else 0.0
+    if len(data) > max_bytes:
+        raise VideoError(f"The captioned video is over {max_bytes / (1024 * 1024):.1f} MB")
+    logging.info(
+        f"Captioned {frames} video frames at {width}x{height}@{float(fps):.0f} in {elapsed:.1f}s "
+        f"({throughput:.0f} fps): {len(data)} bytes"
+    )
+    return {
+        'data': data,
+        'format': 'MP4',
+        'extension': 'mp4',
+        'quality': None,
+        'size': (width, height),
+        'bytes': len(data),
+        'baseline_bytes': None,
+        'frames': frames,
+        'seconds': elapsed,
+        'fps': throughput,
+    }
@@ -0,0 +1,288 @@
+"""
+Async Reddit Client
+
+Every Reddit request goes through one aiohttp session with keep-alive
+connections, a cap on open connections and a timeout per request, so
+polling many subreddits never blocks the event loop and never opens more
+sockets than the pool allows.
+
+Listings polled over and over can be fetched incrementally: the client
+remembers the newest post it returned and asks only for posts before it
+(newer than it), with the ETag and Last-Modified of the previous answer, so
+a quiet subreddit costs a 304 or an empty listing that is never parsed.
+With `before`, Reddit returns the posts just newer than the cursor, so when
+a burst fills the page the client pages on towards the newest posts.
+"""
+
+import re
+import json
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+import aiohttp
+from bot.core.config import REDDIT_TIMEOUT, REDDIT_MAX_CONNECTIONS
+
+# Use a proper User-Agent to comply with Reddit's API guidelines
+USER_AGENT = 'RedditDiscordMemeBot/1.0 (by u/JaePyJs)'
+REDDIT_URL = 'https://www.reddit.com'
+HEADERS = {'User-Agent': USER_AGENT}
+
+# Seconds an idle keep-alive connection stays open
+KEEPALIVE_TIMEOUT = 60
+
+# Incremental polls between full fetches (a deleted cursor post would otherwise hide new posts forever)
+FULL_REFRESH_POLLS = 12
+
+# Pages requested past the first when a burst of new posts fills the incremental page
+MAX_CATCHUP_PAGES = 4
+
+# Posts per listing page when no limit is given (Reddit's default)
+DEFAULT_LISTING_LIMIT = 25
+
+# An empty listing, recognized without decoding it
+EMPTY_LISTING = re.compile(rb'"children":\s*\[\s*\]')
+
+def listing_key(subreddit: str, sort: str, params: Optional[Dict[str, Any]]) -> Tuple:
+    """Get the key incremental state is kept under for a listing and its parameters"""
+    return (subreddit.lower(), sort) + tuple(sorted((params or {}).items()))
+
+class RedditClient:
+    """Shared, lazily created aiohttp session for Reddit"""
+
+    def __init__(self, base_url: str = REDDIT_URL, timeout: float = REDDIT_TIMEOUT,
+                 max_connections: int = REDDIT_MAX_CONNECTIONS):
+        """
+        Initialize the client
+
+        Args:
+            base_url: Reddit origin listing paths are relative to
+            timeout: Seconds allowed per request
+            max_connections: Most connections open at once
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_connections = max(1, max_connections)
+        self.requests = 0
+        self.errors = 0
+        # Cursor, validators and polls since the last full fetch, per listing
+        self.listings: Dict[Tuple, Dict[str, Any]] = {}
+        # Requests, bytes and savings per subreddit
+        self.subreddit_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {
+            'requests': 0, 'not_modified': 0, 'empty': 0, 'bytes': 0, 'bytes_saved': 0, 'requests_saved': 0
+        })
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop = None
+
+    def session(self) -> aiohttp.ClientSession:
+        """Get the shared session, opening it on first use (inside the event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            self._loop = loop
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=HEADERS,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GET a Reddit JSON endpoint
+
+        Args:
+            path: Path relative to the Reddit origin, e.g. '/r/memes/new.json'
+            params: Query parameters
+
+        Returns:
+            The decoded JSON
+
+        Raises:
+            aiohttp.ClientResponseError: If Reddit answers with an error status
+            aiohttp.ClientError: If the request fails
+            asyncio.TimeoutError: If the request takes too long
+        """
+        self.requests += 1
+        try:
+            async with self.session().get(f"{self.base_url}{path}", params=params) as resp:
+                resp.raise_for_status()
+                return await resp.json(content_type=None)
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def get_listing(self, subreddit: str, sort: str, params: Optional[Dict[str, Any]] = None) -> list:
+        """
+        Get the posts of a subreddit listing
+
+        Args:
+            subreddit: Subreddit name
+            sort: Listing, e.g. 'new', 'best' or 'top'
+            params: Query parameters (limit, t...)
+
+        Returns:
+            The listing's children, or an empty list if it could not be fetched
+        """
+        try:
+            data = await self.get_json(f"/r/{subreddit}/{sort}.json", params)
+        except Exception as e:
+            logging.warning(f"Could not fetch r/{subreddit}/{sort}: {e}")
+            return []
+        return (data or {}).get('data', {}).get('children', [])
+
+    async def get_listing_since(self, subreddit: str, sort: str = 'new',
+                                params: Optional[Dict[str, Any]] = None) -> Tuple[Optional[list], bool]:
+        """
+        Get the posts of a listing that are newer than the last call returned
+
+        The first call, and every FULL_REFRESH_POLLS-th call after it, fetches
+        the whole listing. The others send the newest post seen as the
+        `before` cursor along with If-None-Match / If-Modified-Since. A full
+        incremental page holds the posts just after the cursor, not the
+        newest, so pages are fetched on towards the newest post (up to
+        MAX_CATCHUP_PAGES more); a burst bigger than that skips its oldest
+        posts rather than arriving late.
+
+        Args:
+            subreddit: Subreddit name
+            sort: Listing sorted newest first, normally 'new'
+            params: Query parameters (limit...)
+
+        Returns:
+            (children newest first, whether the fetch was incremental). The
+            children are None if the listing could not be fetched and empty
+            if nothing is new; an incremental fetch can return more than the
+            limit.
+        """
+        key = listing_key(subreddit, sort, params)
+        state = self.listings.setdefault(key, {'before': None, 'etag': None, 'last_modified': None,
+                                                'polls': 0, 'full_bytes': 0})
+        stats = self.subreddit_stats[subreddit.lower()]
+        incremental = state['before'] is not None and state['polls'] < FULL_REFRESH_POLLS
+
+        query = dict(params or {})
+        headers = {}
+        if incremental:
+            query['before'] = state['before']
+            if state['etag']:
+                headers['If-None-Match'] = state['etag']
+            if state['last_modified']:
+                headers['If-Modified-Since'] = state['last_modified']
+
+        self.requests += 1
+        stats['requests'] += 1
+        try:
+            async with self.session().get(f"{self.base_url}/r/{subreddit}/{sort}.json",
+                                          params=query, headers=headers) as resp:
+                if resp.status == 304:
+                    state['polls'] += 1
+                    stats['not_modified'] += 1
+                    stats['requests_saved'] += 1
+                    stats['bytes_saved'] += state['full_bytes']
+                    return [], True
+                resp.raise_for_status()
+                body = await resp.read()
+                etag = resp.headers.get('ETag')
+                last_modified = resp.headers.get('Last-Modified')
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"Could not fetch r/{subreddit}/{sort}: {e}")
+            return None, incremental
+
+        stats['bytes'] += len(body)
+        if incremental:
+            state['polls'] += 1
+            stats['bytes_saved'] += max(0, state['full_bytes'] - len(body))
+        else:
+            state['polls'] = 0
+            state['full_bytes'] = len(body)
+
+        if incremental and EMPTY_LISTING.search(body):
+            stats['empty'] += 1
+            stats['requests_saved'] += 1
+            state['etag'], state['last_modified'] = etag, last_modified
+            return [], True
+
+        try:
+            children = (json.loads(body) or {}).get('data', {}).get('children', [])
+        except ValueError as e:
+            self.errors += 1
+            logging.warning(f"Invalid listing from r/{subreddit}/{sort}: {e}")
+            return None, incremental
+
+        if incremental and children:
+            children = await self._catch_up(subreddit, sort, query, children)
+
+        if children:
+            newest = children[0].get('data', {})
+            state['before'] = newest.get('name') or f"t3_{newest.get('id', '')}"
+            # The validators belong to the old cursor's URL
+            state['etag'] = state['last_modified'] = None
+        else:
+            state['etag'], state['last_modified'] = etag, last_modified
+        return children, incremental
+
+    async def _catch_up(self, subreddit: str, sort: str, query: Dict[str, Any], children: list) -> list:
+        """
+        Fetch the pages between a full incremental page and the newest post
+
+        Args:
+            subreddit: Subreddit name
+            sort: Listing sort
+            query: Query parameters of the first page
+            children: The first page, newest first
+
+        Returns:
+            Every post fetched, newest first
+        """
+        limit = int(query.get('limit') or DEFAULT_LISTING_LIMIT)
+        stats = self.subreddit_stats[subreddit.lower()]
+        page = children
+        for _ in range(MAX_CATCHUP_PAGES):
+            if len(page) < limit:
+                break
+            newest = page[0].get('data', {})
+            query = dict(query, before=newest.get('name') or f"t3_{newest.get('id', '')}")
+            stats['requests'] += 1
+            try:
+                data = await self.get_json(f"/r/{subreddit}/{sort}.json", query)
+            except Exception as e:
+                logging.warning(f"Could not fetch newer posts of r/{subreddit}/{sort}: {e}")
+                break
+            page = (data or {}).get('data', {}).get('children', [])
+            known = {child.get('data', {}).get('id') for child in children}
+            page = [child for child in page if child.get('data', {}).get('id') not in known]
+            if not page:
+                break
+            children = page + children
+        return children
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get request counters
+
+        Returns:
+            Dictionary with requests, errors and the bytes and requests
+            incremental fetches saved
+        """
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'bytes': sum(s['bytes'] for s in self.subreddit_stats.values()),
+            'bytes_saved': sum(s['bytes_saved'] for s in self.subreddit_stats.values()),
+            'requests_saved': sum(s['requests_saved'] for s in self.subreddit_stats.values())
+        }
+
+    async def close(self):
+        """Close the session (a new one is opened on next use)"""
+        if self._session is not None and not self._session.closed and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+
+# Create a singleton instance
+reddit_client = RedditClient()
@@ -3,18 +3,183 @@ from discord import app_commands
 from discord.ext import commands
 import logging
 import asyncio
-from typing import Optional, List, Dict, Any
-from bot.features.reddit.reddit import fetch_new_posts, fetch_random_best_post
-from bot.core.config import DEFAULT_GUILD_ID
-from bot.utils.autopost_store import add_subreddit, remove_subreddit, get_subreddits
+import random
+import aiohttp
+from collections import defaultdict
+from typing import Optional, List, Dict, Any, Tuple, Set
+from bot.features.reddit.reddit import fetch_new_posts, fetch_best_posts
+from bot.features.reddit.client import reddit_client
+from bot.features.reddit.scheduler import PollScheduler
+from bot.core.config import (
+    DEFAULT_GUILD_ID, IMAGE_MAX_BYTES, IMAGE_DUPLICATE_DISTANCE, AUTOPOST_INTERVAL, SEEN_POSTS_RETENTION_DAYS
+)
+from bot.utils.autopost_store import (
+    add_subreddit, remove_subreddit, get_subreddits, load_store, save_store, new_seen_set, compact_seen_posts
+)
+from bot.utils.seen_set import SeenSet
+from bot.utils.image_hash import hash_index, hash_image, find_duplicate
+
+# Seconds allowed for downloading a post's image to hash it
+IMAGE_FETCH_TIMEOUT = 10
+
+# Seconds between deletions of expired seen posts
+SEEN_POSTS_COMPACT_INTERVAL = 24 * 60 * 60
+
+def seen_posts(cfg: Dict[str, Any]) -> SeenSet:
+    """Get a subscription's seen posts, converting a list of IDs to a SeenSet"""
+    seen = cfg.get('seen_ids')
+    if not isinstance(seen, SeenSet):
+        listed = seen or ()
+        seen = new_seen_set()
+        for post_id in listed:
+            seen.add(post_id)
+        cfg['seen_ids'] = seen
+    return seen
 
 class RedditCommands(commands.Cog):
     """Reddit integration commands"""
     
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.autopost_store = {}
+        self.autopost_store: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Guilds subscribed to each subreddit, and when each subreddit is polled next
+        self.subscribers: Dict[str, Set[str]] = defaultdict(set)
+        self.scheduler = PollScheduler()
+        self.schedule_changed = asyncio.Event()
+        # Post IDs of each subreddit's last new listing, to count new posts
+        self.latest_new_ids: Dict[str, Set[str]] = {}
+        self.last_compaction = 0.0
+        # Repost checks and sends of one guild run one at a time
+        self.guild_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
         self.bot.loop.create_task(self.autopost_loop())
+
+    async def cog_unload(self):
+        """Close the shared Reddit session"""
+        await reddit_client.close()
+
+    def load_subscriptions(self, store: Dict[str, Dict[str, Dict[str, Any]]], now_ts: float):
+        """
+        Replace the polled subscriptions and schedule every subreddit
+
+        Args:
+            store: Subscriptions by guild ID and subreddit (from load_store)
+            now_ts: Time the subreddits are first due
+        """
+        self.autopost_store = store
+        self.subscribers.clear()
+        for guild_id, sub_map in store.items():
+            for sub_name in sub_map:
+                self.subscribers[sub_name].add(guild_id)
+        for sub_name in self.subscribers:
+            self.scheduler.schedule(sub_name, now_ts)
+        self.schedule_changed.set()
+
+    def track_subscription(self, guild_id: int, subreddit: str, channel_id: int):
+        """Add or update a subscription in the store the autopost loop polls"""
+        guild_map = self.autopost_store.setdefault(str(guild_id), {})
+        cfg = guild_map.setdefault(subreddit, {
+            'channel_id': channel_id,
+            'last_posted_id': None,
+            'last_post_ts': 0,
+            'last_best_post_ts': 0,
+            'seen_ids': new_seen_set()
+        })
+        cfg['channel_id'] = channel_id
+        self.subscribers[subreddit].add(str(guild_id))
+        if subreddit not in self.scheduler:
+            # A new subreddit is polled right away
+            self.scheduler.schedule(subreddit, discord.utils.utcnow().timestamp())
+            self.schedule_changed.set()
+
+    def untrack_subscription(self, guild_id: int, subreddit: str):
+        """Stop polling a subscription"""
+        self.autopost_store.get(str(guild_id), {}).pop(subreddit, None)
+        self.subscribers[subreddit].discard(str(guild_id))
+        if not self.subscribers[subreddit]:
+            del self.subscribers[subreddit]
+            self.scheduler.remove(subreddit)
+            self.latest_new_ids.pop(subreddit, None)
+
+    async def post_image_hash(self, post: Dict[str, Any]) -> Optional[int]:
+        """
+        Download a post's image and get its perceptual hash
+
+        Args:
+            post: Post dictionary with image_url
+
+        Returns:
+            The image's dHash, or None if it could not be fetched or decoded
+        """
+        image_url = post.get('image_url')
+        if not image_url:
+            return None
+        try:
+            timeout = aiohttp.ClientTimeout(total=IMAGE_FETCH_TIMEOUT)
+            async with reddit_client.session().get(image_url, timeout=timeout) as resp:
+                if resp.status != 200 or (resp.content_length or 0) > IMAGE_MAX_BYTES:
+                    return None
+                data = bytearray()
+                async for chunk in resp.content.iter_chunked(64 * 1024):
+                    data += chunk
+                    if len(data) > IMAGE_MAX_BYTES:
+                        return None
+            return await asyncio.to_thread(hash_image, bytes(data))
+        except Exception as e:
+            logging.warning(f"Could not hash image of post {post.get('id')}: {e}")
+            return None
+
+    async def shared_image_hash(self, post: Dict[str, Any],
+                                image_hashes: Optional[Dict[str, asyncio.Future]] = None) -> Optional[int]:
+        """
+        Get a post's image hash, downloading the image once per poll
+
+        Args:
+            post: Post dictionary with image_url
+            image_hashes: Hashes started during this poll, by post ID (shared by
+                every subscription to the subreddit; None to always download)
+
+        Returns:
+            The image's dHash, or None if it could not be fetched or decoded
+        """
+        if image_hashes is None:
+            return await self.post_image_hash(post)
+        future = image_hashes.get(post['id'])
+        if future is None:
+            future = image_hashes[post['id']] = asyncio.ensure_future(self.post_image_hash(post))
+        # One guild giving up must not cancel the download for the others
+        return await asyncio.shield(future)
+
+    async def check_repost(self, guild_id: str, image_hash: Optional[int]) -> bool:
+        """Check an image hash against the images already posted in a guild"""
+        if image_hash is None:
+            return False
+        # SQLite (and loading the guild's tree on first use) stays off the event loop
+        duplicate = await asyncio.to_thread(find_duplicate, 'reddit', image_hash, IMAGE_DUPLICATE_DISTANCE,
+                                            guild_id)
+        return duplicate is not None
+
+    async def send_unless_repost(self, guild_id: str, channel, sub_name: str, post: Dict[str, Any],
+                                 cfg: Dict[str, Any], indicator: str,
+                                 image_hashes: Optional[Dict[str, asyncio.Future]] = None) -> bool:
+        """
+        Send a post unless its image was already posted in the guild
+
+        The post is marked as seen either way. The image is hashed before the
+        guild lock is taken, so the lock only covers the lookup and the send.
+
+        Returns:
+            True if the post was sent
+        """
+        seen_posts(cfg).add(post['id'])
+        image_hash = await self.shared_image_hash(post, image_hashes)
+        async with self.guild_locks[guild_id]:
+            if await self.check_repost(guild_id, image_hash):
+                logging.info(f"Skipping repost {post['id']} from r/{sub_name} in guild {guild_id}")
+                return False
+            await self.send_reddit_embed(channel, sub_name, post, indicator=indicator)
+            if image_hash is not None:
+                await asyncio.to_thread(hash_index.add, 'reddit', post['id'], image_hash, guild_id)
+        return True
         
     @app_commands.command(
         name='reddit_autopost',
@@ -65,8 +230,8 @@ class RedditCommands(commands.Cog):
         # Add to auto-post configuration
         add_subreddit(interaction.guild.id, subreddit, target_channel.id)
         
-        # Load the updated store
-        self.autopost_store = get_subreddits(interaction.guild.id)
+        # Start polling it
+        self.track_subscription(interaction.guild.id, subreddit, target_channel.id)
         
         # Create confirmation embed
         embed = discord.Embed(
@@ -78,7 +243,7 @@ class RedditCommands(commands.Cog):
         embed.add_field(
             name="What to Expect",
             value=(
-                "• New posts will be shared approximately every 5 minutes\n"
+                "• New posts will be shared as they appear (busy subreddits are checked more often)\n"
                 "• Best posts will be shared occasionally\n"
                 "• Only image posts will be shared\n"
                 "• Duplicate posts will be skipped"
@@ -202,8 +367,8 @@ class RedditCommands(commands.Cog):
                 success = remove_subreddit(interaction.guild.id, self.subreddit)
                 
                 if success:
-                    # Update the store
-                    self.cog.autopost_store = get_subreddits(interaction.guild.id)
+                    # Stop polling it
+                    self.cog.untrack_subscription(interaction.guild.id, self.subreddit)
                     
                     # Send confirmation
                     await interaction.response.send_message(
@@ -223,54 +388,166 @@ class RedditCommands(commands.Cog):
         view = NavButtons(self, page, max_pages)
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
         
+    async def deliver(self, guild_id: str, sub_name: str, cfg: Dict[str, Any], channel, now_ts: float,
+                      new_posts: Optional[List[Dict[str, Any]]] = None,
+                      best_posts: Optional[List[Dict[str, Any]]] = None,
+                      image_hashes: Optional[Dict[str, asyncio.Future]] = None):
+        """
+        Post from already fetched listings to one subscription
+
+        The listings are shared by every subscription to the subreddit and are
+        not modified; what this subscription has seen is tracked in its config.
+
+        Args:
+            guild_id: Guild ID (as stored)
+            sub_name: Subreddit name
+            cfg: The subscription's config (updated in place)
+            channel: Channel to post in
+            now_ts: Time of this poll
+            new_posts: Newest posts, newest first, if the new flow is due
+            best_posts: Best posts, if the best flow is due
+            image_hashes: Image hashes shared by this poll's subscriptions
+        """
+        # NEWEST flow
+        if new_posts:
+            last_id = cfg.get('last_posted_id')
+            seen_ids = seen_posts(cfg)
+            unseen = [p for p in new_posts if p['id'] != last_id and p['id'] not in seen_ids]
+            # Newest first; reposts are skipped before anything is sent
+            for newest_post in unseen:
+                if await self.send_unless_repost(guild_id, channel, sub_name, newest_post, cfg, "NEW",
+                                                 image_hashes):
+                    cfg['last_posted_id'] = newest_post['id']
+                    cfg['last_post_ts'] = now_ts
+                    break
+
+        # BEST flow
+        if best_posts:
+            seen_ids = seen_posts(cfg)
+            unseen = [p for p in best_posts if p['id'] not in seen_ids]
+            if unseen:
+                await self.send_unless_repost(guild_id, channel, sub_name, random.choice(unseen), cfg, "BEST",
+                                              image_hashes)
+                cfg['last_best_post_ts'] = now_ts
+
+    async def poll_subreddit(self, sub_name: str, subscriptions: List[Tuple[str, Dict[str, Any], Any, bool]],
+                             now_ts: float) -> Optional[int]:
+        """
+        Fetch a subreddit once and post from it to every subscription
+
+        Args:
+            sub_name: Subreddit name
+            subscriptions: (guild_id, cfg, channel, best due) for each subscription
+            now_ts: Time of this poll
+
+        Returns:
+            Posts new since the previous poll, or None on the first poll
+        """
+        wants_best = any(best_due for _, _, _, best_due in subscriptions)
+        new_posts, best_posts = await asyncio.gather(
+            fetch_new_posts(sub_name, limit=10),
+            fetch_best_posts(sub_name, limit=100) if wants_best else asyncio.sleep(0)
+        )
+
+        # Each post's image is downloaded and hashed once, by the first guild to need it
+        image_hashes: Dict[str, asyncio.Future] = {}
+        results = await asyncio.gather(*(
+            self.deliver(guild_id, sub_name, cfg, channel, now_ts, new_posts, best_posts if best_due else None,
+                         image_hashes)
+            for guild_id, cfg, channel, best_due in subscriptions
+        ), return_exceptions=True)
+        for (guild_id, *_), result in zip(subscriptions, results):
+            if isinstance(result, Exception):
+                logging.error(f"Autopost error for r/{sub_name} in guild {guild_id}: {result}")
+
+        post_ids = {p['id'] for p in new_posts}
+        previous = self.latest_new_ids.get(sub_name)
+        self.latest_new_ids[sub_name] = post_ids
+        return None if previous is None else len(post_ids - previous)
+
+    async def poll_due(self, now_ts: float) -> int:
+        """
+        Poll the subreddits that are due and schedule their next poll
+
+        Each due subreddit is fetched once, however many guilds follow it, and
+        only its own subscriptions are looked at.
+
+        Args:
+            now_ts: Time of this poll
+
+        Returns:
+            Number of subreddits fetched
+        """
+        due: Dict[str, List[Tuple[str, Dict[str, Any], Any, bool]]] = {}
+        for sub_name in self.scheduler.pop_due(now_ts):
+            subscriptions = []
+            for guild_id in self.subscribers.get(sub_name, ()):
+                cfg = self.autopost_store.get(guild_id, {}).get(sub_name)
+                if cfg is None or self.bot.get_guild(int(guild_id)) is None:
+                    continue
+                channel = self.bot.get_channel(cfg.get('channel_id'))
+                if channel is None:
+                    continue
+                best_due = now_ts - cfg.get('last_best_post_ts', 0) >= AUTOPOST_INTERVAL
+                subscriptions.append((guild_id, cfg, channel, best_due))
+            if subscriptions:
+                due[sub_name] = subscriptions
+            else:
+                self.scheduler.record(sub_name, None, now_ts)
+
+        if not due:
+            return 0
+
+        # Due subreddits are fetched concurrently; the client caps open connections
+        results = await asyncio.gather(*(
+            self.poll_subreddit(sub_name, subscriptions, now_ts) for sub_name, subscriptions in due.items()
+        ), return_exceptions=True)
+        for sub_name, result in zip(due, results):
+            if isinstance(result, Exception):
+                logging.error(f"Autopost error for r/{sub_name}: {result}")
+                result = None
+            interval = self.scheduler.record(sub_name, result, now_ts)
+            logging.info(f"Polled r/{sub_name} for {len(due[sub_name])} subscription(s); "
+                         f"next poll in {interval:.0f}s")
+        return len(due)
+
     async def autopost_loop(self):
         """Background task to poll enabled subreddits and post new content"""
         await self.bot.wait_until_ready()
+        try:
+            store = await asyncio.to_thread(load_store)
+            self.load_subscriptions(store, discord.utils.utcnow().timestamp())
+        except Exception as e:
+            logging.error(f"Could not load autopost store: {e}")
+
         while not self.bot.is_closed():
             try:
-                for guild_id, sub_map in list(self.autopost_store.items()):
-                    guild = self.bot.get_guild(int(guild_id))
-                    if guild is None:
-                        continue
-                    for sub_name, cfg in sub_map.items():
-                        channel = self.bot.get_channel(cfg['channel_id'])
-                        if channel is None:
-                            continue
-                        last_id = cfg.get('last_posted_id')
-                        last_ts = cfg.get('last_post_ts', 0)
-                        now_ts = discord.utils.utcnow().timestamp()
-
-                        # NEWEST flow
-                        if now_ts - last_ts >= 300:
-                            posts = fetch_new_posts(sub_name, limit=10)
-                            if posts:
-                                new_posts = []
-                                for p in posts:
-                                    if p['id'] == last_id or p['id'] in cfg.get('seen_ids', []):
-                                        continue  # Skip this post but check the next ones
-                                    new_posts.append(p)
-                                if new_posts:
-                                    newest_post = new_posts[0]
-                                    await self.send_reddit_embed(channel, sub_name, newest_post, indicator="NEW")
-                                    cfg.setdefault('seen_ids', []).append(newest_post['id'])
-                                    cfg['last_posted_id'] = newest_post['id']
-                                    cfg['last_post_ts'] = now_ts
-
-                        # BEST flow
-                        last_best_ts = cfg.get('last_best_post_ts', 0)
-                        if now_ts - last_best_ts >= 300:
-                            best_post = fetch_random_best_post(sub_name, limit=100)
-                            if best_post and best_post['id'] not in cfg.get('seen_ids', []):
-                                await self.send_reddit_embed(channel, sub_name, best_post, indicator="BEST")
-                                cfg.setdefault('seen_ids', []).append(best_post['id'])
-                                cfg['last_best_post_ts'] = now_ts
-                
+                now_ts = discord.utils.utcnow().timestamp()
+                if await self.poll_due(now_ts):
+                    snapshot = {g: dict(m) for g, m in self.autopost_store.items()}
+                    await asyncio.to_thread(save_store, snapshot)
+                if now_ts - self.last_compaction >= SEEN_POSTS_COMPACT_INTERVAL:
+                    self.last_compaction = now_ts
+                    deleted = await asyncio.to_thread(compact_seen_posts)
+                    logging.info(f"Deleted {deleted} expired seen post(s)")
+                    # Hashes of posted images expire with the seen posts
+                    deleted = await asyncio.to_thread(
+                        hash_index.prune, 'reddit', now_ts - SEEN_POSTS_RETENTION_DAYS * 24 * 60 * 60
+                    )
+                    logging.info(f"Deleted {deleted} expired posted image hash(es)")
+
             except Exception as e:
                 logging.error(f"Autopost error: {e}")
 
-            # Wait 30s before checking again
-            await asyncio.sleep(30)
-            
+            # Sleep until the next subreddit is due or a new one is subscribed to
+            next_due = self.scheduler.next_due()
+            timeout = None if next_due is None else max(0.0, next_due - discord.utils.utcnow().timestamp())
+            self.schedule_changed.clear()
+            try:
+                await asyncio.wait_for(self.schedule_changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
     async def send_reddit_embed(self, channel, sub_name, post, indicator="NEW"):
         """Send a Reddit post as an embed"""
         try:
@@ -0,0 +1,149 @@
+"""
+Autopost Scheduler
+
+Subreddits wait in a min-heap keyed by when they are next due, so the
+autopost loop sleeps until the earliest one and only touches the subreddits
+that are due. Rescheduling pushes a new entry and leaves the old one in the
+heap; it is skipped when popped because it no longer matches the due time.
+
+Each subreddit's interval follows its post velocity: an exponentially
+weighted moving average of new posts per second (new posts in a poll over
+the time since the previous poll). The next interval is the time expected
+to bring TARGET_POSTS_PER_POLL new posts, kept within the configured
+bounds, so busy subreddits are polled sooner and quiet ones back off. The
+average starts at the velocity the default interval is right for, so one
+poll moves a subreddit's interval a step, not all the way to a bound.
+"""
+
+import heapq
+import itertools
+from typing import Dict, List, Optional
+from bot.core.config import AUTOPOST_INTERVAL, AUTOPOST_MIN_INTERVAL, AUTOPOST_MAX_INTERVAL
+
+# Weight of the latest poll in the velocity average
+VELOCITY_ALPHA = 0.3
+
+# New posts a poll should find on average
+TARGET_POSTS_PER_POLL = 1.0
+
+class PollScheduler:
+    """Min-heap of subreddits by next poll time, with adaptive intervals"""
+
+    def __init__(self, interval: float = AUTOPOST_INTERVAL, min_interval: float = AUTOPOST_MIN_INTERVAL,
+                 max_interval: float = AUTOPOST_MAX_INTERVAL):
+        """
+        Initialize the scheduler
+
+        Args:
+            interval: Interval of a subreddit with no velocity yet
+            min_interval: Shortest interval
+            max_interval: Longest interval
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._due: Dict[str, float] = {}
+        self._last_poll: Dict[str, float] = {}
+        self._velocity: Dict[str, float] = {}
+
+    def __contains__(self, subreddit: str) -> bool:
+        return subreddit in self._due
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def schedule(self, subreddit: str, due: float):
+        """
+        Set when a subreddit is next polled
+
+        Args:
+            subreddit: Subreddit name
+            due: Timestamp it is due at
+        """
+        self._due[subreddit] = due
+        heapq.heappush(self._heap, (due, next(self._counter), subreddit))
+
+    def remove(self, subreddit: str):
+        """Stop polling a subreddit (its heap entries are dropped when they come up)"""
+        self._due.pop(subreddit, None)
+        self._last_poll.pop(subreddit, None)
+        self._velocity.pop(subreddit, None)
+
+    def _prune(self):
+        """Drop stale entries from the top of the heap"""
+        while self._heap:
+            due, _, subreddit = self._heap[0]
+            if self._due.get(subreddit) == due:
+                return
+            heapq.heappop(self._heap)
+
+    def next_due(self) -> Optional[float]:
+        """
+        Get when the earliest subreddit is due
+
+        Returns:
+            Its timestamp, or None if nothing is scheduled
+        """
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> List[str]:
+        """
+        Take every subreddit that is due
+
+        They stay known to the scheduler; record() puts them back in the heap.
+
+        Args:
+            now: Current timestamp
+
+        Returns:
+            Subreddit names, earliest first
+        """
+        due = []
+        self._prune()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, subreddit = heapq.heappop(self._heap)
+            due.append(subreddit)
+            # Due but not in the heap until record() reschedules it
+            self._due[subreddit] = float('inf')
+            self._prune()
+        return due
+
+    def interval_for(self, subreddit: str) -> float:
+        """Get a subreddit's current interval from its velocity"""
+        velocity = self._velocity.get(subreddit)
+        if velocity is None:
+            return self.interval
+        if velocity <= 0:
+            return self.max_interval
+        return min(max(TARGET_POSTS_PER_POLL / velocity, self.min_interval), self.max_interval)
+
+    def record(self, subreddit: str, new_posts: Optional[int], now: float) -> float:
+        """
+        Record a poll and schedule the next one
+
+        Args:
+            subreddit: Subreddit name
+            new_posts: Posts that were not there on the previous poll, or
+                None if that is not known (first poll, failed fetch)
+            now: Time of the poll
+
+        Returns:
+            Seconds until the subreddit is polled again
+        """
+        if subreddit not in self._due:
+            # Removed while it was being polled
+            return self.interval
+
+        last_poll = self._last_poll.get(subreddit)
+        self._last_poll[subreddit] = now
+        if new_posts is not None and last_poll is not None and now > last_poll:
+            velocity = new_posts / (now - last_poll)
+            previous = self._velocity.get(subreddit, TARGET_POSTS_PER_POLL / self.interval)
+            self._velocity[subreddit] = VELOCITY_ALPHA * velocity + (1 - VELOCITY_ALPHA) * previous
+
+        interval = self.interval_for(subreddit)
+        self.schedule(subreddit, now + interval)
+        return interval
@@ -1,17 +1,12 @@
-import requests
 import random
-
-# Use a proper User-Agent to comply with Reddit's API guidelines
-USER_AGENT = 'RedditDiscordMemeBot/1.0 (by u/JaePyJs)'
-REDDIT_URL = 'https://www.reddit.com'
-HEADERS = {'User-Agent': USER_AGENT}
+from bot.features.reddit.client import reddit_client, REDDIT_URL
 
 POPULAR_MEME_SUBS = [
     'memes', 'dankmemes', 'wholesomememes', 'AdviceAnimals', 'MemeEconomy',
     'me_irl', 'funny', 'PrequelMemes', 'terriblefacebookmemes', 'historymemes'
 ]
 
-def fetch_top_memes(subreddit=None, limit=5, time_filter='day'):
+async def fetch_top_memes(subreddit=None, limit=5, time_filter='day'):
     if not subreddit:
         subreddit = random.choice(POPULAR_MEME_SUBS)
 
@@ -22,44 +17,39 @@ def fetch_top_memes(subreddit=None, limit=5, time_filter='day'):
         # Print debug info
         print(f"Fetching from r/{subreddit} with time filter: {current_filter}")
 
-        url = f'{REDDIT_URL}/r/{subreddit}/top.json'
+        path = f'/r/{subreddit}/top.json'
         params = {'limit': 25, 't': current_filter}  # Fetch more posts to increase chances of finding images
 
         try:
-            resp = requests.get(url, headers=HEADERS, params=params, timeout=10)
-
-            if resp.status_code == 200:
-                data = resp.json()
-
-                # Check if we got valid data
-                if 'data' in data and 'children' in data['data']:
-                    posts = data['data']['children']
-                    print(f"Found {len(posts)} posts in r/{subreddit}")
-
-                    # Filter for image posts with more formats
-                    memes = []
-                    for p in posts:
-                        post_data = p.get('data', {})
-                        post_url = post_data.get('url', '')
-
-                        # Check for direct image links
-                        if post_url.endswith(('.jpg', '.png', '.jpeg', '.gif', '.webp')):
-                            memes.append(post_url)
-                        # Check for Reddit gallery
-                        elif 'gallery' in post_url or post_data.get('is_gallery', False):
-                            # For galleries, we can only get the thumbnail
-                            if 'thumbnail' in post_data and post_data['thumbnail'].startswith('http'):
-                                memes.append(post_data['thumbnail'])
-
-                    print(f"Found {len(memes)} meme images in r/{subreddit}")
-
-                    # If we found enough memes, return them
-                    if len(memes) >= limit:
-                        return memes[:limit]
-                else:
-                    print(f"Invalid data structure from Reddit for r/{subreddit}")
+            data = await reddit_client.get_json(path, params)
+
+            # Check if we got valid data
+            if 'data' in data and 'children' in data['data']:
+                posts = data['data']['children']
+                print(f"Found {len(posts)} posts in r/{subreddit}")
+
+                # Filter for image posts with more formats
+                memes = []
+                for p in posts:
+                    post_data = p.get('data', {})
+                    post_url = post_data.get('url', '')
+
+                    # Check for direct image links
+                    if post_url.endswith(('.jpg', '.png', '.jpeg', '.gif', '.webp')):
+                        memes.append(post_url)
+                    # Check for Reddit gallery
+                    elif 'gallery' in post_url or post_data.get('is_gallery', False):
+                        # For galleries, we can only get the thumbnail
+                        if 'thumbnail' in post_data and post_data['thumbnail'].startswith('http'):
+                            memes.append(post_data['thumbnail'])
+
+                print(f"Found {len(memes)} meme images in r/{subreddit}")
+
+                # If we found enough memes, return them
+                if len(memes) >= limit:
+                    return memes[:limit]
             else:
-                print(f"Reddit returned status code {resp.status_code} for r/{subreddit}")
+                print(f"Invalid data structure from Reddit for r/{subreddit}")
 
         except Exception as e:
             print(f"Error fetching from Reddit: {e}")
@@ -68,76 +58,66 @@ def fetch_top_memes(subreddit=None, limit=5, time_filter='day'):
     return []
 
 
-def fetch_newest_meme(subreddit):
+async def fetch_newest_meme(subreddit):
     """Fetch the newest meme from a subreddit with title, author, and image URL."""
     print(f"Fetching newest meme from r/{subreddit}")
 
-    url = f'{REDDIT_URL}/r/{subreddit}/new.json'
+    path = f'/r/{subreddit}/new.json'
     params = {'limit': 25}  # Fetch several posts to find an image
 
     try:
-        resp = requests.get(url, headers=HEADERS, params=params, timeout=10)
-
-        if resp.status_code == 200:
-            data = resp.json()
-
-            if 'data' in data and 'children' in data['data']:
-                posts = data['data']['children']
-                print(f"Found {len(posts)} new posts in r/{subreddit}")
-
-                # Look for image posts
-                for p in posts:
-                    post_data = p.get('data', {})
-                    post_url = post_data.get('url', '')
-                    post_title = post_data.get('title', 'No Title')
-                    post_author = post_data.get('author', 'Unknown')
-                    post_permalink = post_data.get('permalink', '')
-
-                    # Check for direct image links
-                    is_image = post_url.endswith(('.jpg', '.png', '.jpeg', '.gif', '.webp'))
-                    is_gallery = 'gallery' in post_url or post_data.get('is_gallery', False)
-
-                    if is_image or is_gallery:
-                        # For galleries, use the thumbnail if available
-                        if is_gallery and 'thumbnail' in post_data and post_data['thumbnail'].startswith('http'):
-                            post_url = post_data['thumbnail']
-
-                        # Create full Reddit post URL
-                        reddit_post_url = f"{REDDIT_URL}{post_permalink}"
-
-                        # Include the post ID for tracking
-                        post_id = post_data.get('id', '')
-                        return {
-                            'id': post_id,  # Add post ID for tracking
-                            'title': post_title,
-                            'author': post_author,
-                            'image_url': post_url,
-                            'post_url': reddit_post_url
-                        }
-
-                print(f"No image posts found in r/{subreddit}")
-            else:
-                print(f"Invalid data structure from Reddit for r/{subreddit}")
+        data = await reddit_client.get_json(path, params)
+
+        if 'data' in data and 'children' in data['data']:
+            posts = data['data']['children']
+            print(f"Found {len(posts)} new posts in r/{subreddit}")
+
+            # Look for image posts
+            for p in posts:
+                post_data = p.get('data', {})
+                post_url = post_data.get('url', '')
+                post_title = post_data.get('title', 'No Title')
+                post_author = post_data.get('author', 'Unknown')
+                post_permalink = post_data.get('permalink', '')
+
+                # Check for direct image links
+                is_image = post_url.endswith(('.jpg', '.png', '.jpeg', '.gif', '.webp'))
+                is_gallery = 'gallery' in post_url or post_data.get('is_gallery', False)
+
+                if is_image or is_gallery:
+                    # For galleries, use the thumbnail if available
+                    if is_gallery and 'thumbnail' in post_data and post_data['thumbnail'].startswith('http'):
+                        post_url = post_data['thumbnail']
+
+                    # Create full Reddit post URL
+                    reddit_post_url = f"{REDDIT_URL}{post_permalink}"
+
+                    # Include the post ID for tracking
+                    post_id = post_data.get('id', '')
+                    return {
+                        'id': post_id,  # Add post ID for tracking
+                        'title': post_title,
+                        'author': post_author,
+                        'image_url': post_url,
+                        'post_url': reddit_post_url
+                    }
+
+            print(f"No image posts found in r/{subreddit}")
         else:
-            print(f"Reddit returned status code {resp.status_code} for r/{subreddit}")
+            print(f"Invalid data structure from Reddit for r/{subreddit}")
 
     except Exception as e:
         print(f"Error fetching from Reddit: {e}")
 
     return None
 
-def fetch_random_new_meme(subreddit, exclude_ids=None, limit=25):
+async def fetch_random_new_meme(subreddit, exclude_ids=None, limit=25):
     """Fetch a random image meme from subreddit new posts, excluding any IDs in exclude_ids."""
     if exclude_ids is None:
         exclude_ids = set()
-    url = f'{REDDIT_URL}/r/{subreddit}/new.json'
     params = {'limit': limit}
     try:
-        resp = requests.get(url, headers=HEADERS, params=params, timeout=10)
-        if resp.status_code != 200:
-            print(f"Reddit status {resp.status_code} for r/{subreddit}")
-            return None
-        data = resp.json()
+        data = await reddit_client.get_json(f'/r/{subreddit}/new.json', params)
         posts = data.get('data', {}).get('children', [])
         candidates = []
         for p in posts:
@@ -162,21 +142,15 @@ def fetch_random_new_meme(subreddit, exclude_ids=None, limit=25):
         if not candidates:
             print(f"No new image memes found in r/{subreddit}")
             return None
-        import random
         return random.choice(candidates)
     except Exception as e:
         print(f"Random meme fetch error: {e}")
         return None
 
-def fetch_new_posts(subreddit, limit=10):
+async def fetch_new_posts(subreddit, limit=10):
     """Return list of newest image posts sorted newest->older."""
-    url = f"{REDDIT_URL}/r/{subreddit}/new.json"
-    params = {'limit': limit}
     try:
-        r = requests.get(url, headers=HEADERS, params=params, timeout=10)
-        if r.status_code != 200:
-            return []
-        data = r.json().get('data', {}).get('children', [])
+        data = await reddit_client.get_listing(subreddit, 'new', {'limit': limit})
         results = []
         for p in data:
             d = p.get('data', {})
@@ -221,15 +195,11 @@ def fetch_new_posts(subreddit, limit=10):
     except Exception:
         return []
 
-def fetch_random_best_post(subreddit, limit=100):
+async def fetch_random_best_post(subreddit, limit=100):
     """Return a random image post from best sort (top all-time) with image."""
-    import random
-    url = f"{REDDIT_URL}/r/{subreddit}/best.json"
-    params = {'limit': limit}
     try:
-        r = requests.get(url, headers=HEADERS, params=params, timeout=10)
-        r.raise_for_status()
-        children = r.json().get('data', {}).get('children', [])
+        data = await reddit_client.get_json(f'/r/{subreddit}/best.json', {'limit': limit})
+        children = data.get('data', {}).get('children', [])
         candidates = []
         for p in children:
             d = p['data']
@@ -257,7 +257,7 @@ async def autopost_loop():
 
                     # NEWEST flow
                     if now_ts - last_ts >= 300:
-                        posts = fetch_new_posts(sub_name, limit=10)
+                        posts = await fetch_new_posts(sub_name, limit=10)
                         if posts:
                             new_posts = []
                             for p in posts:
@@ -274,7 +274,7 @@ async def autopost_loop():
                     # BEST flow
                     last_best_ts = cfg.get('last_best_post_ts', 0)
                     if now_ts - last_best_ts >= 300:
-                        best_post = fetch_random_best_post(sub_name, limit=100)
+                        best_post = await fetch_random_best_post(sub_name, limit=100)
                         if best_post and best_post['id'] not in cfg.get('seen_ids', []):
                             await send_reddit_embed(channel, sub_name, best_post, indicator="BEST")
                             cfg.setdefault('seen_ids', []).append(best_post['id'])
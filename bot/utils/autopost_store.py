@@ -1,7 +1,10 @@
 # Switched persistence from JSON to SQLite for durability
 import os
+import time
 import sqlite3
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Optional
+from bot.core.config import SEEN_POSTS_CAPACITY, SEEN_POSTS_BLOOM_BITS, SEEN_POSTS_RETENTION_DAYS
+from bot.utils.seen_set import SeenSet
 
 # SQLite database lives alongside codebase
 DB_PATH = os.getenv('MEME_BOT_DB', 'meme_bot.db')
@@ -36,10 +39,17 @@ def _ensure_tables():
                 guild_id TEXT NOT NULL,
                 subreddit TEXT NOT NULL,
                 post_id TEXT NOT NULL,
+                seen_at INTEGER NOT NULL DEFAULT 0,
                 PRIMARY KEY (guild_id, subreddit, post_id)
             );
             """
         )
+        # Older databases have no seen_at; their rows count as seen now
+        columns = [row[1] for row in cur.execute("PRAGMA table_info(seen_posts)")]
+        if 'seen_at' not in columns:
+            cur.execute("ALTER TABLE seen_posts ADD COLUMN seen_at INTEGER NOT NULL DEFAULT 0")
+            cur.execute("UPDATE seen_posts SET seen_at = ?", (int(time.time()),))
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_seen_posts_seen_at ON seen_posts (seen_at)")
         conn.commit()
 
 
@@ -56,12 +66,9 @@ _DEFAULT_CFG: Dict[str, Any] = {
 }
 
 
-def _fetch_seen_ids(cur, guild_id: str, subreddit: str) -> List[str]:
-    cur.execute(
-        "SELECT post_id FROM seen_posts WHERE guild_id=? AND subreddit=?",
-        (guild_id, subreddit),
-    )
-    return [row[0] for row in cur.fetchall()]
+def new_seen_set(post_ids=()) -> SeenSet:
+    """Create a seen-post set with the configured size from stored IDs (oldest first)."""
+    return SeenSet(post_ids, capacity=SEEN_POSTS_CAPACITY, bloom_bits=SEEN_POSTS_BLOOM_BITS)
 
 
 def load_store() -> Dict[str, Dict[str, Any]]:
@@ -69,6 +76,13 @@ def load_store() -> Dict[str, Dict[str, Any]]:
     store: Dict[str, Dict[str, Any]] = {}
     with _get_conn() as conn:
         cur = conn.cursor()
+        # One query for every subscription's seen posts, oldest first so the newest stay in the ring
+        seen: Dict[Tuple[str, str], List[str]] = {}
+        for gid, sub, pid in cur.execute(
+            "SELECT guild_id, subreddit, post_id FROM seen_posts ORDER BY seen_at, rowid"
+        ):
+            seen.setdefault((gid, sub), []).append(pid)
+
         for row in cur.execute("SELECT * FROM subreddit_configs"):
             gid = row['guild_id']
             sub = row['subreddit']
@@ -77,7 +91,7 @@ def load_store() -> Dict[str, Dict[str, Any]]:
                 'last_posted_id': row['last_posted_id'],
                 'last_post_ts': row['last_post_ts'],
                 'last_best_post_ts': row['last_best_post_ts'],
-                'seen_ids': _fetch_seen_ids(cur, gid, sub),
+                'seen_ids': new_seen_set(seen.get((gid, sub), ())),
             }
             store.setdefault(gid, {})[sub] = cfg
     return store
@@ -88,11 +102,20 @@ def save_store(store: Dict[str, Dict[str, Any]]):
     try:
         with _get_conn() as conn:
             cur = conn.cursor()
+            now = int(time.time())
+            saved: List[Tuple[SeenSet, int]] = []
             for guild_id, guild_map in store.items():
                 for subreddit, cfg in guild_map.items():
-                    # keep `seen_ids` manageable
-                    if len(cfg['seen_ids']) > 500:
-                        cfg['seen_ids'] = cfg['seen_ids'][-500:]
+                    seen = cfg.get('seen_ids', [])
+                    if isinstance(seen, SeenSet):
+                        # Only IDs added since the last save are written
+                        new_ids = seen.unsaved()
+                        saved.append((seen, len(new_ids)))
+                    else:
+                        # keep `seen_ids` manageable
+                        if len(seen) > 500:
+                            cfg['seen_ids'] = seen = seen[-500:]
+                        new_ids = seen
 
                     # Upsert config row
                     cur.execute(
@@ -118,12 +141,13 @@ def save_store(store: Dict[str, Dict[str, Any]]):
                     )
 
                     # Insert seen post ids
-                    for pid in cfg.get('seen_ids', []):
-                        cur.execute(
-                            "INSERT OR IGNORE INTO seen_posts (guild_id, subreddit, post_id) VALUES (?,?,?)",
-                            (guild_id, subreddit, pid),
-                        )
+                    cur.executemany(
+                        "INSERT OR IGNORE INTO seen_posts (guild_id, subreddit, post_id, seen_at) VALUES (?,?,?,?)",
+                        [(guild_id, subreddit, pid, now) for pid in new_ids],
+                    )
             conn.commit()
+            for seen, count in saved:
+                seen.mark_saved(count)
     except Exception as e:
         print(f"Failed to save autopost store: {e}")
 
@@ -140,7 +164,7 @@ def add_subreddit(guild_id: int, subreddit: str, channel_id: int):
     """Add or update a subreddit configuration for a guild."""
     store = load_store()
     guild_map = _ensure_guild(store, guild_id)
-    sub_cfg = guild_map.get(subreddit, _DEFAULT_CFG.copy())
+    sub_cfg = guild_map.get(subreddit, dict(_DEFAULT_CFG, seen_ids=new_seen_set()))
     sub_cfg['channel_id'] = channel_id
     guild_map[subreddit] = sub_cfg
     save_store(store)
@@ -176,7 +200,40 @@ def is_post_seen(guild_id: int, subreddit: str, post_id: str) -> bool:
 def mark_post_seen(guild_id: int, subreddit: str, post_id: str):
     with _get_conn() as conn:
         conn.execute(
-            "INSERT OR IGNORE INTO seen_posts (guild_id, subreddit, post_id) VALUES (?,?,?)",
-            (guild_id, subreddit, post_id),
+            "INSERT OR IGNORE INTO seen_posts (guild_id, subreddit, post_id, seen_at) VALUES (?,?,?,?)",
+            (guild_id, subreddit, post_id, int(time.time())),
         )
         conn.commit()
+
+
+def compact_seen_posts(retention_days: int = SEEN_POSTS_RETENTION_DAYS,
+                       keep: Optional[int] = None) -> int:
+    """Delete seen posts older than the retention period, and beyond the newest `keep` per subscription.
+
+    Without a Bloom filter only the newest SEEN_POSTS_CAPACITY posts of a
+    subscription are ever loaded, so that is the default for `keep`.
+    Returns the number of rows deleted.
+    """
+    if keep is None and SEEN_POSTS_BLOOM_BITS <= 0:
+        keep = SEEN_POSTS_CAPACITY
+    with _get_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM seen_posts WHERE seen_at < ?", (int(time.time()) - retention_days * 86400,))
+        deleted = cur.rowcount
+        if keep is not None:
+            cur.execute(
+                """
+                DELETE FROM seen_posts WHERE rowid IN (
+                    SELECT rowid FROM (
+                        SELECT rowid, ROW_NUMBER() OVER (
+                            PARTITION BY guild_id, subreddit ORDER BY seen_at DESC, rowid DESC
+                        ) AS position
+                        FROM seen_posts
+                    ) WHERE position > ?
+                )
+                """,
+                (keep,),
+            )
+            deleted += cur.rowcount
+        conn.commit()
+        return deleted
@@ -1,14 +1,17 @@
-from PIL import Image
+from PIL import Image, ImageStat
 from typing import Tuple
 
 def get_average_luminance(img, box):
     """
     Calculate the average luminance of the area in box (x, y, w, h).
+    Templates have precomputed maps for this (bot.utils.image_maps); this is
+    the fallback for images without them.
     """
     x, y, w, h = box
+    if w <= 0 or h <= 0:
+        return 128
     crop = img.crop((x, y, x+w, y+h)).convert('L')
-    pixels = list(crop.getdata())
-    return sum(pixels) / len(pixels) if pixels else 128
+    return ImageStat.Stat(crop).mean[0]
 
 
 def pick_text_color(bg_luminance, light_color=(255,255,255), dark_color=(0,0,0), threshold=128):
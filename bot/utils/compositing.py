@@ -0,0 +1,304 @@
+"""
+Layer Compositing for Meme Rendering
+
+Watermarks and stickers are rendered once into small RGBA layers, cropped to
+what they actually cover, and kept in a per-process cache keyed by what
+decides their pixels (text, font, size and opacity for a watermark; file,
+version and scale for a sticker). Compositing a layer only blends the pixels
+inside its box, so adding one to a rendered meme costs about as much as the
+layer is big, not the frame.
+
+Layers are described by plain dicts so they can travel in render job specs:
+
+    {'kind': 'watermark', 'text': '@MemeBot', 'font_size': 24, 'opacity': 128,
+     'position': 'bottom_right', 'margin': 10}
+    {'kind': 'sticker', 'path': 'assets/images/hat.png', 'scale': 0.5, 'x': 40, 'y': 10}
+
+Either kind may give 'position' (top_left, top_right, bottom_left,
+bottom_right) with a 'margin' instead of 'x' and 'y'.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+from PIL import Image, ImageDraw
+from bot.core.config import (
+    LAYER_CACHE_MAX_BYTES, WATERMARK_TEXT, WATERMARK_POSITION, WATERMARK_OPACITY, WATERMARK_FONT_SIZE
+)
+from bot.utils.font_utils import get_font
+from bot.utils.image_loader import load_image
+
+# Face used for watermarks without a font of their own
+WATERMARK_FACE = 'sans'
+
+# (left, top, right, bottom) in frame pixels
+Box = Tuple[int, int, int, int]
+
+class LayerCache:
+    """
+    Memory-bounded LRU cache of pre-rendered RGBA layers
+
+    Layers are shared between callers and must not be drawn on.
+    """
+
+    def __init__(self, max_bytes: int = LAYER_CACHE_MAX_BYTES):
+        """
+        Initialize the cache
+
+        Args:
+            max_bytes: Upper bound on the total pixel bytes held
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, build: Callable[[], Image.Image]) -> Image.Image:
+        """
+        Get a layer, building it on a miss
+
+        Args:
+            key: Everything that decides the layer's pixels
+            build: Renders the layer
+
+        Returns:
+            The cached RGBA layer
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        layer = build()
+        size = layer.width * layer.height * 4
+        if size > self.max_bytes:
+            return layer
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted
+                self.evictions += 1
+            self._entries[key] = (layer, size)
+            self.current_bytes += size
+        return layer
+
+    def clear(self):
+        """Drop every cached layer"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters
+
+        Returns:
+            Dictionary with hits, misses, evictions, entries, bytes and hit rate
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+
+# Create a singleton instance (one per process, so each render worker has its own)
+layer_cache = LayerCache()
+
+def watermark_layer(text: str, font_size: int = 24, opacity: int = 128,
+                    font: Optional[str] = None) -> Image.Image:
+    """
+    Get the RGBA layer of a watermark, cropped to the text
+
+    Args:
+        text: Watermark text
+        font_size: Font size in pixels
+        opacity: Alpha of the text (0 to 255)
+        font: Font face name or path (default: WATERMARK_FACE)
+
+    Returns:
+        The cached layer
+    """
+    face = font or WATERMARK_FACE
+
+    def build():
+        ttf = get_font(face, font_size)
+        left, top, right, bottom = ttf.getbbox(text)
+        layer = Image.new('RGBA', (max(1, right - left), max(1, bottom - top)), (255, 255, 255, 0))
+        ImageDraw.Draw(layer).text((-left, -top), text, font=ttf, fill=(255, 255, 255, opacity))
+        return layer
+
+    return layer_cache.get(('watermark', text, face, font_size, opacity), build)
+
+def sticker_layer(path: str, scale: float = 1.0) -> Image.Image:
+    """
+    Get the RGBA layer of a sticker image at a scale
+
+    The file's mtime and size are part of the key, so a replaced sticker is
+    decoded again.
+
+    Args:
+        path: Path to the sticker image
+        scale: Scale factor for the sticker
+
+    Returns:
+        The cached layer
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+
+    def build():
+        sticker = load_image(path, mode='RGBA')
+        if scale != 1.0:
+            size = (max(1, int(sticker.width * scale)), max(1, int(sticker.height * scale)))
+            sticker = sticker.resize(size, Image.LANCZOS)
+        return sticker
+
+    return layer_cache.get(('sticker', path, st.st_mtime_ns, st.st_size, round(scale, 4)), build)
+
+def resolve_layer(spec: Dict[str, Any]) -> Image.Image:
+    """
+    Get the cached layer a spec describes
+
+    Raises:
+        ValueError: If the spec is of an unknown kind
+    """
+    kind = spec.get('kind')
+    if kind == 'watermark':
+        return watermark_layer(spec['text'], spec.get('font_size', 24), spec.get('opacity', 128),
+                               spec.get('font'))
+    if kind == 'sticker':
+        return sticker_layer(spec['path'], spec.get('scale', 1.0))
+    raise ValueError(f"Unknown layer kind '{kind}'")
+
+def layer_origin(spec: Dict[str, Any], layer_size: Tuple[int, int],
+                 frame_size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Get the top-left corner of a layer in the frame
+
+    Args:
+        spec: Layer spec with 'position' and 'margin', or 'x' and 'y'
+        layer_size: (width, height) of the layer
+        frame_size: (width, height) of the frame
+
+    Returns:
+        (x, y), which may lie partly outside the frame
+    """
+    position = spec.get('position')
+    if position is None:
+        return int(spec.get('x', 0)), int(spec.get('y', 0))
+
+    margin = spec.get('margin', 10)
+    x = frame_size[0] - layer_size[0] - margin if position.endswith('right') else margin
+    y = frame_size[1] - layer_size[1] - margin if position.startswith('bottom') else margin
+    return x, y
+
+def layer_pieces(specs: Optional[List[Dict[str, Any]]],
+                 frame_size: Tuple[int, int]) -> List[Tuple[Image.Image, Box]]:
+    """
+    Place layers on a frame, clipped to it
+
+    Args:
+        specs: Layer specs, bottom-most first
+        frame_size: (width, height) of the frame
+
+    Returns:
+        List of (RGBA layer or the part of it inside the frame, its box in the frame)
+    """
+    pieces = []
+    for spec in specs or []:
+        layer = resolve_layer(spec)
+        x, y = layer_origin(spec, layer.size, frame_size)
+        box = (max(0, x), max(0, y), min(frame_size[0], x + layer.width), min(frame_size[1], y + layer.height))
+        if box[0] >= box[2] or box[1] >= box[3]:
+            continue
+        if box != (x, y, x + layer.width, y + layer.height):
+            layer = layer.crop((box[0] - x, box[1] - y, box[2] - x, box[3] - y))
+        pieces.append((layer, box))
+    return pieces
+
+def composite_pieces(img: Image.Image, pieces: List[Tuple[Image.Image, Box]]) -> Image.Image:
+    """
+    Blend placed layers onto an image in place, touching only their boxes
+
+    Args:
+        img: RGB or RGBA image to draw on
+        pieces: Layers from layer_pieces
+
+    Returns:
+        The same image
+    """
+    for piece, box in pieces:
+        if img.mode == 'RGBA':
+            img.alpha_composite(piece, box[:2])
+        else:
+            img.paste(piece, box[:2], piece)
+    return img
+
+def composite_layers(img: Image.Image, specs: Optional[List[Dict[str, Any]]]) -> Image.Image:
+    """
+    Draw layers onto an image in place
+
+    Args:
+        img: RGB or RGBA image to draw on
+        specs: Layer specs, bottom-most first
+
+    Returns:
+        The same image
+    """
+    if specs:
+        composite_pieces(img, layer_pieces(specs, img.size))
+    return img
+
+def blend_images(base: Image.Image, other: Image.Image, alpha: float = 0.5) -> Image.Image:
+    """
+    Blend two decoded images
+
+    Args:
+        base: First image, which decides the size
+        other: Second image, resized to the first if needed
+        alpha: 0.0 (only base) to 1.0 (only other)
+
+    Returns:
+        A new image, RGBA if either input has transparency, else RGB
+    """
+    mode = 'RGBA' if 'A' in base.getbands() or 'A' in other.getbands() else 'RGB'
+    if base.mode != mode:
+        base = base.convert(mode)
+    if other.mode != mode:
+        other = other.convert(mode)
+    if other.size != base.size:
+        other = other.resize(base.size, Image.BICUBIC)
+    return Image.blend(base, other, alpha)
+
+def default_layers() -> Optional[List[Dict[str, Any]]]:
+    """
+    Get the layers every rendered meme carries (the configured watermark)
+
+    Returns:
+        List of layer specs, or None when WATERMARK_TEXT is not set
+    """
+    if not WATERMARK_TEXT:
+        return None
+    return [{
+        'kind': 'watermark',
+        'text': WATERMARK_TEXT,
+        'font_size': WATERMARK_FONT_SIZE,
+        'opacity': WATERMARK_OPACITY,
+        'position': WATERMARK_POSITION,
+        'margin': 10,
+    }]
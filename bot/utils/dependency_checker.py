@@ -24,10 +24,10 @@ def verify_dependencies():
     Verify all external dependencies required by the bot.
     Logs warnings for missing dependencies.
     """
-    # Check FFmpeg (required for music playback)
+    # Check FFmpeg (required for music playback and video memes)
     if not check_ffmpeg():
-        logging.warning("FFmpeg is not installed or not in PATH. Music functionality will not work.")
-        print("WARNING: FFmpeg is not installed or not in PATH. Music functionality will not work.")
+        logging.warning("FFmpeg is not installed or not in PATH. Music and video meme functionality will not work.")
+        print("WARNING: FFmpeg is not installed or not in PATH. Music and video meme functionality will not work.")
         print("Please install FFmpeg: https://ffmpeg.org/download.html")
         
     # Add more dependency checks here as needed
@@ -1,56 +1,162 @@
-from PIL import ImageFont, Image, ImageDraw
+import io
+import os
+import logging
+import threading
+from collections import OrderedDict
+from PIL import ImageFont
+from bot.core.config import ASSETS_DIR
+
+# Directories searched for font files, bundled fonts first
+FONT_SEARCH_DIRS = [
+    os.path.join(ASSETS_DIR, 'fonts'),
+    '/usr/share/fonts/truetype/msttcorefonts',
+    '/usr/share/fonts/truetype/dejavu',
+    '/usr/share/fonts/truetype/liberation',
+    '/usr/share/fonts/TTF',
+    'C:/Windows/Fonts',
+    '/Library/Fonts',
+    '/System/Library/Fonts/Supplemental',
+]
+
+# Font faces by name, in order of preference
+FONT_FACES = {
+    'impact': ['impact.ttf', 'Impact.ttf', 'Anton-Regular.ttf', 'DejaVuSans-Bold.ttf',
+               'LiberationSans-Bold.ttf', 'arialbd.ttf', 'Arial Bold.ttf'],
+    'sans': ['DejaVuSans.ttf', 'LiberationSans-Regular.ttf', 'arial.ttf', 'Arial.ttf'],
+}
+
+DEFAULT_FACE = 'impact'
+
+class FontRegistry:
+    """
+    Loads each font file once and caches FreeTypeFont objects per (face, size).
+
+    Faces are either names from FONT_FACES or paths to font files. When no
+    file can be found, Pillow's bundled scalable font is used instead.
+    """
+
+    def __init__(self, max_fonts=256):
+        self.max_fonts = max_fonts
+        self.file_reads = 0
+        self.loads = 0
+        self.hits = 0
+        self._data = {}
+        self._fonts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _find_file(self, face):
+        """Find the font file for a face name or path, or None for Pillow's default"""
+        if os.path.isfile(face):
+            return face
+        for filename in FONT_FACES.get(face.lower(), [face]):
+            for font_dir in FONT_SEARCH_DIRS:
+                path = os.path.join(font_dir, filename)
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def _font_data(self, face):
+        """Get the raw bytes of a face's font file, reading it at most once"""
+        if face not in self._data:
+            path = self._find_file(face)
+            if path:
+                with open(path, 'rb') as f:
+                    self._data[face] = f.read()
+                self.file_reads += 1
+            else:
+                logging.warning(f"Font '{face}' not found, using Pillow's default font")
+                self._data[face] = None
+        return self._data[face]
+
+    def get_font(self, face, size):
+        """
+        Returns a cached font object for the face at the given pixel size.
+        """
+        face = face or DEFAULT_FACE
+        key = (face, size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+
+            data = self._font_data(face)
+            if data is None:
+                font = ImageFont.load_default(size=size)
+            else:
+                font = ImageFont.truetype(io.BytesIO(data), size)
+            self.loads += 1
+
+            self._fonts[key] = font
+            if len(self._fonts) > self.max_fonts:
+                self._fonts.popitem(last=False)
+            return font
+
+    def stats(self):
+        """Returns the registry's load and hit counters."""
+        return {
+            'file_reads': self.file_reads,
+            'loads': self.loads,
+            'hits': self.hits,
+            'cached_fonts': len(self._fonts),
+        }
+
+# Create a singleton instance (one per process)
+font_registry = FontRegistry()
+
+def get_font(face=None, size=48):
+    """
+    Returns a cached font for a face name or font file path.
+    """
+    return font_registry.get_font(face, size)
+
+def _text_fits(text, font, size, max_width, max_height):
+    """Check whether every line fits the width and the stacked lines fit the height."""
+    max_line_width = 0
+    total_height = 0
+    for line in text.split('\n'):
+        if not line:  # Handle empty lines
+            total_height += size  # Approximate height for empty line
+            continue
+        bbox = font.getbbox(line)
+        max_line_width = max(max_line_width, bbox[2] - bbox[0])
+        total_height += bbox[3] - bbox[1]
+    return max_line_width <= max_width and total_height <= max_height
 
 def get_best_fit_font(text, font_path, max_width, max_height, start_size=48, min_size=10):
     """
     Returns a font object with the largest size such that text fits in the given box.
-    Uses modern Pillow methods for font size calculation.
+    font_path may be a font file path or a face name from FONT_FACES.
+
+    Candidate sizes step down by 2 from start_size. Text extents grow with
+    the font size, so a binary search over the candidates finds the same
+    size as trying them one by one, with far fewer measurements.
     """
-    # Use a default font if the specified font is not available
-    if not font_path:
-        font_path = ImageFont.load_default()
+    sizes = list(range(start_size, min_size - 1, -2))
 
-    size = start_size
-    while size >= min_size:
+    def fits(size):
         try:
-            font = ImageFont.truetype(font_path, size)
-            lines = text.split('\n')
-
-            # Create a temporary drawing context to measure text
-            # This is more accurate than using getsize which is deprecated
-            img = Image.new('RGB', (1, 1))
-            draw = ImageDraw.Draw(img)
-
-            # Calculate width and height using getbbox (modern method)
-            widths = []
-            heights = []
-            for line in lines:
-                if not line:  # Handle empty lines
-                    heights.append(size)  # Approximate height for empty line
-                    widths.append(0)
-                    continue
-
-                # Get bounding box for text
-                bbox = draw.textbbox((0, 0), line, font=font)
-                width = bbox[2] - bbox[0]
-                height = bbox[3] - bbox[1]
-                widths.append(width)
-                heights.append(height)
-
-            # Check if text fits in the box
-            max_line_width = max(widths) if widths else 0
-            total_height = sum(heights)
-
-            if max_line_width <= max_width and total_height <= max_height:
-                return font
+            return _text_fits(text, get_font(font_path, size), size, max_width, max_height)
         except Exception as e:
-            # If there's an error with this font size, try a smaller one
-            print(f"Font error at size {size}: {e}")
+            # A size that can't be measured counts as not fitting
+            logging.warning(f"Font error at size {size}: {e}")
+            return False
 
-        size -= 2
+    # Find the first (largest) candidate that fits
+    lo, hi = 0, len(sizes)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if fits(sizes[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    if lo < len(sizes):
+        return get_font(font_path, sizes[lo])
 
     # If no size fits, return the smallest allowed size
     try:
-        return ImageFont.truetype(font_path, min_size)
+        return get_font(font_path, min_size)
     except Exception:
         # Fallback to default font if everything else fails
         return ImageFont.load_default()
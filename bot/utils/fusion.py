@@ -1,13 +1,15 @@
-from PIL import Image
+from bot.utils.image_loader import load_image
+from bot.utils.compositing import blend_images
 
 def fuse_images(img1_path, img2_path, output_path, alpha=0.5):
     """
     Blend two images together with the given alpha.
     alpha: 0.0 (only img1) to 1.0 (only img2)
+    Use bot.utils.compositing.blend_images for images already in memory.
     """
-    img1 = Image.open(img1_path).convert('RGBA')
-    img2 = Image.open(img2_path).convert('RGBA')
-    img2 = img2.resize(img1.size)
-    fused = Image.blend(img1, img2, alpha)
+    img1 = load_image(img1_path, mode='RGBA')
+    # Decode the second image no larger than the first
+    img2 = load_image(img2_path, max_size=img1.size, mode='RGBA')
+    fused = blend_images(img1, img2, alpha)
     fused.save(output_path)
     return output_path
@@ -1,11 +1,124 @@
-from PIL import Image, ImageSequence
+from PIL import Image, GifImagePlugin
+import numpy as np
+from bot.utils.image_loader import load_image
+
+# Colors in the shared palette (one index is left free)
+PALETTE_COLORS = 255
+
+# Longest side of each frame sample used to build the palette
+PALETTE_SAMPLE_SIZE = 96
+
+def build_palette(samples):
+    """
+    Builds one palette image from a few sample frames, to be shared by every
+    frame of a GIF. Quantizing against a fixed palette is much cheaper than
+    choosing a palette per frame, and unchanged pixels keep the same index,
+    which keeps frame deltas small.
+    samples: RGB images (any size)
+    """
+    thumbs = []
+    for sample in samples:
+        thumb = sample.copy()
+        thumb.thumbnail((PALETTE_SAMPLE_SIZE, PALETTE_SAMPLE_SIZE), Image.Resampling.BOX)
+        thumbs.append(thumb)
+    width = sum(t.width for t in thumbs)
+    height = max(t.height for t in thumbs)
+    montage = Image.new('RGB', (width, height))
+    x = 0
+    for thumb in thumbs:
+        montage.paste(thumb, (x, 0))
+        x += thumb.width
+    return montage.quantize(PALETTE_COLORS)
+
+def quantize(img, palette):
+    """
+    Maps an RGB image onto a shared palette without dithering, so every
+    pixel depends only on itself and a region can be quantized on its own.
+    """
+    return img.quantize(palette=palette, dither=Image.Dither.NONE)
+
+def _changed_box(previous, current):
+    """Returns the bounding box of the indices that differ, or None."""
+    diff = np.asarray(previous) != np.asarray(current)
+    rows = np.flatnonzero(diff.any(axis=1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(diff.any(axis=0))
+    return (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+class GifWriter:
+    """
+    Writes a GIF one frame at a time with a single global palette.
+    Only the rectangle that changed since the previous frame is stored, and
+    identical frames are merged into the previous frame's duration, so the
+    writer holds one frame regardless of the length of the animation.
+    """
+
+    def __init__(self, fp, loop=0):
+        self.fp = fp
+        self.loop = loop
+        self.frames = 0
+        self.merged = 0
+        self._previous = None
+        self._pending = None
+
+    def add_frame(self, frame, duration):
+        """
+        Adds a P-mode frame quantized with the shared palette.
+        Returns False if it was merged into the previous frame.
+        """
+        if self._previous is None:
+            header, _ = GifImagePlugin.getheader(frame, info={'loop': self.loop, 'duration': duration})
+            for chunk in header:
+                self.fp.write(chunk)
+            self._pending = [frame, (0, 0), duration]
+            self._previous = frame
+            return True
+
+        box = _changed_box(self._previous, frame)
+        if box is None:
+            self._pending[2] += duration
+            self.merged += 1
+            return False
+        self._flush()
+        self._pending = [frame.crop(box), box[:2], duration]
+        self._previous = frame
+        return True
+
+    def _flush(self):
+        """Writes the frame held back for duration merging."""
+        if self._pending is None:
+            return
+        image, offset, duration = self._pending
+        for chunk in GifImagePlugin.getdata(image, offset, duration=duration, disposal=1):
+            self.fp.write(chunk)
+        self._pending = None
+        self.frames += 1
+
+    def close(self):
+        """Writes the last frame and the GIF trailer."""
+        self._flush()
+        self.fp.write(b';')
 
 def create_gif_meme(template_paths, output_path, duration=200):
     """
     Combine images into a GIF meme.
     template_paths: list of image paths
     duration: frame duration in ms
+    Images are decoded one at a time and share one palette, so memory does
+    not grow with the number of images.
     """
-    frames = [Image.open(p).convert('RGBA') for p in template_paths]
-    frames[0].save(output_path, save_all=True, append_images=frames[1:], duration=duration, loop=0)
+    samples = [load_image(p, max_size=(PALETTE_SAMPLE_SIZE, PALETTE_SAMPLE_SIZE)) for p in template_paths]
+    palette = build_palette(samples)
+    size = None
+    with open(output_path, 'wb') as fp:
+        writer = GifWriter(fp)
+        for path in template_paths:
+            frame = load_image(path)
+            if size is None:
+                size = frame.size
+            elif frame.size != size:
+                frame = frame.resize(size, Image.Resampling.BICUBIC)
+            writer.add_frame(quantize(frame, palette), duration)
+        writer.close()
     return output_path
@@ -0,0 +1,367 @@
+"""
+Perceptual Image Hashes
+
+Images are reduced to a 64-bit difference hash (dHash): the image is shrunk
+to 9x8 gray pixels and each bit says whether a pixel is brighter than its
+right-hand neighbour. Resizing, recompression and small edits flip only a
+few bits, so near-duplicates are hashes within a small Hamming distance.
+
+The HashIndex keeps hashes in SQLite and answers "anything within distance
+k?" with a BK-tree per (kind, scope), so a lookup visits a small part of the
+index instead of every hash in it.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from bot.core.config import DB_PATH
+from bot.utils.image_loader import load_image
+
+# Images are decoded no larger than this before hashing
+HASH_DECODE_SIZE = 256
+
+# Hashes with fewer set (or unset) bits than this come from nearly flat
+# images, which all look alike to dHash, so they are never matched
+MIN_HASH_BITS = 4
+
+def dhash(img: Image.Image) -> int:
+    """
+    Get the 64-bit difference hash of an image
+
+    Args:
+        img: The image
+
+    Returns:
+        Hash as an unsigned 64-bit integer
+    """
+    small = np.asarray(img.convert('L').resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hash_image(source) -> int:
+    """
+    Decode an image at a small size and hash it
+
+    Args:
+        source: File path, bytes or file object
+
+    Returns:
+        The image's dHash
+
+    Raises:
+        ImageTooLargeError: Over the byte or pixel ceiling
+        OSError: If the image cannot be decoded
+    """
+    return dhash(load_image(source, max_size=(HASH_DECODE_SIZE, HASH_DECODE_SIZE)))
+
+def hamming(a: int, b: int) -> int:
+    """Number of bits two hashes differ in"""
+    return bin(a ^ b).count('1')
+
+def is_informative(value: int) -> bool:
+    """Check that a hash is not from a (nearly) flat image"""
+    return MIN_HASH_BITS <= bin(value).count('1') <= 64 - MIN_HASH_BITS
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance
+
+    Each node is [hash, items, children by distance]. A search for distance
+    k only descends into children whose edge distance is within k of the
+    query's distance to the node (triangle inequality).
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, item: str):
+        """Add an item under a hash"""
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def remove(self, value: int, item: str) -> bool:
+        """Remove an item from under a hash (the node stays as a signpost)"""
+        node = self.root
+        while node is not None:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                if item in node[1]:
+                    node[1].remove(item)
+                    self.size -= 1
+                    return True
+                return False
+            node = node[2].get(distance)
+        return False
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, str]]:
+        """
+        Find items within a Hamming distance of a hash
+
+        Returns:
+            List of (distance, item), closest first
+        """
+        results = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        results.sort()
+        return results
+
+def _to_signed(value: int) -> int:
+    """SQLite integers are signed 64-bit"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+class HashIndex:
+    """
+    Perceptual hashes of templates and posted images, stored in SQLite
+
+    Hashes are grouped by kind ('template', 'reddit') and scope (e.g. a
+    guild ID, or '' for global). Each group is loaded into a BK-tree the
+    first time it is queried and kept in step with the table afterwards.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        """
+        Initialize the index
+
+        Args:
+            db_path: SQLite database holding the image_hashes table
+        """
+        self.db_path = db_path
+        self._trees: Dict[Tuple[str, str], BKTree] = {}
+        self._refs: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._ready:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        if not self._ready:
+            self._create_table(conn)
+            conn.commit()
+            self._ready = True
+        return conn
+
+    @staticmethod
+    def _create_table(conn: sqlite3.Connection):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS image_hashes (
+                kind TEXT NOT NULL,
+                scope TEXT NOT NULL DEFAULT '',
+                ref TEXT NOT NULL,
+                hash INTEGER NOT NULL,
+                added_at REAL NOT NULL,
+                PRIMARY KEY (kind, scope, ref)
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_image_hashes_added ON image_hashes (kind, added_at)")
+
+    def _group(self, kind: str, scope: str, conn: Optional[sqlite3.Connection] = None) -> BKTree:
+        """Get the BK-tree of a group, loading it on first use (caller holds the lock)"""
+        key = (kind, scope)
+        tree = self._trees.get(key)
+        if tree is None:
+            tree, refs = BKTree(), {}
+            query = "SELECT ref, hash FROM image_hashes WHERE kind = ? AND scope = ?"
+            if conn is not None:
+                rows = conn.execute(query, (kind, scope)).fetchall()
+            else:
+                own_conn = self._connect()
+                try:
+                    rows = own_conn.execute(query, (kind, scope)).fetchall()
+                finally:
+                    own_conn.close()
+            for ref, value in rows:
+                value = _to_unsigned(value)
+                tree.add(value, ref)
+                refs[ref] = value
+            self._trees[key], self._refs[key] = tree, refs
+        return tree
+
+    def add(self, kind: str, ref: str, value: int, scope: str = '', conn: Optional[sqlite3.Connection] = None):
+        """
+        Store the hash of an image (replacing any earlier hash of the same ref)
+
+        Args:
+            kind: Group kind, e.g. 'template' or 'reddit'
+            ref: What the hash identifies (template ID, post ID...)
+            value: The image's dHash
+            scope: Group scope, e.g. a guild ID
+            conn: Connection of an open transaction to write the row in; the
+                caller commits it and then calls note() with the same hash
+        """
+        ref, scope = str(ref), str(scope)
+        row = (kind, scope, ref, _to_signed(value), time.time())
+        insert = "INSERT OR REPLACE INTO image_hashes (kind, scope, ref, hash, added_at) VALUES (?, ?, ?, ?, ?)"
+        if conn is not None:
+            # The transaction may still be rolled back, so the tree waits for note()
+            self._create_table(conn)
+            conn.execute(insert, row)
+            return
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(insert, row)
+                conn.commit()
+            finally:
+                conn.close()
+            self._note(kind, ref, value, scope)
+
+    def _note(self, kind: str, ref: str, value: int, scope: str):
+        """Put a stored hash in its group's tree, if the tree is loaded (caller holds the lock)"""
+        key = (kind, scope)
+        tree = self._trees.get(key)
+        if tree is None:
+            # Loaded from the table, row included, on first use
+            return
+        refs = self._refs[key]
+        if ref in refs:
+            tree.remove(refs[ref], ref)
+        tree.add(value, ref)
+        refs[ref] = value
+
+    def note(self, kind: str, ref: str, value: int, scope: str = ''):
+        """
+        Make a hash written with add(..., conn=conn) searchable once its transaction commits
+
+        Args:
+            kind: Group kind
+            ref: What the hash identifies
+            value: The image's dHash
+            scope: Group scope
+        """
+        with self._lock:
+            self._note(kind, str(ref), value, str(scope))
+
+    def remove(self, kind: str, ref: str, scope: str = '') -> bool:
+        """
+        Forget the hash of an image
+
+        Returns:
+            True if a hash was stored for the ref
+        """
+        ref, scope = str(ref), str(scope)
+        with self._lock:
+            tree = self._group(kind, scope)
+            value = self._refs[(kind, scope)].pop(ref, None)
+            if value is None:
+                return False
+            tree.remove(value, ref)
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM image_hashes WHERE kind = ? AND scope = ? AND ref = ?",
+                             (kind, scope, ref))
+                conn.commit()
+            finally:
+                conn.close()
+            return True
+
+    def prune(self, kind: str, older_than: float) -> int:
+        """
+        Delete the hashes of a kind that were stored before a time
+
+        The trees of the affected scopes are dropped and rebuilt from the
+        table on next use, since removing items leaves their nodes behind.
+
+        Args:
+            kind: Group kind
+            older_than: Timestamp; hashes added (or replaced) before it go
+
+        Returns:
+            Number of hashes deleted
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                scopes = [scope for scope, in conn.execute(
+                    "SELECT DISTINCT scope FROM image_hashes WHERE kind = ? AND added_at < ?", (kind, older_than)
+                )]
+                deleted = conn.execute("DELETE FROM image_hashes WHERE kind = ? AND added_at < ?",
+                                       (kind, older_than)).rowcount
+                conn.commit()
+            finally:
+                conn.close()
+            for scope in scopes:
+                self._trees.pop((kind, scope), None)
+                self._refs.pop((kind, scope), None)
+            return deleted
+
+    def find(self, kind: str, value: int, max_distance: int, scope: str = '') -> List[Tuple[int, str]]:
+        """
+        Find stored images within a Hamming distance of a hash
+
+        Args:
+            kind: Group kind
+            value: dHash to look up
+            max_distance: Largest number of differing bits that still matches
+            scope: Group scope
+
+        Returns:
+            List of (distance, ref), closest first (empty for flat images)
+        """
+        if not is_informative(value):
+            return []
+        with self._lock:
+            return self._group(kind, str(scope)).search(value, max_distance)
+
+    def refs(self, kind: str, scope: str = '') -> Dict[str, int]:
+        """Get every stored ref of a group with its hash"""
+        with self._lock:
+            self._group(kind, str(scope))
+            return dict(self._refs[(kind, str(scope))])
+
+    def clear_cache(self):
+        """Drop the in-memory trees (they are reloaded from SQLite on next use)"""
+        with self._lock:
+            self._trees.clear()
+            self._refs.clear()
+
+# Create a singleton instance
+hash_index = HashIndex()
+
+def find_duplicate(kind: str, value: int, max_distance: int, scope: str = '') -> Optional[str]:
+    """
+    Get the closest stored image within a distance of a hash
+
+    Returns:
+        The ref of the closest match, or None
+    """
+    try:
+        matches = hash_index.find(kind, value, max_distance, scope)
+    except sqlite3.Error as e:
+        logging.error(f"Error querying image hashes: {e}")
+        return None
+    return matches[0][1] if matches else None
@@ -0,0 +1,120 @@
+from PIL import Image
+import io
+import os
+from bot.core.config import IMAGE_MAX_PIXELS, IMAGE_MAX_BYTES, RENDER_MAX_DIMENSION
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image is over the byte or pixel ceiling"""
+    pass
+
+def _check_bytes(source, max_bytes):
+    """Reject sources over the byte ceiling before reading them."""
+    if isinstance(source, (bytes, bytearray)):
+        size = len(source)
+    elif isinstance(source, (str, os.PathLike)):
+        size = os.path.getsize(source)
+    else:
+        return
+    if max_bytes and size > max_bytes:
+        raise ImageTooLargeError(f"Image is {size // 1024} KB, the limit is {max_bytes // 1024} KB")
+
+def _check_pixels(size, max_pixels):
+    """Reject images over the pixel ceiling from their header size alone."""
+    width, height = size
+    if max_pixels and width * height > max_pixels:
+        raise ImageTooLargeError(
+            f"Image is {width}x{height}, the limit is {max_pixels // 1_000_000} megapixels"
+        )
+
+def _open(source):
+    """Open a path, bytes or file object without decoding pixels."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    try:
+        return Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+
+def get_image_size(source, max_pixels=IMAGE_MAX_PIXELS, max_bytes=IMAGE_MAX_BYTES):
+    """
+    Returns the (width, height) of an image from its header, enforcing the
+    byte and pixel ceilings. Raises ImageTooLargeError over either limit.
+    """
+    _check_bytes(source, max_bytes)
+    with _open(source) as im:
+        _check_pixels(im.size, max_pixels)
+        return im.size
+
+def load_image(source, max_size=(RENDER_MAX_DIMENSION, RENDER_MAX_DIMENSION), mode='RGB',
+               max_pixels=IMAGE_MAX_PIXELS, max_bytes=IMAGE_MAX_BYTES):
+    """
+    Decodes an image no larger than it needs to be.
+    source: file path, bytes or file object
+    max_size: (width, height) box to fit inside, or None for full size
+    JPEGs are decoded in draft mode at a reduced DCT scale and other formats
+    are shrunk with reduce() before the final resample, so a 6000x4000 upload
+    never exists in memory at full size. The file is closed before returning.
+    Raises ImageTooLargeError over the byte or pixel ceiling.
+    """
+    _check_bytes(source, max_bytes)
+    with _open(source) as im:
+        _check_pixels(im.size, max_pixels)
+        if not max_size or (im.width <= max_size[0] and im.height <= max_size[1]):
+            return im.convert(mode)
+
+        scale = min(max_size[0] / im.width, max_size[1] / im.height)
+        target = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+
+        # JPEG: let the decoder skip DCT detail, staying at or above the target
+        im.draft(mode if mode in ('RGB', 'L') else None, target)
+        img = im if im.mode == mode else im.convert(mode)
+
+        # Whole-factor box reduction, then one resample to the exact size
+        factor = min(img.width // target[0], img.height // target[1])
+        if factor >= 2:
+            img = img.reduce(factor)
+        if img.size != target:
+            img = img.resize(target, Image.Resampling.BICUBIC)
+        # Nothing may keep using the file once it is closed
+        return img.copy() if img is im else img
+
+def is_animated(source):
+    """
+    Returns True if the image has more than one frame (animated GIF, WebP, APNG).
+    Only the header is read.
+    """
+    with _open(source) as im:
+        return getattr(im, 'is_animated', False)
+
+def iter_frames(source, max_size=None, max_frames=None, step=1, max_pixels=IMAGE_MAX_PIXELS,
+                max_bytes=IMAGE_MAX_BYTES):
+    """
+    Yields (frame, duration in ms) for each frame of an animation, one at a time.
+    Frames are composited (disposal applied), flattened onto white and shrunk
+    to fit max_size, so only one decoded frame is alive at once.
+    step: only yield every step-th frame (the others are decoded but never
+    converted or resized)
+    Raises ImageTooLargeError over the byte, pixel or frame ceiling.
+    """
+    _check_bytes(source, max_bytes)
+    with _open(source) as im:
+        _check_pixels(im.size, max_pixels)
+        frames = getattr(im, 'n_frames', 1)
+        if max_frames and frames > max_frames:
+            raise ImageTooLargeError(f"Animation has {frames} frames, the limit is {max_frames}")
+
+        target = im.size
+        if max_size and (im.width > max_size[0] or im.height > max_size[1]):
+            scale = min(max_size[0] / im.width, max_size[1] / im.height)
+            target = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+
+        for index in range(0, frames, max(1, step)):
+            im.seek(index)
+            duration = im.info.get('duration') or 100
+            frame = im.convert('RGBA')
+            flat = Image.new('RGB', frame.size, (255, 255, 255))
+            flat.paste(frame, mask=frame.getchannel('A'))
+            if flat.size != target:
+                # Area averaging is plenty for small frames and twice as fast as bicubic
+                flat = flat.resize(target, Image.Resampling.BOX)
+            yield flat, duration
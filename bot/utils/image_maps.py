@@ -0,0 +1,126 @@
+"""
+Luminance and edge maps for caption decisions
+
+An ImageMaps holds two summed-area tables built from a small copy of an
+image: one of luminance and one of edge pixels. Any box's mean luminance or
+edge density is then four lookups, whatever the box size, so picking caption
+colors and the quietest place for a caption never touches the pixels again.
+"""
+
+from typing import Tuple
+import numpy as np
+from PIL import Image, ImageFilter
+
+# Longest side of the image the maps are built from
+MAP_SIZE = 256
+
+# FIND_EDGES response above which a pixel counts as an edge
+EDGE_THRESHOLD = 32
+
+def summed_area_table(values: np.ndarray) -> np.ndarray:
+    """Get the summed-area table of a 2D array, with a zero first row and column"""
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.int64)
+    np.cumsum(np.cumsum(values, axis=0, dtype=np.int64), axis=1, out=table[1:, 1:])
+    return table
+
+class ImageMaps:
+    """Summed-area tables of luminance and edge pixels for one image"""
+
+    def __init__(self, luma: np.ndarray, edges: np.ndarray):
+        """
+        Wrap precomputed tables
+
+        Args:
+            luma: Summed-area table of luminance (0-255)
+            edges: Summed-area table of edge pixels (0 or 1)
+        """
+        self.luma = luma
+        self.edges = edges
+        self.shape = (luma.shape[1] - 1, luma.shape[0] - 1)
+
+    @classmethod
+    def from_image(cls, img: Image.Image) -> 'ImageMaps':
+        """
+        Build the maps of an image
+
+        Args:
+            img: The image (any size; it is reduced to MAP_SIZE first)
+
+        Returns:
+            The maps
+        """
+        gray = img.convert('L')
+        if max(gray.size) > MAP_SIZE:
+            scale = MAP_SIZE / max(gray.size)
+            gray = gray.resize((max(1, round(gray.width * scale)), max(1, round(gray.height * scale))),
+                               Image.BOX)
+        luma = np.asarray(gray)
+        edges = np.asarray(gray.filter(ImageFilter.FIND_EDGES)) > EDGE_THRESHOLD
+        # The filter leaves the outermost pixels unfiltered
+        edges[[0, -1], :] = False
+        edges[:, [0, -1]] = False
+        return cls(summed_area_table(luma), summed_area_table(edges))
+
+    def _cells(self, box: Tuple[int, int, int, int], size: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        """Map an (x, y, w, h) box on an image of the given size to map cells"""
+        x, y, w, h = box
+        sx, sy = self.shape[0] / size[0], self.shape[1] / size[1]
+        x0 = min(self.shape[0] - 1, max(0, int(x * sx)))
+        y0 = min(self.shape[1] - 1, max(0, int(y * sy)))
+        x1 = min(self.shape[0], max(x0 + 1, int(np.ceil((x + w) * sx))))
+        y1 = min(self.shape[1], max(y0 + 1, int(np.ceil((y + h) * sy))))
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _sum(table: np.ndarray, cells: Tuple[int, int, int, int]) -> int:
+        x0, y0, x1, y1 = cells
+        return int(table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0])
+
+    def mean_luminance(self, box: Tuple[int, int, int, int], size: Tuple[int, int]) -> float:
+        """
+        Get the mean luminance of a box
+
+        Args:
+            box: (x, y, w, h) in pixels of an image of the given size
+            size: (width, height) of the image the box is on (it may be a
+                scaled copy of the image the maps were built from)
+
+        Returns:
+            Mean luminance (0 to 255)
+        """
+        cells = self._cells(box, size)
+        area = (cells[2] - cells[0]) * (cells[3] - cells[1])
+        return self._sum(self.luma, cells) / area
+
+    def edge_density(self, box: Tuple[int, int, int, int], size: Tuple[int, int]) -> float:
+        """
+        Get the fraction of edge pixels in a box
+
+        Args:
+            box: (x, y, w, h) in pixels of an image of the given size
+            size: (width, height) of the image the box is on
+
+        Returns:
+            Edge density (0.0 to 1.0)
+        """
+        cells = self._cells(box, size)
+        area = (cells[2] - cells[0]) * (cells[3] - cells[1])
+        return self._sum(self.edges, cells) / area
+
+    def quietest_band(self, size: Tuple[int, int], band_height: int, margin: int = 10) -> str:
+        """
+        Pick whether a caption band is less busy at the top or the bottom
+
+        Args:
+            size: (width, height) of the image
+            band_height: Height of the caption band in pixels
+            margin: Distance of the band from the edge
+
+        Returns:
+            'top' or 'bottom' (top on a tie)
+        """
+        width, height = size
+        band = (margin, margin, max(1, width - margin * 2), band_height)
+        top = self.edge_density(band, size)
+        bottom = self.edge_density((margin, max(margin, height - margin - band_height)) + band[2:], size)
+        return 'bottom' if bottom < top else 'top'
@@ -3,6 +3,7 @@ import io
 import random
 import math
 import numpy as np
+from bot.utils.strips import map_strips, matrix_strips
 
 # Dictionary of available effects
 EFFECTS = {
@@ -17,12 +18,19 @@ EFFECTS = {
     'sepia': 'Old-fashioned brownish tone'
 }
 
+# Sepia tone formula (output channels by input channels)
+SEPIA_MATRIX = np.array([
+    [0.393, 0.769, 0.189],
+    [0.349, 0.686, 0.168],
+    [0.272, 0.534, 0.131],
+])
+
 def list_effects():
     """Return a dictionary of available effects with descriptions"""
     return EFFECTS
 
-def apply_effect(img: Image.Image, effect_name: str) -> Image.Image:
-    """Apply the specified effect to the image"""
+def apply_effect(img: Image.Image, effect_name: str, seed=None) -> Image.Image:
+    """Apply the specified effect to the image (seed makes random effects repeatable)"""
     if not effect_name or effect_name.lower() == 'none':
         return img
     
@@ -35,7 +43,7 @@ def apply_effect(img: Image.Image, effect_name: str) -> Image.Image:
     elif effect_name == 'jpeg':
         return jpeg_artifact(img)
     elif effect_name == 'glitch':
-        return glitch(img)
+        return glitch(img, seed)
     elif effect_name == 'grayscale':
         return img.convert('L').convert('RGB')
     elif effect_name == 'invert':
@@ -103,59 +111,50 @@ def jpeg_artifact(img: Image.Image) -> Image.Image:
     buffer.seek(0)
     return Image.open(buffer)
 
-def glitch(img: Image.Image) -> Image.Image:
-    """Create digital glitch effect with color channel shifts"""
+def glitch(img: Image.Image, seed=None) -> Image.Image:
+    """Create digital glitch effect with color channel shifts (same seed, same glitch)"""
+    rng = random.Random(seed)
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
     width, height = img.size
-    img_array = np.array(img)
     
     # RGB channel shift
-    r_shift = random.randint(-20, 20)
-    g_shift = random.randint(-20, 20)
-    b_shift = random.randint(-20, 20)
+    shifts = [rng.randint(-20, 20) for _ in range(3)]
     
-    # Create random glitch regions
-    num_glitches = random.randint(5, 15)
+    # Create random glitch regions (horizontal slices shifted sideways)
+    slices = []
+    num_glitches = rng.randint(5, 15)
     for _ in range(num_glitches):
-        # Random horizontal slice
-        y_pos = random.randint(0, height - 10)
-        h_slice = random.randint(5, 20)
-        x_shift = random.randint(-15, 15)
-        
-        # Apply shift to slice
+        y_pos = rng.randint(0, max(0, height - 10))
+        h_slice = rng.randint(5, 20)
+        x_shift = rng.randint(-15, 15)
         if 0 <= y_pos < height and 0 <= y_pos + h_slice < height:
-            # Shift slice horizontally
-            slice_data = img_array[y_pos:y_pos + h_slice, :].copy()
+            slices.append((y_pos, y_pos + h_slice, x_shift))
+    
+    # Every step only moves pixels within their row, so strips can be
+    # glitched one at a time with a uint8 scratch buffer
+    def apply(strip, top, scratch):
+        bottom = top + len(strip)
+        for y0, y1, x_shift in slices:
+            y0, y1 = max(y0, top) - top, min(y1, bottom) - top
+            if y0 >= y1 or x_shift == 0:
+                continue
+            rows = scratch[y0:y1]
+            rows[:] = strip[y0:y1]
             if x_shift > 0:
-                img_array[y_pos:y_pos + h_slice, x_shift:] = slice_data[:, :-x_shift]
-            elif x_shift < 0:
-                img_array[y_pos:y_pos + h_slice, :x_shift] = slice_data[:, -x_shift:]
-    
-    # Apply RGB shifts to whole image
-    result = Image.new('RGB', (width, height))
-    r, g, b = img.split()
-    
-    # Shift red channel
-    r_data = np.array(r)
-    if r_shift > 0:
-        r_data = np.roll(r_data, r_shift, axis=1)
-    
-    # Shift green channel
-    g_data = np.array(g)
-    if g_shift > 0:
-        g_data = np.roll(g_data, g_shift, axis=1)
-    
-    # Shift blue channel
-    b_data = np.array(b)
-    if b_shift > 0:
-        b_data = np.roll(b_data, b_shift, axis=1)
-    
-    # Merge channels
-    r = Image.fromarray(r_data)
-    g = Image.fromarray(g_data)
-    b = Image.fromarray(b_data)
-    result = Image.merge('RGB', (r, g, b))
-    
-    return result
+                strip[y0:y1, x_shift:] = rows[:, :-x_shift]
+            else:
+                strip[y0:y1, :x_shift] = rows[:, -x_shift:]
+        
+        # Roll the channels to the right (wrapping around)
+        for channel, shift in enumerate(shifts):
+            shift = shift % width if shift > 0 else 0
+            if shift:
+                scratch[..., channel] = strip[..., channel]
+                strip[:, shift:, channel] = scratch[:, :-shift, channel]
+                strip[:, :shift, channel] = scratch[:, -shift:, channel]
+    
+    return map_strips(img, apply, dtype=np.uint8)
 
 def pixelate(img: Image.Image) -> Image.Image:
     """Pixelate the image by reducing and then increasing resolution"""
@@ -164,23 +163,4 @@ def pixelate(img: Image.Image) -> Image.Image:
 
 def sepia(img: Image.Image) -> Image.Image:
     """Apply sepia tone effect"""
-    # Convert to sepia tone
-    img = img.convert('RGB')
-    
-    # Apply sepia transformation
-    data = np.array(img)
-    r, g, b = data[:,:,0], data[:,:,1], data[:,:,2]
-    
-    # Apply sepia tone formula
-    tr = 0.393 * r + 0.769 * g + 0.189 * b
-    tg = 0.349 * r + 0.686 * g + 0.168 * b
-    tb = 0.272 * r + 0.534 * g + 0.131 * b
-    
-    # Ensure values are within range
-    tr = np.clip(tr, 0, 255)
-    tg = np.clip(tg, 0, 255)
-    tb = np.clip(tb, 0, 255)
-    
-    # Create new array and make image
-    data = np.stack([tr, tg, tb], axis=2).astype('uint8')
-    return Image.fromarray(data)
\ No newline at end of file
+    return matrix_strips(img, SEPIA_MATRIX)
@@ -1,5 +1,153 @@
 from PIL import Image
+import io
 import os
+from bot.core.config import OUTPUT_MAX_BYTES
+
+# Lossy quality search range
+MAX_QUALITY = 90
+MIN_QUALITY = 40
+
+# Never downsize below this fraction of the original width/height
+MIN_SCALE = 0.25
+
+# Images with at most this many colors are stored losslessly as a palette PNG
+PALETTE_COLORS = 256
+
+# Distinct colors per sampled pixel below which an image counts as flat artwork
+FLAT_COLOR_RATIO = 0.05
+
+# Pixel count of the thumbnail used to classify an image
+SAMPLE_PIXELS = 128 * 128
+
+# Format and quality the renderer always used, for reporting savings
+BASELINE_FORMAT = 'JPEG'
+BASELINE_QUALITY = 95
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png'}
+
+def image_stats(img):
+    """
+    Classify an image from a small sample.
+    Returns a dict with colors (distinct colors in the sample), color_ratio
+    (colors per sampled pixel) and has_alpha.
+    """
+    factor = max(1, int((img.width * img.height / SAMPLE_PIXELS) ** 0.5))
+    sample = img.reduce(factor) if factor > 1 else img
+    pixels = sample.width * sample.height
+    colors = sample.getcolors(maxcolors=pixels)
+    count = len(colors) if colors else pixels
+    return {
+        'colors': count,
+        'color_ratio': count / pixels if pixels else 1.0,
+        'has_alpha': img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info),
+    }
+
+def choose_format(img, stats=None):
+    """
+    Pick an output format from image statistics:
+    PNG for palette-sized artwork, WebP for flat artwork and anything with
+    transparency, JPEG for photographic images.
+    """
+    stats = stats or image_stats(img)
+    if stats['colors'] <= PALETTE_COLORS:
+        return 'PNG'
+    if stats['has_alpha'] or stats['color_ratio'] < FLAT_COLOR_RATIO:
+        return 'WEBP'
+    return 'JPEG'
+
+def _encode(img, fmt, quality=None):
+    """Encode an image to bytes in the given format."""
+    buffer = io.BytesIO()
+    if fmt == 'PNG':
+        colors = img.getcolors(maxcolors=PALETTE_COLORS)
+        if colors and img.mode == 'RGB':
+            # Lossless: every color fits in the palette
+            img = img.quantize(colors=len(colors), method=Image.Quantize.MAXCOVERAGE, dither=Image.Dither.NONE)
+        img.save(buffer, 'PNG', optimize=True)
+    elif fmt == 'WEBP':
+        img.save(buffer, 'WEBP', quality=quality, method=4)
+    else:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img.save(buffer, 'JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def _search_quality(img, fmt, max_bytes, min_quality, max_quality):
+    """
+    Binary-search the highest quality whose encoding fits max_bytes.
+    Returns (data, quality), or (None, None) if even min_quality is too big.
+    """
+    data = _encode(img, fmt, max_quality)
+    if len(data) <= max_bytes:
+        return data, max_quality
+
+    best, best_quality = None, None
+    lo, hi = min_quality, max_quality - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        data = _encode(img, fmt, mid)
+        if len(data) <= max_bytes:
+            best, best_quality = data, mid
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return best, best_quality
+
+def encode_image(img, max_bytes=OUTPUT_MAX_BYTES, fmt=None, min_quality=MIN_QUALITY,
+                 max_quality=MAX_QUALITY, report_savings=False):
+    """
+    Encode an image in the format that suits its content, within a byte budget.
+    Lossy quality is binary-searched down from max_quality, and the image is
+    only downsized when min_quality still does not fit.
+    Returns a dict with data, format, extension, quality (None for PNG), size,
+    bytes and baseline_bytes (the size as JPEG quality 95, only when
+    report_savings is set, since it costs another encode).
+    """
+    fmt = (fmt or choose_format(img)).upper()
+    source = img
+    original_size = img.size
+    scale = 1.0
+    data, quality = None, None
+
+    while True:
+        if fmt == 'PNG':
+            data = _encode(img, 'PNG')
+            if len(data) > max_bytes:
+                # Too detailed for lossless, fall back to lossy WebP
+                fmt = 'WEBP'
+                continue
+        else:
+            data, quality = _search_quality(img, fmt, max_bytes, min_quality, max_quality)
+        if data is not None or scale <= MIN_SCALE:
+            break
+
+        # Shrink by the area ratio the budget needs, with some headroom
+        last_bytes = len(_encode(img, fmt, min_quality))
+        step = max(0.5, min(0.9, (max_bytes / last_bytes) ** 0.5 * 0.9))
+        scale = max(MIN_SCALE, scale * step)
+        img = img.resize((max(1, int(original_size[0] * scale)), max(1, int(original_size[1] * scale))),
+                         Image.Resampling.LANCZOS)
+
+    if data is None:
+        # Smallest we are willing to go; send it even if it is over budget
+        data, quality = _encode(img, fmt, min_quality), min_quality
+
+    baseline_bytes = None
+    if report_savings:
+        if fmt == BASELINE_FORMAT and quality == BASELINE_QUALITY and scale == 1.0:
+            baseline_bytes = len(data)
+        else:
+            baseline_bytes = len(_encode(source, BASELINE_FORMAT, BASELINE_QUALITY))
+
+    return {
+        'data': data,
+        'format': fmt,
+        'extension': EXTENSIONS[fmt],
+        'quality': quality if fmt != 'PNG' else None,
+        'size': img.size,
+        'bytes': len(data),
+        'baseline_bytes': baseline_bytes,
+    }
 
 def optimize_image(input_path, output_path, quality=85, max_size=(1024, 1024)):
     """
@@ -8,11 +156,13 @@ def optimize_image(input_path, output_path, quality=85, max_size=(1024, 1024)):
     - max_size: resize if larger than this
     """
     img = Image.open(input_path)
-    img.thumbnail(max_size, Image.ANTIALIAS)
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
     ext = os.path.splitext(output_path)[1].lower()
     if ext in ['.jpg', '.jpeg']:
         img = img.convert('RGB')
         img.save(output_path, 'JPEG', quality=quality, optimize=True)
+    elif ext == '.webp':
+        img.save(output_path, 'WEBP', quality=quality, method=4)
     else:
         img.save(output_path, 'PNG', optimize=True)
     return output_path
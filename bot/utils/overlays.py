@@ -1,17 +1,15 @@
-from PIL import Image
-import os
+from bot.utils.image_loader import load_image
+from bot.utils.compositing import composite_layers
 
 def add_overlay(base_path, overlay_path, output_path, x=0, y=0, scale=1.0):
     """
     Add a transparent overlay/sticker to the base image.
     x, y: top-left position for overlay
     scale: scale factor for overlay image
+    The scaled sticker comes from the per-process layer cache (see
+    bot.utils.compositing).
     """
-    base = Image.open(base_path).convert('RGBA')
-    overlay = Image.open(overlay_path).convert('RGBA')
-    if scale != 1.0:
-        ow, oh = overlay.size
-        overlay = overlay.resize((int(ow * scale), int(oh * scale)), Image.ANTIALIAS)
-    base.paste(overlay, (x, y), overlay)
+    base = load_image(base_path, max_size=None, mode='RGBA')
+    composite_layers(base, [{'kind': 'sticker', 'path': overlay_path, 'scale': scale, 'x': x, 'y': y}])
     base.save(output_path)
     return output_path
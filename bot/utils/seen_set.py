@@ -0,0 +1,158 @@
+"""
+Seen Post Sets
+
+Reddit post IDs are base-36 numbers, so each one is kept as an int. The
+newest IDs sit in a fixed-size ring, mirrored by a set for O(1) lookups;
+adding to a full ring evicts the oldest ID. An optional Bloom filter also
+remembers evicted IDs, so a post can be recognized long after it left the
+ring, at the cost of rare false positives.
+"""
+
+import zlib
+from typing import Iterable, Iterator, List, Optional
+from bot.core.config import SEEN_POSTS_CAPACITY, SEEN_POSTS_BLOOM_BITS
+
+# Bit positions set per ID in the Bloom filter
+BLOOM_HASHES = 4
+
+BASE36_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+_MASK64 = (1 << 64) - 1
+
+def post_id_to_int(post_id: str) -> int:
+    """
+    Decode a Reddit post ID ('t3_' prefix optional)
+
+    IDs that are not base 36 get a negative CRC so they never collide with a
+    real one.
+    """
+    if post_id.startswith('t3_'):
+        post_id = post_id[3:]
+    try:
+        return int(post_id, 36)
+    except ValueError:
+        return -1 - zlib.crc32(post_id.encode('utf-8'))
+
+def int_to_post_id(value: int) -> str:
+    """Encode a decoded post ID back to base 36"""
+    if value == 0:
+        return '0'
+    digits = []
+    while value:
+        value, digit = divmod(value, 36)
+        digits.append(BASE36_DIGITS[digit])
+    return ''.join(reversed(digits))
+
+class BloomFilter:
+    """Fixed-size Bloom filter over ints"""
+
+    def __init__(self, bits: int):
+        """
+        Initialize the filter
+
+        Args:
+            bits: Number of bits
+        """
+        self.bits = max(8, bits)
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, value: int) -> Iterator[int]:
+        # Double hashing from two 64-bit mixes of the value
+        value &= _MASK64
+        h1 = (value * 0x9E3779B97F4A7C15) & _MASK64
+        h2 = (((value ^ (value >> 31)) * 0xBF58476D1CE4E5B9) & _MASK64) | 1
+        for i in range(BLOOM_HASHES):
+            yield ((h1 + i * h2) & _MASK64) % self.bits
+
+    def add(self, value: int):
+        for position in self._positions(value):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: int) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+class SeenSet:
+    """Bounded set of seen post IDs, usable where a list of IDs was used"""
+
+    def __init__(self, post_ids: Iterable[str] = (), capacity: int = SEEN_POSTS_CAPACITY,
+                 bloom_bits: int = SEEN_POSTS_BLOOM_BITS):
+        """
+        Initialize the set
+
+        Args:
+            post_ids: IDs already seen, oldest first (not marked unsaved)
+            capacity: IDs kept exactly
+            bloom_bits: Size of the Bloom filter for older IDs (0 for none)
+        """
+        self.capacity = max(1, capacity)
+        self._ring: List[Optional[int]] = [None] * self.capacity
+        self._next = 0
+        self._members = set()
+        self._bloom = BloomFilter(bloom_bits) if bloom_bits > 0 else None
+        self._unsaved: List[str] = []
+        for post_id in post_ids:
+            self._insert(post_id)
+
+    def _insert(self, post_id: str) -> bool:
+        value = post_id_to_int(post_id)
+        if value in self._members:
+            return False
+        evicted = self._ring[self._next]
+        if evicted is not None:
+            self._members.discard(evicted)
+        self._ring[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._members.add(value)
+        if self._bloom is not None:
+            self._bloom.add(value)
+        return True
+
+    def add(self, post_id: str):
+        """
+        Mark a post as seen
+
+        Args:
+            post_id: Reddit post ID
+        """
+        if self._insert(post_id):
+            self._unsaved.append(post_id)
+
+    # Seen IDs used to be a list
+    append = add
+
+    def __contains__(self, post_id) -> bool:
+        if not isinstance(post_id, str):
+            return False
+        value = post_id_to_int(post_id)
+        return value in self._members or (self._bloom is not None and value in self._bloom)
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the IDs in the ring, oldest first"""
+        for i in range(self.capacity):
+            value = self._ring[(self._next + i) % self.capacity]
+            if value is not None and value >= 0:
+                yield int_to_post_id(value)
+
+    def unsaved(self) -> List[str]:
+        """
+        Get the IDs added since the last mark_saved()
+
+        Returns:
+            Post IDs, oldest first
+        """
+        return list(self._unsaved)
+
+    def mark_saved(self, count: int):
+        """
+        Forget the first IDs returned by unsaved() once they are stored
+
+        Args:
+            count: How many were stored
+        """
+        del self._unsaved[:count]
+
+    def __repr__(self) -> str:
+        return f"SeenSet({len(self)} of {self.capacity})"
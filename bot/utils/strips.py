@@ -0,0 +1,104 @@
+"""
+Strip execution for pixel effects
+
+Effects that only look at one row at a time (per-pixel math, noise,
+horizontal shifts) run here on horizontal strips instead of the whole frame.
+Each strip is read as uint8, worked on in a scratch buffer that is allocated
+once, and pasted into the output, so temporaries never grow past one strip
+(EFFECT_STRIP_BYTES) however large the image is.
+"""
+
+from typing import Callable, Optional
+from PIL import Image
+import numpy as np
+from bot.core.config import EFFECT_STRIP_BYTES
+
+# Rows are given to the callback as (rows, width, bands) uint8, top row index
+# and scratch of the same shape
+StripFunction = Callable[[np.ndarray, int, np.ndarray], None]
+
+def strip_rows(width: int, bands: int = 3, itemsize: int = 4,
+               max_bytes: int = EFFECT_STRIP_BYTES) -> int:
+    """Number of rows whose scratch fits in max_bytes (at least one)"""
+    return max(1, max_bytes // max(1, width * bands * itemsize))
+
+def map_strips(img: Image.Image, fn: StripFunction, dtype=np.float32,
+               rows: Optional[int] = None) -> Image.Image:
+    """
+    Run a row-local function over an image strip by strip
+
+    Args:
+        img: The input image (L, RGB or RGBA; other modes are converted to RGB)
+        fn: Called as fn(strip, top, scratch) and changes strip in place
+        dtype: Scratch buffer type
+        rows: Rows per strip (default: as many as fit in EFFECT_STRIP_BYTES)
+
+    Returns:
+        A new image with the function applied
+    """
+    if img.mode not in ('L', 'RGB', 'RGBA'):
+        img = img.convert('RGB')
+    width, height = img.size
+    bands = len(img.getbands())
+    rows = min(height, rows or strip_rows(width, bands, np.dtype(dtype).itemsize))
+    shape = (rows, width) if bands == 1 else (rows, width, bands)
+    scratch = np.empty(shape, dtype=dtype)
+
+    out = Image.new(img.mode, img.size)
+    for top in range(0, height, rows):
+        bottom = min(height, top + rows)
+        strip = np.array(img.crop((0, top, width, bottom)))
+        fn(strip, top, scratch[:bottom - top])
+        out.paste(Image.frombytes(img.mode, (width, bottom - top), strip.tobytes()), (0, top))
+    return out
+
+def noise_strips(img: Image.Image, amount: float,
+                 rng: Optional[np.random.Generator] = None) -> Image.Image:
+    """
+    Add gaussian noise strip by strip in float32
+
+    Noise is drawn row by row in image order, so the same generator gives
+    the same image whatever the strip height.
+
+    Args:
+        img: The input image
+        amount: Noise standard deviation as a fraction of 255
+        rng: Random generator to draw from (default: unseeded)
+
+    Returns:
+        The image with noise
+    """
+    rng = rng or np.random.default_rng()
+    sigma = np.float32(255 * amount)
+
+    def add(strip, top, scratch):
+        rng.standard_normal(dtype=np.float32, out=scratch)
+        scratch *= sigma
+        scratch += strip
+        np.clip(scratch, 0, 255, out=scratch)
+        np.copyto(strip, scratch, casting='unsafe')
+
+    return map_strips(img, add)
+
+def matrix_strips(img: Image.Image, matrix: np.ndarray) -> Image.Image:
+    """
+    Multiply every RGB pixel by a 3x3 color matrix, strip by strip in float32
+
+    Results are clipped to 0-255 and truncated, like casting a clipped float
+    array to uint8.
+
+    Args:
+        img: The input image
+        matrix: Output channels by input channels
+
+    Returns:
+        The transformed RGB image
+    """
+    transposed = np.ascontiguousarray(np.asarray(matrix, dtype=np.float32).T)
+
+    def transform(strip, top, scratch):
+        np.matmul(strip, transposed, out=scratch)
+        np.clip(scratch, 0, 255, out=scratch)
+        np.copyto(strip, scratch, casting='unsafe')
+
+    return map_strips(img if img.mode == 'RGB' else img.convert('RGB'), transform)
@@ -1,37 +1,241 @@
-from PIL import ImageDraw, ImageFont
-import textwrap
+from PIL import ImageColor, ImageDraw
+import threading
+from collections import OrderedDict
+from bot.utils.font_utils import get_font
+from bot.utils.color_utils import get_average_luminance, pick_text_color, get_contrasting_color
+from bot.utils.image_maps import ImageMaps
 
-def draw_wrapped_text(draw, text, font, box, fill, align='center', spacing=4):
+# Upper bounds for the per-process layout caches
+MAX_ADVANCE_TABLES = 64
+MAX_LAYOUTS = 1024
+
+class TextLayoutCache:
     """
-    Draws text wrapped to fit within the given bounding box.
-    box: (x, y, width, height)
-    Returns the y position after the last line.
+    Caches glyph advance tables per font and finished layouts per
+    (text, font, size, box), so repeated captions skip line breaking and
+    measuring entirely.
     """
-    x, y, w, h = box
+
+    def __init__(self, max_tables=MAX_ADVANCE_TABLES, max_layouts=MAX_LAYOUTS):
+        self.max_tables = max_tables
+        self.max_layouts = max_layouts
+        self.hits = 0
+        self.misses = 0
+        self._advances = OrderedDict()
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def advances(self, font):
+        """Returns the glyph advance table (char -> width in px) for a font."""
+        with self._lock:
+            table = self._advances.get(font)
+            if table is None:
+                table = {}
+                self._advances[font] = table
+                if len(self._advances) > self.max_tables:
+                    self._advances.popitem(last=False)
+            else:
+                self._advances.move_to_end(font)
+            return table
+
+    def get_layout(self, key):
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is not None:
+                self._layouts.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return layout
+
+    def put_layout(self, key, layout):
+        with self._lock:
+            self._layouts[key] = layout
+            if len(self._layouts) > self.max_layouts:
+                self._layouts.popitem(last=False)
+
+    def stats(self):
+        """Returns the layout cache counters."""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'layouts': len(self._layouts),
+            'advance_tables': len(self._advances),
+        }
+
+# Create a singleton instance (one per process)
+layout_cache = TextLayoutCache()
+
+def text_width(text, font):
+    """
+    Returns the width of a single line from cached glyph advances.
+    Kerning only tightens a line, so this errs on the side of breaking early.
+    """
+    table = layout_cache.advances(font)
+    width = 0
+    for ch in text:
+        advance = table.get(ch)
+        if advance is None:
+            advance = font.getlength(ch)
+            table[ch] = advance
+        width += advance
+    return width
+
+def break_lines(text, font, max_width, stroke_width=0):
+    """
+    Greedily breaks text into lines no wider than max_width pixels.
+    Words wider than a whole line are split between characters.
+    """
+    space = text_width(' ', font)
+    limit = max_width - stroke_width * 2
     lines = []
-    # Try wrapping text to fit the width
-    for line in text.split('\n'):
-        lines.extend(textwrap.wrap(line, width=20))  # width=20 is a default, will be resized
-    # Find max width in pixels for font
-    max_width = max([draw.textlength(line, font=font) for line in lines] + [1])
-    # Adjust wrap width if text is too wide
-    if max_width > w:
-        # Estimate chars per line
-        avg_char_width = max_width / max(len(line) for line in lines if line)
-        wrap_width = max(1, int(w / avg_char_width))
-        lines = []
-        for line in text.split('\n'):
-            lines.extend(textwrap.wrap(line, width=wrap_width))
-    # Draw each line
-    y_offset = y
+    for paragraph in text.split('\n'):
+        line, line_w = '', 0
+        for word in paragraph.split():
+            word_w = text_width(word, font)
+            if line and line_w + space + word_w <= limit:
+                line, line_w = f"{line} {word}", line_w + space + word_w
+                continue
+            if line:
+                lines.append(line)
+            # Split words that can't fit on a line of their own
+            while word_w > limit and len(word) > 1:
+                cut, cut_w = 1, text_width(word[0], font)
+                while cut < len(word) - 1:
+                    next_w = cut_w + text_width(word[cut], font)
+                    if next_w > limit:
+                        break
+                    cut, cut_w = cut + 1, next_w
+                lines.append(word[:cut])
+                word = word[cut:]
+                word_w = text_width(word, font)
+            line, line_w = word, word_w
+        if line:
+            lines.append(line)
+    return lines
+
+def layout_text(text, font, box, align='center', spacing=4, stroke_width=0):
+    """
+    Lays out text wrapped to fit the given bounding box.
+    box: (x, y, width, height)
+    Returns a dict with lines, positions (x, y per line, relative to the box
+    origin), line_heights and height. Layouts depend only on the box size, so
+    one layout serves a caption wherever it is placed. They are memoized, so
+    treat the result as read-only.
+    """
+    w, h = box[2], box[3]
+    key = (text, font, getattr(font, 'size', None), w, h, align, spacing, stroke_width)
+    layout = layout_cache.get_layout(key)
+    if layout is not None:
+        return layout
+
+    lines = break_lines(text, font, w, stroke_width)
+    positions = []
+    line_heights = []
+    y_offset = 0
     for line in lines:
-        line_width = draw.textlength(line, font=font)
+        line_width = font.getlength(line) + stroke_width * 2
         if align == 'center':
-            tx = x + (w - line_width) // 2
+            tx = (w - line_width) // 2
         elif align == 'right':
-            tx = x + w - line_width
+            tx = w - line_width
         else:
-            tx = x
-        draw.text((tx, y_offset), line, font=font, fill=fill)
-        y_offset += font.getsize(line)[1] + spacing
-    return y_offset
+            tx = 0
+        positions.append((tx, y_offset))
+        line_height = font.getbbox(line, stroke_width=stroke_width)[3]
+        line_heights.append(line_height)
+        y_offset += line_height + spacing
+
+    layout = {
+        'lines': tuple(lines),
+        'positions': tuple(positions),
+        'line_heights': tuple(line_heights),
+        'height': y_offset,
+    }
+    layout_cache.put_layout(key, layout)
+    return layout
+
+def draw_wrapped_text(draw, text, font, box, fill, align='center', spacing=4, stroke_width=0, stroke_fill=None):
+    """
+    Draws text wrapped to fit within the given bounding box.
+    box: (x, y, width, height)
+    stroke_width/stroke_fill: optional outline drawn in the same pass
+    Returns the y position after the last line.
+    """
+    x, y = box[0], box[1]
+    layout = layout_text(text, font, box, align, spacing, stroke_width)
+    for line, (tx, ty) in zip(layout['lines'], layout['positions']):
+        draw.text((x + tx, y + ty), line, font=font, fill=fill,
+                  stroke_width=stroke_width, stroke_fill=stroke_fill)
+    return y + layout['height']
+
+def caption_stroke_width(font):
+    """Returns the outline width used for captions at a font's size."""
+    return max(1, getattr(font, 'size', 20) // 15)
+
+def get_best_fit_wrapped_font(text, font_path, max_width, max_height, start_size=48, min_size=10,
+                              spacing=4):
+    """
+    Returns the largest font (stepping down by 2 from start_size) whose
+    wrapped, outlined layout fits the box. Layouts are memoized, so repeated
+    captions resolve without measuring again.
+    """
+    sizes = list(range(start_size, min_size - 1, -2))
+
+    def fits(size):
+        font = get_font(font_path, size)
+        stroke_width = caption_stroke_width(font)
+        layout = layout_text(text, font, (0, 0, max_width, max_height), spacing=spacing,
+                             stroke_width=stroke_width)
+        return layout['height'] - spacing <= max_height and all(
+            text_width(line, font) + stroke_width * 2 <= max_width for line in layout['lines'])
+
+    lo, hi = 0, len(sizes)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if fits(sizes[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    return get_font(font_path, sizes[lo] if lo < len(sizes) else min_size)
+
+def draw_caption(img, text, position='top', font_size=None, font_color=None, outline_color=None,
+                 font_path=None, margin=10, background=None, maps=None):
+    """
+    Draws a classic meme caption at the top or bottom of the image.
+    position: 'top', 'bottom' or 'auto' (whichever band has fewer edges)
+    Colors default to auto-contrast against the area behind the caption.
+    background: image to pick auto-contrast colors from (default: img), so a
+    caption can be drawn once on a transparent layer and reused.
+    maps: ImageMaps of the background (bot.utils.image_maps), so colors and
+    placement are box lookups instead of pixel scans.
+    Returns the image with the caption drawn on it.
+    """
+    w, h = img.size
+    box_w = max(1, w - margin * 2)
+    box_h = max(1, h // 4)
+    font = get_best_fit_wrapped_font(text, font_path, box_w, box_h, start_size=font_size or 48)
+    stroke_width = caption_stroke_width(font)
+
+    # The memoized layout gives the block height for bottom captions and is reused to draw
+    text_h = layout_text(text, font, (0, 0, box_w, box_h), stroke_width=stroke_width)['height']
+    source = img if background is None else background
+    if position == 'auto':
+        maps = maps or ImageMaps.from_image(source)
+        position = maps.quietest_band((w, h), min(box_h, text_h), margin)
+    if position == 'bottom':
+        box = (margin, max(margin, h - margin - text_h), box_w, box_h)
+    else:
+        box = (margin, margin, box_w, box_h)
+
+    if font_color:
+        fill = ImageColor.getrgb(font_color)
+    else:
+        area = box[:2] + (box_w, min(box_h, text_h))
+        luminance = maps.mean_luminance(area, (w, h)) if maps else get_average_luminance(source, area)
+        fill = pick_text_color(luminance)
+    stroke_fill = ImageColor.getrgb(outline_color) if outline_color else get_contrasting_color(fill[:3])
+
+    draw = ImageDraw.Draw(img)
+    draw_wrapped_text(draw, text, font, box, fill, stroke_width=stroke_width, stroke_fill=stroke_fill)
+    return img
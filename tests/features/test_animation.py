@@ -0,0 +1,138 @@
+"""
+Tests for animated meme rendering.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes import animation
+from bot.features.memes.render_engine import build_render_job, render_job
+from bot.utils.gif_meme import GifWriter, build_palette, quantize, create_gif_meme
+from bot.utils.image_loader import iter_frames, ImageTooLargeError
+
+def moving_ball(count=12, size=(160, 120)):
+    """Frames of a ball moving across a gradient"""
+    background = Image.radial_gradient('L').convert('RGB').resize(size)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        x = i * 10
+        ImageDraw.Draw(frame).ellipse((x, 50, x + 30, 80), fill=(220, 30, 30))
+        frames.append(frame)
+    return frames
+
+def decode(data):
+    """All frames of a GIF as RGB arrays, with their durations"""
+    frames = []
+    with Image.open(io.BytesIO(data)) as im:
+        for index in range(im.n_frames):
+            im.seek(index)
+            frames.append((np.asarray(im.convert('RGB')), im.info.get('duration')))
+    return frames
+
+class TestAnimation(unittest.TestCase):
+    """Test cases for the animated render pipeline"""
+
+    def setUp(self):
+        """Save a short animation with a held last frame"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, 'ball.gif')
+        frames = moving_ball()
+        frames[0].save(self.path, save_all=True, append_images=frames[1:] + [frames[-1]] * 3,
+                       duration=50, loop=0)
+
+    def tearDown(self):
+        """Remove the animation"""
+        self.temp_dir.cleanup()
+
+    def test_identical_frames_are_merged(self):
+        """Test that held frames become one longer frame"""
+        result = render_job(build_render_job(self.path, top_text='hello'))
+        frames = decode(result['data'])
+
+        self.assertEqual(result['format'], 'GIF')
+        self.assertEqual(result['frames'], 12)
+        self.assertEqual(len(frames), 12)
+        self.assertEqual(frames[-1][1], 200)
+
+    def test_caption_on_every_frame(self):
+        """Test that the caption layer is composited onto each frame"""
+        plain = decode(render_job(build_render_job(self.path))['data'])
+        captioned = decode(render_job(build_render_job(self.path, top_text='HELLO'))['data'])
+
+        for (a, _), (b, _) in zip(plain, captioned):
+            self.assertTrue(np.any(a[:30] != b[:30]))
+            # The rest only moves by the caption colors taking palette entries
+            self.assertLess(np.abs(a[60:].astype(int) - b[60:]).mean(), 4)
+
+    def test_region_rendering_matches_full_frames(self):
+        """Test that rendering only changed regions gives the same animation"""
+        job = build_render_job(self.path, top_text='hi', effects=[('sepia', 0.8), ('grayscale', 1.0)])
+        partial = decode(render_job(job)['data'])
+        with patch.object(animation, 'is_pointwise', return_value=False):
+            full = decode(render_job(dict(job))['data'])
+
+        self.assertEqual(len(partial), len(full))
+        for (a, _), (b, _) in zip(partial, full):
+            self.assertTrue(np.array_equal(a, b))
+
+    def test_over_budget_renders_smaller(self):
+        """Test that an animation over its byte budget is rendered smaller"""
+        full = render_job(build_render_job(self.path, effect='noise'))
+        with patch.object(animation, 'ANIMATION_MAX_BYTES', full['bytes'] // 2):
+            smaller = render_job(build_render_job(self.path, effect='noise'))
+
+        self.assertLessEqual(smaller['bytes'], full['bytes'] // 2)
+        self.assertLess(smaller['size'][0], full['size'][0])
+
+    def test_job_budget_below_animation_budget(self):
+        """Test that a job's own smaller budget (a batch share) is kept"""
+        full = render_job(build_render_job(self.path, effect='noise'))
+        smaller = render_job(build_render_job(self.path, effect='noise', max_bytes=full['bytes'] // 2))
+
+        self.assertLessEqual(smaller['bytes'], full['bytes'] // 2)
+        self.assertLess(smaller['size'][0], full['size'][0])
+
+    def test_frame_ceiling(self):
+        """Test that animations over the frame ceiling are refused"""
+        with self.assertRaises(ImageTooLargeError):
+            list(iter_frames(self.path, max_frames=5))
+
+    def test_gif_writer_round_trip(self):
+        """Test that the streaming writer stores only changed regions losslessly"""
+        frames = moving_ball(4)
+        palette = build_palette(frames)
+        indexed = [quantize(frame, palette) for frame in frames]
+        buffer = io.BytesIO()
+        writer = GifWriter(buffer)
+        for frame in indexed:
+            writer.add_frame(frame, 80)
+        writer.close()
+
+        for (decoded, duration), expected in zip(decode(buffer.getvalue()), indexed):
+            self.assertTrue(np.array_equal(decoded, np.asarray(expected.convert('RGB'))))
+            self.assertEqual(duration, 80)
+
+    def test_create_gif_meme(self):
+        """Test combining still images into a GIF"""
+        paths = []
+        for i, frame in enumerate(moving_ball(3)):
+            paths.append(os.path.join(self.temp_dir.name, f'{i}.png'))
+            frame.save(paths[-1])
+        output = create_gif_meme(paths, os.path.join(self.temp_dir.name, 'out.gif'), duration=120)
+
+        with Image.open(output) as im:
+            self.assertEqual(im.n_frames, 3)
+            self.assertEqual(im.info['duration'], 120)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Tests for the autopost poll scheduler.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.reddit.scheduler import PollScheduler
+
+class TestPollScheduler(unittest.TestCase):
+    """Test cases for due ordering and velocity-adaptive intervals"""
+
+    def setUp(self):
+        """Create a scheduler with a 300s default between 60s and 3600s"""
+        self.scheduler = PollScheduler(interval=300, min_interval=60, max_interval=3600)
+
+    def test_due_order(self):
+        """Test that only due subreddits are popped, earliest first, and stale entries are skipped"""
+        self.scheduler.schedule('b', 20)
+        self.scheduler.schedule('a', 10)
+        self.scheduler.schedule('c', 30)
+        self.scheduler.schedule('b', 40)
+        self.scheduler.remove('c')
+
+        self.assertEqual(self.scheduler.next_due(), 10)
+        self.assertEqual(self.scheduler.pop_due(35), ['a'])
+        self.assertEqual(self.scheduler.next_due(), 40)
+        self.assertEqual(self.scheduler.pop_due(100), ['b'])
+        self.assertIsNone(self.scheduler.next_due())
+
+        # Popped subreddits come back when their poll is recorded, unless removed meanwhile
+        self.assertEqual(self.scheduler.record('a', None, 100), 300)
+        self.scheduler.remove('b')
+        self.scheduler.record('b', None, 100)
+        self.assertEqual(self.scheduler.pop_due(1000), ['a'])
+
+    def poll(self, subreddit, seconds_per_post, polls):
+        """Poll a subreddit that gets a post every seconds_per_post on its own scheduler"""
+        scheduler = PollScheduler(interval=300, min_interval=60, max_interval=3600)
+        scheduler.schedule(subreddit, 0)
+        last = None
+        for _ in range(polls):
+            now = scheduler.next_due()
+            self.assertEqual(scheduler.pop_due(now), [subreddit])
+            new_posts = None if last is None else (round((now - last) / seconds_per_post) if seconds_per_post else 0)
+            interval = scheduler.record(subreddit, new_posts, now)
+            last = now
+        return interval
+
+    def test_busy_and_quiet_subreddits(self):
+        """Test that intervals shrink for busy subreddits and grow for quiet ones, within bounds"""
+        self.assertEqual(self.poll('busy', 10, 30), 60)
+        self.assertEqual(self.poll('quiet', 0, 30), 3600)
+
+        # A steady subreddit settles where each poll finds about one post
+        steady = self.poll('steady', 150, 40)
+        self.assertLess(steady, 220)
+        self.assertGreater(steady, 100)
+
+        # One quiet poll backs off by a step, not straight to the maximum
+        self.assertLess(self.poll('fresh', 0, 2), 3600)
+
+if __name__ == "__main__":
+    unittest.main()
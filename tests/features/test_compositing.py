@@ -0,0 +1,121 @@
+"""
+Tests for the layer compositing engine.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.utils.compositing import (
+    LayerCache, layer_cache, watermark_layer, layer_pieces, composite_layers, blend_images
+)
+from bot.utils.watermark import add_watermark
+from bot.utils.overlays import add_overlay
+from bot.features.memes.render_engine import build_render_job, render_job, render_spec_hash
+
+WATERMARK = {'kind': 'watermark', 'text': '@MemeBot', 'font_size': 20, 'opacity': 128,
+             'position': 'bottom_right', 'margin': 10}
+
+class TestCompositing(unittest.TestCase):
+    """Test cases for cached layers and bounded blending"""
+
+    def setUp(self):
+        """Create a background image and a sticker"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.background = Image.radial_gradient('L').convert('RGB').resize((200, 150))
+        self.sticker_path = os.path.join(self.temp_dir.name, 'sticker.png')
+        sticker = Image.new('RGBA', (40, 40), (0, 0, 0, 0))
+        ImageDraw.Draw(sticker).ellipse((0, 0, 39, 39), fill=(255, 0, 0, 200))
+        sticker.save(self.sticker_path)
+        layer_cache.clear()
+
+    def tearDown(self):
+        """Remove the files"""
+        self.temp_dir.cleanup()
+
+    def test_matches_full_frame_composite(self):
+        """Test that blending the box equals compositing a full-size layer"""
+        layer = watermark_layer('@MemeBot', 20, 128)
+        (piece, box), = layer_pieces([WATERMARK], self.background.size)
+        full = Image.new('RGBA', self.background.size, (255, 255, 255, 0))
+        full.paste(layer, box[:2])
+        expected = Image.alpha_composite(self.background.convert('RGBA'), full).convert('RGB')
+
+        result = composite_layers(self.background.copy(), [WATERMARK])
+        self.assertEqual(box[2:], (190, 140))
+        diff = np.abs(np.asarray(result, dtype=int) - np.asarray(expected, dtype=int))
+        self.assertLessEqual(diff.max(), 1)
+
+    def test_layers_are_cached(self):
+        """Test that layers are rendered once and stickers again after a change"""
+        sticker = {'kind': 'sticker', 'path': self.sticker_path, 'scale': 0.5, 'x': 5, 'y': 5}
+        before = layer_cache.stats()
+        for _ in range(3):
+            composite_layers(self.background.copy(), [WATERMARK, sticker])
+        self.assertEqual(layer_cache.stats()['misses'] - before['misses'], 2)
+        self.assertEqual(layer_cache.stats()['hits'] - before['hits'], 4)
+
+        Image.new('RGBA', (10, 10), (0, 255, 0, 255)).save(self.sticker_path)
+        os.utime(self.sticker_path, ns=(0, 0))
+        (piece, box), = layer_pieces([sticker], self.background.size)
+        self.assertEqual(piece.size, (5, 5))
+
+    def test_clipped_to_frame(self):
+        """Test that a layer hanging off the frame is cropped to it"""
+        sticker = {'kind': 'sticker', 'path': self.sticker_path, 'x': -10, 'y': 130}
+        (piece, box), = layer_pieces([sticker], self.background.size)
+        self.assertEqual(box, (0, 130, 30, 150))
+        self.assertEqual(piece.size, (30, 20))
+        self.assertEqual(layer_pieces([dict(sticker, x=500)], self.background.size), [])
+
+    def test_cache_evicts_to_budget(self):
+        """Test that the layer cache stays within its byte budget"""
+        cache = LayerCache(max_bytes=3 * 10 * 10 * 4)
+        for i in range(5):
+            cache.get(i, lambda: Image.new('RGBA', (10, 10)))
+        self.assertEqual(cache.stats()['entries'], 3)
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    def test_render_job_layers(self):
+        """Test that render jobs draw their layers and hash them"""
+        path = os.path.join(self.temp_dir.name, 'template.png')
+        self.background.save(path)
+        plain = build_render_job(path, top_text='hi', output_format='PNG', layers=[])
+        marked = build_render_job(path, top_text='hi', output_format='PNG', layers=[WATERMARK])
+        self.assertNotEqual(render_spec_hash(plain), render_spec_hash(marked))
+
+        a = np.asarray(Image.open(io.BytesIO(render_job(plain)['data'])).convert('RGB'), dtype=int)
+        b = np.asarray(Image.open(io.BytesIO(render_job(marked)['data'])).convert('RGB'), dtype=int)
+        (_, (x0, y0, x1, y1)), = layer_pieces([WATERMARK], self.background.size)
+        changed = np.argwhere(np.any(a != b, axis=2))
+        self.assertGreater(len(changed), 0)
+        self.assertTrue(np.all((changed >= (y0, x0)) & (changed < (y1, x1))))
+
+    def test_file_helpers(self):
+        """Test the path-based watermark, overlay and blend helpers"""
+        base_path = os.path.join(self.temp_dir.name, 'base.png')
+        self.background.save(base_path)
+        out = os.path.join(self.temp_dir.name, 'out.png')
+
+        add_watermark(base_path, out, text='@bot', pos='top_left')
+        with Image.open(out) as im:
+            self.assertEqual(im.size, self.background.size)
+        add_overlay(base_path, self.sticker_path, out, x=10, y=10, scale=2.0)
+        with Image.open(out) as im:
+            red, green, _ = im.convert('RGB').getpixel((50, 50))
+            self.assertGreater(red, 150)
+            self.assertLess(green, red - 100)
+
+        fused = blend_images(self.background, Image.new('RGB', (20, 20), (255, 255, 255)), 0.5)
+        self.assertEqual(fused.size, self.background.size)
+        self.assertEqual(fused.mode, 'RGB')
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests for fused effect chains.
+"""
+
+import os
+import sys
+import unittest
+import numpy as np
+from PIL import Image
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes.effect_chain import (
+    parse_effect_chain, plan_chain, count_passes, apply_effect_chain, apply_effect_chain_sequential
+)
+
+def gradient_image(width=160, height=120):
+    """An image that covers most of the color cube"""
+    x = np.linspace(0, 255, width)
+    y = np.linspace(0, 255, height)
+    data = np.zeros((height, width, 3), dtype=np.uint8)
+    data[..., 0] = x[None, :]
+    data[..., 1] = y[:, None]
+    data[..., 2] = (x[None, :] + y[:, None]) / 2
+    return Image.fromarray(data)
+
+class TestEffectChain(unittest.TestCase):
+    """Test cases for effect chain parsing, planning and rendering"""
+
+    def test_parse_chain(self):
+        """Test parsing names, intensities and defaults"""
+        chain = parse_effect_chain('deep-fry:0.8 + vaporwave+grayscale', default_intensity=0.4)
+        self.assertEqual(chain, [('deep_fry', 0.8), ('vaporwave', 0.4), ('grayscale', 0.4)])
+
+    def test_parse_chain_errors(self):
+        """Test that bad chains raise ValueError"""
+        for spec in ('', 'not_an_effect', 'sepia:lots', 'sepia:2'):
+            with self.subTest(spec=spec):
+                with self.assertRaises(ValueError):
+                    parse_effect_chain(spec)
+
+    def test_per_channel_stages_fuse(self):
+        """Test that per-channel stages collapse into one lookup table pass"""
+        plan = plan_chain([('invert', 1.0), ('invert', 1.0)])
+        self.assertEqual([kind for kind, _ in plan], ['lut'])
+        self.assertEqual(count_passes(plan), (2, 1))
+
+    def test_color_only_chain_matches_sequential(self):
+        """Test that fused color passes give the same pixels as one effect at a time"""
+        img = gradient_image()
+        for spec in ('grayscale+invert', 'sepia:1+invert', 'invert+grayscale+sepia:0.3'):
+            with self.subTest(spec=spec):
+                chain = parse_effect_chain(spec)
+                fused = np.asarray(apply_effect_chain(img, chain), dtype=int)
+                sequential = np.asarray(apply_effect_chain_sequential(img, chain), dtype=int)
+                self.assertLessEqual(np.abs(fused - sequential).max(), 1)
+
+    def test_mixed_chain_is_close_to_sequential(self):
+        """Test that chains with spatial stages stay within rounding of the reference"""
+        img = gradient_image()
+        chain = parse_effect_chain('vaporwave:0.8+grayscale')
+        fused = np.asarray(apply_effect_chain(img, chain), dtype=int)
+        sequential = np.asarray(apply_effect_chain_sequential(img, chain), dtype=int)
+        self.assertLess(np.abs(fused - sequential).mean(), 1.0)
+        self.assertLessEqual(np.abs(fused - sequential).max(), 3)
+
+    def test_seeded_noise_is_deterministic(self):
+        """Test that noise stages repeat with the same random generator"""
+        img = gradient_image()
+        chain = [('noise', 0.1), ('grayscale', 1.0)]
+        first = apply_effect_chain(img, chain, rng=np.random.default_rng(7))
+        second = apply_effect_chain(img, chain, rng=np.random.default_rng(7))
+        self.assertEqual(first.tobytes(), second.tobytes())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Tests for perceptual image hashes and the hash index.
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import unittest
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.utils.image_hash import BKTree, HashIndex, dhash, hash_image, hamming
+
+def shapes(seed=0, size=(320, 240)):
+    """An image with a few random shapes"""
+    rng = random.Random(seed)
+    img = Image.new('RGB', size, (40, 60, 90))
+    draw = ImageDraw.Draw(img)
+    for _ in range(8):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse((x, y, x + rng.randrange(30, 120), y + rng.randrange(30, 120)),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    return img
+
+class TestImageHash(unittest.TestCase):
+    """Test cases for dHash, the BK-tree and the SQLite-backed index"""
+
+    def setUp(self):
+        """Create a temporary database"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'hashes.db')
+
+    def tearDown(self):
+        """Remove the database"""
+        self.temp_dir.cleanup()
+
+    def test_near_duplicates_hash_close(self):
+        """Test that resized and recompressed copies stay within a few bits"""
+        original = shapes()
+        buffer = io.BytesIO()
+        original.resize((160, 120)).save(buffer, format='JPEG', quality=60)
+
+        self.assertLessEqual(hamming(dhash(original), hash_image(buffer.getvalue())), 6)
+        self.assertGreater(hamming(dhash(original), dhash(shapes(seed=1))), 12)
+
+    def test_bktree_matches_brute_force(self):
+        """Test that tree searches find exactly the hashes a linear scan does"""
+        rng = random.Random(7)
+        hashes = [rng.getrandbits(64) for _ in range(500)]
+        # Add near copies so small distances have matches
+        hashes += [value ^ (1 << rng.randrange(64)) for value in hashes[:50]]
+        tree = BKTree()
+        for i, value in enumerate(hashes):
+            tree.add(value, str(i))
+
+        for query in hashes[:20] + [rng.getrandbits(64) for _ in range(5)]:
+            for distance in (0, 3, 20):
+                expected = sorted((hamming(query, value), str(i))
+                                  for i, value in enumerate(hashes) if hamming(query, value) <= distance)
+                self.assertEqual(tree.search(query, distance), expected)
+
+        self.assertTrue(tree.remove(hashes[3], '3'))
+        self.assertNotIn((0, '3'), tree.search(hashes[3], 0))
+        self.assertFalse(tree.remove(hashes[3], '3'))
+
+    def test_index_persists_and_scopes(self):
+        """Test that hashes survive a reload and stay within their scope"""
+        value = dhash(shapes())
+        index = HashIndex(self.db_path)
+        index.add('reddit', 'abc', value, scope='1')
+        index.add('template', 5, value)
+
+        reloaded = HashIndex(self.db_path)
+        self.assertEqual(reloaded.find('reddit', value ^ 0b101, 6, scope='1'), [(2, 'abc')])
+        self.assertEqual(reloaded.find('reddit', value, 6, scope='2'), [])
+        self.assertEqual(reloaded.refs('template'), {'5': value})
+
+        self.assertTrue(reloaded.remove('template', '5'))
+        self.assertEqual(HashIndex(self.db_path).find('template', value, 6), [])
+
+    def test_prune_drops_old_hashes(self):
+        """Test that expired hashes leave the table and the loaded trees"""
+        value = dhash(shapes())
+        index = HashIndex(self.db_path)
+        index.add('reddit', 'old', value, scope='1')
+        index.add('template', 5, value)
+        self.assertEqual(len(index.find('reddit', value, 0, scope='1')), 1)
+
+        cutoff = time.time()
+        index.add('reddit', 'new', value ^ 0b11, scope='1')
+        self.assertEqual(index.prune('reddit', cutoff), 1)
+
+        self.assertEqual(index.find('reddit', value, 6, scope='1'), [(2, 'new')])
+        self.assertEqual(HashIndex(self.db_path).refs('reddit', scope='1'), {'new': value ^ 0b11})
+        self.assertEqual(index.refs('template'), {'5': value})
+
+    def test_transaction_hash_waits_for_note(self):
+        """Test that a hash written in a caller's transaction is searchable only after note()"""
+        value = dhash(shapes())
+        index = HashIndex(self.db_path)
+        self.assertEqual(index.find('template', value, 6), [])
+
+        conn = sqlite3.connect(self.db_path)
+        index.add('template', 7, value, conn=conn)
+        conn.rollback()
+        conn.close()
+        self.assertEqual(index.find('template', value, 6), [])
+
+        conn = sqlite3.connect(self.db_path)
+        index.add('template', 7, value, conn=conn)
+        conn.commit()
+        conn.close()
+        index.note('template', 7, value)
+        self.assertEqual(index.find('template', value, 6), [(0, '7')])
+
+    def test_flat_images_never_match(self):
+        """Test that plain images are not reported as duplicates of each other"""
+        index = HashIndex(self.db_path)
+        flat = dhash(Image.new('RGB', (100, 100), (255, 255, 255)))
+        index.add('template', '1', flat)
+        self.assertEqual(index.find('template', dhash(Image.new('RGB', (50, 80), (0, 0, 0))), 6), [])
+
+if __name__ == "__main__":
+    unittest.main()
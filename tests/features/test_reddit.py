@@ -66,8 +66,8 @@ class TestRedditCommands(unittest.IsolatedAsyncioTestCase):
         self.mock_fetch_new_posts = self.reddit_patcher.start()
         self.addAsyncCleanup(self.reddit_patcher.stop)
 
-        self.reddit_best_patcher = patch('bot.features.reddit.commands.fetch_random_best_post')
-        self.mock_fetch_random_best_post = self.reddit_best_patcher.start()
+        self.reddit_best_patcher = patch('bot.features.reddit.commands.fetch_best_posts')
+        self.mock_fetch_best_posts = self.reddit_best_patcher.start()
         self.addAsyncCleanup(self.reddit_best_patcher.stop)
 
         # Import the Reddit commands
@@ -93,7 +93,7 @@ class TestRedditCommands(unittest.IsolatedAsyncioTestCase):
             }
         ]
 
-        self.mock_fetch_random_best_post.return_value = {
+        self.mock_fetch_best_posts.return_value = [{
             'title': 'Best Test Meme',
             'url': 'https://example.com/best_meme.jpg',
             'permalink': '/r/testsubreddit/comments/123458/best_test_meme/',
@@ -105,7 +105,7 @@ class TestRedditCommands(unittest.IsolatedAsyncioTestCase):
             'id': 'abc456',
             'image_url': 'https://example.com/best_meme.jpg',
             'post_url': 'https://reddit.com/r/testsubreddit/comments/123458/best_test_meme/'
-        }
+        }]
 
     async def test_reddit_autopost_command(self):
         """Test the reddit_autopost command"""
@@ -165,5 +165,48 @@ class TestRedditCommands(unittest.IsolatedAsyncioTestCase):
         # Check that the subreddit was disabled
         self.mock_remove_subreddit.assert_called_once_with(123456, 'testsubreddit')
 
+    async def test_autopost_fetches_each_subreddit_once(self):
+        """Test that guilds following the same subreddit share one fetch"""
+        self.reddit_commands.send_reddit_embed = AsyncMock()
+        self.reddit_commands.post_image_hash = AsyncMock(return_value=None)
+        store = {
+            str(guild_id): {'testsubreddit': {'channel_id': guild_id, 'seen_ids': []}}
+            for guild_id in (1, 2, 3)
+        }
+        store['3']['othersubreddit'] = {'channel_id': 3, 'seen_ids': ['abc123']}
+        now = 1620000000
+        self.reddit_commands.load_subscriptions(store, now)
+
+        self.assertEqual(await self.reddit_commands.poll_due(now), 2)
+
+        self.assertEqual(sorted(c.args[0] for c in self.mock_fetch_new_posts.call_args_list),
+                         ['othersubreddit', 'testsubreddit'])
+        self.assertEqual(self.mock_fetch_best_posts.call_count, 2)
+        # Three guilds get the new post, and four subscriptions get the best post
+        self.assertEqual(self.reddit_commands.send_reddit_embed.call_count, 7)
+        # Each image is hashed once per poll, not once per guild
+        self.assertEqual(sorted(c.args[0]['id'] for c in self.reddit_commands.post_image_hash.call_args_list),
+                         ['abc123', 'abc456', 'abc456'])
+        for guild_id in ('1', '2', '3'):
+            cfg = self.reddit_commands.autopost_store[guild_id]['testsubreddit']
+            self.assertEqual(cfg['last_posted_id'], 'abc123')
+            self.assertEqual(list(cfg['seen_ids']), ['abc123', 'abc456'])
+        self.assertNotIn('last_posted_id', self.reddit_commands.autopost_store['3']['othersubreddit'])
+
+        # Nothing is due until the scheduler says so
+        self.mock_fetch_new_posts.reset_mock()
+        self.assertEqual(self.reddit_commands.scheduler.next_due(), now + 300)
+        self.assertEqual(await self.reddit_commands.poll_due(now + 100), 0)
+        self.mock_fetch_new_posts.assert_not_called()
+
+        # A poll that finds nothing new backs the subreddits off
+        self.assertEqual(await self.reddit_commands.poll_due(now + 300), 2)
+        self.assertGreater(self.reddit_commands.scheduler.next_due(), now + 600)
+
+        # Disabling the last subscription stops polling the subreddit
+        self.reddit_commands.untrack_subscription(3, 'othersubreddit')
+        self.assertNotIn('othersubreddit', self.reddit_commands.scheduler)
+        self.assertIn('testsubreddit', self.reddit_commands.scheduler)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,137 @@
+"""
+Tests for the pooled async Reddit client.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+from aiohttp import web
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.reddit.client import RedditClient
+from bot.features.reddit import reddit
+
+# Seconds each fake listing takes to answer
+DELAY = 0.3
+
+def listing(*posts):
+    return {'data': {'children': [{'kind': 't3', 'data': post} for post in posts]}}
+
+class TestRedditClient(unittest.IsolatedAsyncioTestCase):
+    """Test cases for fetching listings through one shared session"""
+
+    async def asyncSetUp(self):
+        """Start a local server that answers like Reddit"""
+        async def new(request):
+            await asyncio.sleep(DELAY)
+            sub = request.match_info['sub']
+            if sub == 'broken':
+                return web.Response(status=503)
+            return web.json_response(listing(
+                {'id': f'{sub}1', 'title': 'Image', 'url': 'https://i.redd.it/a.png', 'permalink': '/r/x/1'},
+                {'id': f'{sub}2', 'title': 'Link', 'url': 'https://example.com/article'},
+            ))
+
+        # A subreddit that honors the before cursor and ETags, newest post first
+        self.quiet = [{'id': 'q2', 'name': 't3_q2', 'url': 'https://i.redd.it/2.png'},
+                      {'id': 'q1', 'name': 't3_q1', 'url': 'https://i.redd.it/1.png'}]
+        self.seen_requests = []
+
+        async def quiet(request):
+            before = request.query.get('before')
+            limit = int(request.query.get('limit', 25))
+            names = [post['name'] for post in self.quiet]
+            # Like Reddit, a cursor gets the posts just newer than it
+            posts = self.quiet[:names.index(before)][-limit:] if before in names else self.quiet[:limit]
+            etag = f'"{len(self.quiet)}-{before}"'
+            self.seen_requests.append((before, request.headers.get('If-None-Match')))
+            if request.headers.get('If-None-Match') == etag:
+                return web.Response(status=304)
+            return web.json_response(listing(*posts), headers={'ETag': etag})
+
+        app = web.Application()
+        app.router.add_get('/r/quiet/new.json', quiet)
+        app.router.add_get('/r/{sub}/new.json', new)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.client = RedditClient(base_url=f'http://127.0.0.1:{port}', timeout=5, max_connections=4)
+
+    async def asyncTearDown(self):
+        """Stop the server and close the session"""
+        await self.client.close()
+        await self.runner.cleanup()
+
+    async def test_listing_parsed(self):
+        """Test that a listing comes back as children and parses into posts"""
+        children = await self.client.get_listing('memes', 'new', {'limit': 10})
+        posts = reddit.parse_new_posts(children)
+        self.assertEqual([p['id'] for p in posts], ['memes1'])
+        self.assertEqual(posts[0]['image_url'], 'https://i.redd.it/a.png')
+        self.assertTrue(posts[0]['post_url'].endswith('/r/x/1'))
+
+    async def test_subreddits_fetched_concurrently(self):
+        """Test that slow subreddits are fetched side by side on one session"""
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self.client.get_listing(sub, 'new') for sub in ('a', 'b', 'c')))
+        elapsed = time.perf_counter() - start
+        self.assertEqual([len(r) for r in results], [2, 2, 2])
+        self.assertLess(elapsed, DELAY * 2.5)
+        self.assertEqual(self.client.stats()['requests'], 3)
+        self.assertEqual(self.client.stats()['errors'], 0)
+
+    async def test_errors_return_empty(self):
+        """Test that an error status gives an empty listing and is counted"""
+        self.assertEqual(await self.client.get_listing('broken', 'new'), [])
+        self.assertEqual(self.client.stats()['errors'], 1)
+
+    async def test_incremental_new_posts(self):
+        """Test that repeat polls ask only for newer posts and quiet polls cost a 304"""
+        with patch.object(reddit, 'reddit_client', self.client), patch.dict(reddit._new_posts_windows, clear=True):
+            first = await reddit.fetch_new_posts('quiet', limit=10)
+            self.assertEqual([p['id'] for p in first], ['q2', 'q1'])
+
+            # Nothing new: an empty listing, then a 304 once the ETag is known
+            self.assertEqual(await reddit.fetch_new_posts('quiet', limit=10), first)
+            self.assertEqual(await reddit.fetch_new_posts('quiet', limit=10), first)
+
+            self.quiet.insert(0, {'id': 'q3', 'name': 't3_q3', 'url': 'https://i.redd.it/3.png'})
+            latest = await reddit.fetch_new_posts('quiet', limit=10)
+            self.assertEqual([p['id'] for p in latest], ['q3', 'q2', 'q1'])
+
+        self.assertEqual(self.seen_requests, [
+            (None, None),
+            ('t3_q2', None),
+            ('t3_q2', '"2-t3_q2"'),
+            ('t3_q2', '"2-t3_q2"'),
+        ])
+        stats = self.client.subreddit_stats['quiet']
+        self.assertEqual((stats['requests'], stats['not_modified'], stats['empty'], stats['requests_saved']),
+                         (4, 1, 1, 2))
+        self.assertGreater(stats['bytes_saved'], 0)
+        self.assertEqual(self.client.stats()['requests_saved'], 2)
+
+    async def test_burst_is_paged_to_the_newest(self):
+        """Test that a burst bigger than the limit arrives in one poll, newest first"""
+        with patch.object(reddit, 'reddit_client', self.client), patch.dict(reddit._new_posts_windows, clear=True):
+            self.assertEqual([p['id'] for p in await reddit.fetch_new_posts('quiet', limit=2)], ['q2', 'q1'])
+
+            for i in range(3, 8):
+                self.quiet.insert(0, {'id': f'q{i}', 'name': f't3_q{i}', 'url': f'https://i.redd.it/{i}.png'})
+            burst = await reddit.fetch_new_posts('quiet', limit=2)
+            self.assertEqual([p['id'] for p in burst], ['q7', 'q6', 'q5', 'q4', 'q3'])
+
+            self.assertEqual(await reddit.fetch_new_posts('quiet', limit=2), burst[:2])
+
+        self.assertEqual([before for before, _ in self.seen_requests],
+                         [None, 't3_q2', 't3_q4', 't3_q6', 't3_q7'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Tests for the rendered meme cache.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes.render_engine import build_render_job, render_job
+from bot.features.memes.render_cache import RenderCache, attachment_url_expiry
+from bot.utils.meme_effects import apply_effect
+
+def encoded(size):
+    """A stand-in render result of the given size"""
+    data = b'x' * size
+    return {'data': data, 'format': 'JPEG', 'extension': 'jpg', 'bytes': size}
+
+class TestRenderCache(unittest.TestCase):
+    """Test cases for the RenderCache class"""
+
+    def setUp(self):
+        """Create a small template image"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.template_path = os.path.join(self.temp_dir.name, 'template.png')
+        Image.new('RGB', (120, 90), (200, 120, 40)).save(self.template_path)
+        self.cache = RenderCache(max_bytes=100, ttl=60)
+
+    def tearDown(self):
+        """Remove the template"""
+        self.temp_dir.cleanup()
+
+    def test_equivalent_requests_share_a_key(self):
+        """Test that whitespace and color case do not change the key"""
+        first = build_render_job(self.template_path, top_text='hi ', font_color='White')
+        second = build_render_job(self.template_path, top_text='hi', font_color='white')
+        third = build_render_job(self.template_path, top_text='bye', font_color='white')
+
+        self.assertEqual(RenderCache.make_key(first), RenderCache.make_key(second))
+        self.assertNotEqual(RenderCache.make_key(first), RenderCache.make_key(third))
+
+    def test_changed_template_changes_key(self):
+        """Test that replacing the template file gives a new key"""
+        job = build_render_job(self.template_path, top_text='hi')
+        key = RenderCache.make_key(job)
+        Image.new('RGB', (60, 40)).save(self.template_path)
+        self.assertNotEqual(RenderCache.make_key(job), key)
+
+    def test_noisy_effects_are_deterministic(self):
+        """Test that the same request renders the same bytes"""
+        job = build_render_job(self.template_path, effect='deep_fry', intensity=0.9)
+        self.assertEqual(render_job(job)['data'], render_job(dict(job))['data'])
+
+    def test_seeded_glitch_is_deterministic(self):
+        """Test that the legacy glitch effect repeats with a seed"""
+        img = Image.radial_gradient('L').convert('RGB')
+        first = apply_effect(img, 'glitch', seed=3)
+        second = apply_effect(img, 'glitch', seed=3)
+        self.assertEqual(first.tobytes(), second.tobytes())
+
+    def test_byte_cap_evicts_least_recent(self):
+        """Test that entries are evicted to stay under the byte cap"""
+        self.cache.put('a', encoded(40))
+        self.cache.put('b', encoded(40))
+        self.cache.get('a')
+        self.cache.put('c', encoded(40))
+
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertLessEqual(self.cache.stats()['bytes'], 100)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_ttl_expires_entries(self):
+        """Test that old entries are dropped"""
+        self.cache.put('a', encoded(4))
+        with patch('bot.features.memes.render_cache.time.time', return_value=time.time() + 61):
+            self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats()['expired'], 1)
+
+    def test_urls_are_per_guild(self):
+        """Test that an uploaded URL is only reused in its own guild"""
+        url = 'https://cdn.discordapp.com/attachments/1/2/meme.jpg'
+        self.cache.put('a', encoded(4))
+        self.cache.put_url('a', 10, url)
+
+        self.assertEqual(self.cache.get_url('a', 10), url)
+        self.assertIsNone(self.cache.get_url('a', 11))
+        self.assertEqual(self.cache.stats()['url_hits'], 1)
+
+    def test_expired_signed_url_is_not_reused(self):
+        """Test that signed CDN URLs are dropped before Discord expires them"""
+        expires = int(time.time()) + 60
+        url = f'https://cdn.discordapp.com/attachments/1/2/meme.jpg?ex={expires:x}&is=0&hm=abc'
+        self.assertEqual(attachment_url_expiry(url), expires)
+
+        self.cache.put('a', encoded(4))
+        self.cache.put_url('a', 10, url)
+        self.assertIsNone(self.cache.get_url('a', 10))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+Tests for the meme render engine.
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from PIL import Image
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes.render_engine import (
+    RenderEngine, RenderError, RenderTimeout, build_render_job, render_job, interaction_time_left,
+    build_batch_job, render_batch_job, parse_caption_batch
+)
+
+class TestRenderEngine(unittest.IsolatedAsyncioTestCase):
+    """Test cases for the RenderEngine class"""
+
+    def setUp(self):
+        """Create a small template image"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.template_path = os.path.join(self.temp_dir.name, 'template.png')
+        Image.new('RGB', (200, 150), (40, 80, 160)).save(self.template_path)
+        self.engine = RenderEngine(max_workers=1, timeout=30)
+
+    def tearDown(self):
+        """Stop the workers and remove the template"""
+        self.engine.shutdown()
+        self.temp_dir.cleanup()
+
+    def test_render_job_returns_image(self):
+        """Test rendering a job in-process"""
+        job = build_render_job(self.template_path, top_text='top', bottom_text='bottom')
+        result = render_job(job)
+
+        img = Image.open(io.BytesIO(result['data']))
+        self.assertEqual(img.format, result['format'])
+        self.assertEqual(img.size, (200, 150))
+        self.assertEqual(result['bytes'], len(result['data']))
+
+    def test_render_job_unknown_effect(self):
+        """Test that an unknown effect raises a RenderError"""
+        job = build_render_job(self.template_path, effect='not_an_effect')
+        with self.assertRaises(RenderError):
+            render_job(job)
+
+    def test_render_job_effect_chain(self):
+        """Test rendering a job with a fused effect chain"""
+        job = build_render_job(self.template_path, effects=[('grayscale', 1.0), ('invert', 1.0)])
+        img = Image.open(io.BytesIO(render_job(job)['data']))
+        r, g, b = img.convert('RGB').getpixel((100, 75))
+
+        self.assertAlmostEqual(r, g, delta=2)
+        self.assertAlmostEqual(g, b, delta=2)
+
+    def test_render_job_stays_in_memory(self):
+        """Test that JPEG artifacting does not write temp files to the working directory"""
+        job = build_render_job(self.template_path, effect='deep_fry', intensity=0.8, top_text='fried')
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as work_dir:
+            os.chdir(work_dir)
+            try:
+                result = render_job(job)
+                self.assertEqual(os.listdir(work_dir), [])
+            finally:
+                os.chdir(cwd)
+        self.assertEqual(Image.open(io.BytesIO(result['data'])).format, result['format'])
+
+    def test_render_job_expired_deadline(self):
+        """Test that a worker gives up on a stale job"""
+        job = build_render_job(self.template_path, top_text='late')
+        job['deadline'] = time.time() - 1
+        with self.assertRaises(RenderTimeout):
+            render_job(job)
+
+    async def test_render_in_pool(self):
+        """Test rendering a job in a worker process"""
+        job = build_render_job(self.template_path, top_text='hello', effect='invert', intensity=0.5)
+        result = await self.engine.render(job)
+
+        self.assertEqual(Image.open(io.BytesIO(result['data'])).size, (200, 150))
+        self.assertEqual(self.engine.stats()['renders'], 1)
+        self.assertEqual(self.engine.pending, 0)
+
+    async def test_render_expired_interaction(self):
+        """Test that an expired interaction is never submitted"""
+        interaction = MagicMock()
+        interaction.created_at = datetime.now(timezone.utc) - timedelta(minutes=20)
+
+        self.assertLess(interaction_time_left(interaction), 0)
+        with self.assertRaises(RenderTimeout):
+            await self.engine.render(build_render_job(self.template_path, top_text='x'),
+                                     interaction=interaction)
+
+    async def test_render_queue_full(self):
+        """Test that a saturated pool rejects new jobs"""
+        self.engine.pending = self.engine.max_pending
+        with self.assertRaises(RenderError):
+            await self.engine.render(build_render_job(self.template_path, top_text='x'))
+
+    def test_parse_caption_batch(self):
+        """Test splitting batch captions into memes"""
+        captions = parse_caption_batch('top one|bottom one; just a top ;|just a bottom; ')
+        self.assertEqual(captions, [
+            {'top_text': 'top one', 'bottom_text': 'bottom one'},
+            {'top_text': 'just a top', 'bottom_text': None},
+            {'top_text': None, 'bottom_text': 'just a bottom'},
+        ])
+        with self.assertRaises(ValueError):
+            parse_caption_batch(' ; | ')
+
+    def test_batch_matches_single_renders(self):
+        """Test that a batch renders each meme like its own job would"""
+        captions = [{'top_text': 'one'}, {'top_text': 'two', 'bottom_text': 'three'}]
+        job = build_batch_job(self.template_path, captions, effects=[('noise', 0.2)])
+        job['items'][0]['report_savings'] = True
+        results = render_batch_job(job)
+
+        self.assertEqual(len(results), 2)
+        for item, result in zip(job['items'], results):
+            self.assertEqual(result['data'], render_job(item)['data'])
+        self.assertIsNotNone(results[0]['baseline_bytes'])
+        self.assertEqual(results[1]['baseline_bytes'], results[0]['baseline_bytes'])
+        self.assertIsNone(render_job(job['items'][1])['baseline_bytes'])
+
+    async def test_batch_split_across_workers(self):
+        """Test that a large batch comes back complete and in order"""
+        engine = RenderEngine(max_workers=2, timeout=30)
+        try:
+            captions = [{'top_text': f'meme {i}'} for i in range(9)]
+            job = build_batch_job(self.template_path, captions)
+            results = await engine.render_batch(job)
+        finally:
+            engine.shutdown()
+
+        self.assertEqual([r['data'] for r in results], [render_job(item)['data'] for item in job['items']])
+        self.assertEqual(engine.stats()['renders'], 9)
+        self.assertEqual(engine.pending, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Tests for strip-based effect execution.
+"""
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+import numpy as np
+from PIL import Image
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.utils import strips
+from bot.utils.strips import map_strips, noise_strips, strip_rows
+from bot.utils.meme_effects import glitch, sepia, SEPIA_MATRIX
+
+def sample_image(size=(97, 61)):
+    """An RGB image with different content in every channel"""
+    gradient = Image.radial_gradient('L').resize(size)
+    return Image.merge('RGB', (gradient, gradient.transpose(Image.FLIP_TOP_BOTTOM), gradient.rotate(90)))
+
+class TestStrips(unittest.TestCase):
+    """Test cases for strip execution"""
+
+    def test_strip_rows_fit_budget(self):
+        """Test that strips are sized to the scratch budget"""
+        self.assertEqual(strip_rows(1000, 3, 4, max_bytes=120_000), 10)
+        self.assertEqual(strip_rows(10**6, 3, 4, max_bytes=1024), 1)
+
+    def test_strips_cover_every_row(self):
+        """Test that every row is visited once, with its own offset"""
+        img = Image.new('L', (5, 23))
+
+        def fill(strip, top, scratch):
+            self.assertEqual(strip.shape, scratch.shape)
+            strip[:] = np.arange(top, top + len(strip))[:, None]
+
+        out = np.asarray(map_strips(img, fill, rows=4))
+        self.assertTrue(np.array_equal(out[:, 0], np.arange(23)))
+
+    def test_noise_independent_of_strip_height(self):
+        """Test that seeded noise does not depend on how the image is cut"""
+        img = sample_image()
+        whole = noise_strips(img, 0.1, np.random.default_rng(5))
+        with patch.object(strips, 'strip_rows', return_value=3):
+            cut = noise_strips(img, 0.1, np.random.default_rng(5))
+
+        self.assertTrue(np.array_equal(np.asarray(whole), np.asarray(cut)))
+        self.assertFalse(np.array_equal(np.asarray(whole), np.asarray(img)))
+
+    def test_sepia_matches_float_formula(self):
+        """Test that float32 strips match the float64 sepia formula"""
+        img = sample_image()
+        expected = np.clip(np.asarray(img, dtype=np.float64) @ SEPIA_MATRIX.T, 0, 255).astype(np.uint8)
+        diff = np.abs(np.asarray(sepia(img)).astype(int) - expected)
+        self.assertLessEqual(diff.max(), 1)
+
+    def test_glitch_independent_of_strip_height(self):
+        """Test that slice shifts crossing strip edges give the same glitch"""
+        img = sample_image((120, 200))
+        whole = glitch(img, seed=11)
+        with patch.object(strips, 'strip_rows', return_value=7):
+            cut = glitch(img, seed=11)
+
+        self.assertTrue(np.array_equal(np.asarray(whole), np.asarray(cut)))
+
+if __name__ == "__main__":
+    unittest.main()
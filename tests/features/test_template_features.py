@@ -0,0 +1,104 @@
+"""
+Tests for the template feature index.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes.template_features import (
+    TemplateFeatureIndex, image_features, template_features, FEATURE_DIMS
+)
+
+def stripes(color, vertical=False, size=(300, 200)):
+    """An image of thick stripes in one color over black"""
+    img = Image.new('RGB', size)
+    draw = ImageDraw.Draw(img)
+    for offset in range(0, max(size), 40):
+        box = (offset, 0, offset + 19, size[1]) if vertical else (0, offset, size[0], offset + 19)
+        draw.rectangle(box, fill=color)
+    return img
+
+class TestTemplateFeatures(unittest.TestCase):
+    """Test cases for feature vectors and similarity search"""
+
+    def setUp(self):
+        """Create a temporary index directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.temp_dir.name, 'features')
+
+    def tearDown(self):
+        """Remove the files"""
+        self.temp_dir.cleanup()
+
+    def test_vectors_are_unit_length(self):
+        """Test vector shape and that a rescaled copy stays close"""
+        vector = image_features(stripes((200, 40, 40)))
+        self.assertEqual(vector.shape, (FEATURE_DIMS,))
+        self.assertEqual(vector.dtype, np.float32)
+        self.assertAlmostEqual(float(np.linalg.norm(vector)), 1.0, places=5)
+        self.assertGreater(float(vector @ image_features(stripes((200, 40, 40)).resize((600, 400)))), 0.95)
+
+        flat = image_features(Image.new('RGB', (50, 50), (10, 10, 10)))
+        self.assertFalse(np.isnan(flat).any())
+
+    def test_search_ranks_by_color_and_layout(self):
+        """Test that the closest templates share color and stripe direction"""
+        index = TemplateFeatureIndex(self.directory)
+        images = {
+            1: stripes((200, 40, 40)),
+            2: stripes((210, 50, 30), size=(320, 180)),
+            3: stripes((200, 40, 40), vertical=True),
+            4: stripes((40, 40, 200), vertical=True),
+        }
+        for template_id, img in images.items():
+            index.add(template_id, image_features(img))
+
+        ranked = [template_id for template_id, _ in index.similar(1, 3)]
+        self.assertEqual(ranked, [2, 3, 4])
+        self.assertEqual([template_id for template_id, _ in index.similar(4, 1)], [3])
+        self.assertEqual(index.similar(99, 3), [])
+
+    def test_matrix_is_mapped_and_updated(self):
+        """Test that a new index maps the saved matrix and sees adds and removes"""
+        path = os.path.join(self.temp_dir.name, 'template.png')
+        stripes((0, 200, 0)).save(path)
+        index = TemplateFeatureIndex(self.directory)
+        for template_id in (5, 6, 7):
+            index.add(template_id, template_features(path))
+        index.add(6, image_features(stripes((0, 0, 200), vertical=True)))
+        self.assertTrue(index.remove(5))
+        self.assertFalse(index.remove(5))
+
+        reloaded = TemplateFeatureIndex(self.directory)
+        self.assertEqual(reloaded.ids(), [6, 7])
+        self.assertIsInstance(reloaded._matrix, np.memmap)
+        (best, score), = reloaded.search(template_features(path), 1)
+        self.assertEqual(best, 7)
+        self.assertAlmostEqual(score, 1.0, places=5)
+
+    def test_add_many_saves_once(self):
+        """Test that a batch of vectors is stored with one save"""
+        index = TemplateFeatureIndex(self.directory)
+        index.add(1, image_features(stripes((200, 0, 0))))
+        green = image_features(stripes((0, 200, 0)))
+        blue = image_features(stripes((0, 0, 200), vertical=True))
+        with patch.object(index, '_save', wraps=index._save) as save:
+            self.assertEqual(index.add_many([(2, green), (1, blue), (3, green)]), 3)
+        self.assertEqual(save.call_count, 1)
+
+        reloaded = TemplateFeatureIndex(self.directory)
+        self.assertEqual(reloaded.ids(), [1, 2, 3])
+        (best, score), = reloaded.search(blue, 1)
+        self.assertEqual(best, 1)
+        self.assertAlmostEqual(score, 1.0, places=5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Tests for the template ingestion pipeline.
+"""
+
+import io
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.core import db
+from bot.features.memes import template_manager, template_maps
+from bot.features.memes.template_ingest import normalize_template, IngestError
+from bot.features.memes.template_features import TemplateFeatureIndex
+from bot.utils.image_hash import HashIndex
+
+def arrow(size=(300, 200)):
+    """An image that shows which way is up: a red bar along the top"""
+    img = Image.new('RGB', size, (255, 255, 255))
+    ImageDraw.Draw(img).rectangle((0, 0, size[0], size[1] // 5), fill=(255, 0, 0))
+    return img
+
+class TestTemplateIngest(unittest.TestCase):
+    """Test cases for normalization, content-addressed storage and shared files"""
+
+    def setUp(self):
+        """Create temporary template, map and database locations"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.template_dir = os.path.join(self.temp_dir.name, 'templates')
+        os.makedirs(self.template_dir)
+        self.db_path = os.path.join(self.temp_dir.name, 'bot.db')
+        self.patchers = [
+            patch.object(template_maps, 'MAP_DIR', os.path.join(self.temp_dir.name, 'maps')),
+            patch.object(template_manager, 'DB_PATH', self.db_path),
+            patch.object(template_manager, 'hash_index', HashIndex(self.db_path)),
+            patch.object(template_manager, 'feature_index',
+                         TemplateFeatureIndex(os.path.join(self.temp_dir.name, 'features'))),
+            patch.object(db, 'DB_PATH', self.db_path),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        db.init_db()
+
+    def tearDown(self):
+        """Remove the files"""
+        for patcher in self.patchers:
+            patcher.stop()
+        self.temp_dir.cleanup()
+
+    def ingest(self, data: bytes, **job):
+        """Write an upload to disk and run it through the worker function"""
+        source = os.path.join(self.temp_dir.name, 'upload.part')
+        with open(source, 'wb') as f:
+            f.write(data)
+        return normalize_template(dict({'source': source, 'template_dir': self.template_dir}, **job))
+
+    @staticmethod
+    def encode(img, fmt, **params):
+        buffer = io.BytesIO()
+        img.save(buffer, format=fmt, **params)
+        return buffer.getvalue()
+
+    def test_orientation_and_size(self):
+        """Test that EXIF rotation is applied and large images are shrunk"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        # Stored sideways; orientation 6 says rotate it 90 degrees clockwise to view
+        sideways = arrow().transpose(Image.Transpose.ROTATE_90)
+        result = self.ingest(self.encode(sideways, 'JPEG', exif=exif), max_dimension=150)
+
+        self.assertEqual((result['width'], result['height']), (150, 100))
+        self.assertTrue(result['file_path'].endswith('.jpg'))
+        with Image.open(result['file_path']) as im:
+            self.assertEqual(im.size, (150, 100))
+            self.assertNotIn(0x0112, im.getexif())
+            red, green, _ = im.convert('RGB').getpixel((75, 5))
+            self.assertGreater(red, 200)
+            self.assertLess(green, 60)
+
+    def test_color_modes(self):
+        """Test that palette and CMYK images become RGB and real transparency is kept"""
+        palette = self.ingest(self.encode(arrow().convert('P'), 'PNG'))
+        cmyk = self.ingest(self.encode(arrow().convert('CMYK'), 'JPEG'))
+        sticker = Image.new('RGBA', (64, 64), (0, 0, 0, 0))
+        ImageDraw.Draw(sticker).ellipse((8, 8, 56, 56), fill=(0, 200, 0, 255))
+        transparent = self.ingest(self.encode(sticker, 'PNG'))
+        opaque = self.ingest(self.encode(arrow().convert('RGBA'), 'WEBP', lossless=True))
+
+        with Image.open(palette['file_path']) as im:
+            self.assertEqual((im.format, im.mode), ('PNG', 'RGB'))
+        with Image.open(cmyk['file_path']) as im:
+            self.assertEqual((im.format, im.mode), ('JPEG', 'RGB'))
+        with Image.open(transparent['file_path']) as im:
+            self.assertEqual((im.format, im.mode), ('PNG', 'RGBA'))
+        with Image.open(opaque['file_path']) as im:
+            self.assertEqual((im.format, im.mode), ('PNG', 'RGB'))
+
+    def test_identical_uploads_stored_once(self):
+        """Test that the same upload maps to one content-addressed file"""
+        data = self.encode(arrow(), 'PNG')
+        first = self.ingest(data)
+        second = self.ingest(data)
+        self.assertEqual(first['file_path'], second['file_path'])
+        self.assertEqual(first['content_hash'], second['content_hash'])
+        self.assertTrue(os.path.basename(first['file_path']).startswith(first['content_hash'][:32]))
+        self.assertEqual([name for name in os.listdir(self.template_dir)], [os.path.basename(first['file_path'])])
+        self.assertTrue(os.path.exists(template_maps.maps_path(first['file_path'])))
+
+    def test_animation_kept_and_garbage_rejected(self):
+        """Test that animated templates are stored as uploaded and non-images are refused"""
+        frames = [arrow(), arrow().rotate(180)]
+        data = self.encode(frames[0], 'GIF', save_all=True, append_images=frames[1:], duration=100, loop=0)
+        result = self.ingest(data, max_dimension=100)
+        with open(result['file_path'], 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual((result['width'], result['height']), (300, 200))
+
+        with self.assertRaises(IngestError):
+            self.ingest(b'not an image at all')
+
+    def test_shared_file_deleted_with_last_template(self):
+        """Test that a file shared by two templates outlives the first delete"""
+        result = self.ingest(self.encode(arrow(), 'PNG'))
+        ids = [
+            template_manager.add_template(name, result['file_path'], '1', 'user', width=result['width'],
+                                          height=result['height'], content_hash=result['content_hash'],
+                                          image_hash=result['image_hash'])
+            for name in ('first', 'second')
+        ]
+        # Features are computed from the file when the caller has none
+        self.assertEqual(sorted(template_manager.feature_index.ids()), sorted(ids))
+
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT content_hash FROM templates").fetchall()
+        hashes = conn.execute("SELECT ref FROM image_hashes WHERE kind = 'template'").fetchall()
+        conn.close()
+        self.assertEqual(rows, [(result['content_hash'],)] * 2)
+        self.assertEqual(sorted(int(ref) for ref, in hashes), ids)
+
+        with patch('bot.features.memes.template_thumbnails.delete_thumbnails'):
+            self.assertTrue(template_manager.delete_template(ids[0]))
+            self.assertTrue(os.path.exists(result['file_path']))
+            self.assertTrue(template_manager.delete_template(ids[1]))
+        self.assertFalse(os.path.exists(result['file_path']))
+        self.assertFalse(os.path.exists(template_maps.maps_path(result['file_path'])))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Tests for the meme template manager.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import unittest
+from PIL import Image
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes.template_manager import TemplateImageCache
+
+class TestTemplateImageCache(unittest.TestCase):
+    """Test cases for the TemplateImageCache class"""
+
+    def setUp(self):
+        """Create a few template images"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(3):
+            path = os.path.join(self.temp_dir.name, f'template_{i}.png')
+            Image.new('RGB', (100, 100), (i * 50, 0, 0)).save(path)
+            self.paths.append(path)
+        # Room for exactly two 100x100 RGB templates
+        self.cache = TemplateImageCache(max_bytes=2 * 100 * 100 * 3)
+
+    def tearDown(self):
+        """Remove the template images"""
+        self.temp_dir.cleanup()
+
+    def test_hit_and_miss(self):
+        """Test that the second load is served from the cache"""
+        self.cache.get(self.paths[0])
+        self.cache.get(self.paths[0])
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['bytes'], 100 * 100 * 3)
+
+    def test_returns_private_copy(self):
+        """Test that drawing on a returned image does not touch the cache"""
+        img = self.cache.get(self.paths[0])
+        img.putpixel((0, 0), (255, 255, 255))
+
+        self.assertEqual(self.cache.get(self.paths[0]).getpixel((0, 0)), (0, 0, 0))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used template is evicted"""
+        self.cache.get(self.paths[0])
+        self.cache.get(self.paths[1])
+        self.cache.get(self.paths[0])
+        self.cache.get(self.paths[2])
+
+        stats = self.cache.stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], self.cache.max_bytes)
+
+        # paths[1] was evicted, paths[0] survived
+        self.cache.get(self.paths[0])
+        self.assertEqual(self.cache.stats()['hits'], 2)
+
+    def test_changed_file_is_reloaded(self):
+        """Test that a template rewritten on disk is decoded again"""
+        self.cache.get(self.paths[0])
+        Image.new('RGB', (100, 100), (0, 0, 255)).save(self.paths[0])
+        os.utime(self.paths[0], ns=(time.time_ns(), time.time_ns() + 10**9))
+
+        self.assertEqual(self.cache.get(self.paths[0]).getpixel((0, 0)), (0, 0, 255))
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_invalidate_and_warm(self):
+        """Test pre-warming and explicit invalidation"""
+        self.assertEqual(self.cache.warm(self.paths[:2]), 2)
+        self.assertEqual(self.cache.stats()['entries'], 2)
+
+        self.cache.invalidate(self.paths[0])
+        self.assertEqual(self.cache.stats()['entries'], 1)
+        self.assertEqual(self.cache.stats()['bytes'], 100 * 100 * 3)
+
+if __name__ == "__main__":
+    unittest.main()
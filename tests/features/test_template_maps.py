@@ -0,0 +1,99 @@
+"""
+Tests for template luminance and edge maps.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes import template_maps
+from bot.features.memes.template_maps import TemplateMapCache, maps_path
+from bot.features.memes.render_engine import build_render_job, render_job
+from bot.utils.color_utils import get_average_luminance
+from bot.utils.image_maps import ImageMaps
+
+def busy_top(size=(240, 160)):
+    """A dark image with a checkerboard over its top half and a plain bottom half"""
+    img = Image.new('RGB', size, (30, 30, 30))
+    draw = ImageDraw.Draw(img)
+    for x in range(0, size[0], 8):
+        for y in range(0, size[1] // 2, 8):
+            if (x + y) // 8 % 2:
+                draw.rectangle((x, y, x + 7, y + 7), fill=(230, 230, 230))
+    return img
+
+class TestTemplateMaps(unittest.TestCase):
+    """Test cases for summed-area maps and their cache"""
+
+    def setUp(self):
+        """Point the map directory at a temporary folder"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(template_maps, 'MAP_DIR', os.path.join(self.temp_dir.name, 'maps'))
+        self.patcher.start()
+        template_maps.template_map_cache.clear()
+        self.path = os.path.join(self.temp_dir.name, 'busy.png')
+        busy_top().save(self.path)
+
+    def tearDown(self):
+        """Remove the files"""
+        self.patcher.stop()
+        self.temp_dir.cleanup()
+
+    def test_box_queries_match_pixels(self):
+        """Test that box sums match the pixels for boxes on map cells"""
+        img = Image.radial_gradient('L').resize((200, 120)).convert('RGB')
+        maps = ImageMaps.from_image(img)
+        for box in [(0, 0, 200, 120), (13, 7, 50, 31), (150, 100, 50, 20)]:
+            self.assertAlmostEqual(maps.mean_luminance(box, img.size), get_average_luminance(img, box), places=6)
+
+        # A scaled copy of the image asks for the same area
+        self.assertAlmostEqual(maps.mean_luminance((26, 14, 100, 62), (400, 240)),
+                               maps.mean_luminance((13, 7, 50, 31), (200, 120)))
+
+    def test_quietest_band(self):
+        """Test that the plain half is picked over the busy half"""
+        maps = ImageMaps.from_image(busy_top())
+        self.assertGreater(maps.edge_density((0, 0, 240, 60), (240, 160)), 0.1)
+        self.assertEqual(maps.edge_density((10, 100, 220, 40), (240, 160)), 0.0)
+        self.assertEqual(maps.quietest_band((240, 160), 40), 'bottom')
+        self.assertEqual(ImageMaps.from_image(busy_top().rotate(180)).quietest_band((240, 160), 40), 'top')
+
+    def test_maps_built_once_and_rebuilt_when_stale(self):
+        """Test that maps are saved, reused, and rebuilt after the template changes"""
+        cache = TemplateMapCache()
+        first = cache.get(self.path)
+        self.assertTrue(os.path.exists(maps_path(self.path)))
+
+        fresh = TemplateMapCache()
+        with patch.object(template_maps, 'generate_template_maps') as generate:
+            loaded = fresh.get(self.path)
+            generate.assert_not_called()
+        self.assertTrue(np.array_equal(loaded.luma, first.luma))
+        self.assertIs(fresh.get(self.path), loaded)
+        self.assertEqual(fresh.stats()['hits'], 1)
+
+        Image.new('RGB', (240, 160), (250, 250, 250)).save(self.path)
+        os.utime(self.path, (os.path.getmtime(maps_path(self.path)) + 5,) * 2)
+        self.assertGreater(fresh.get(self.path).mean_luminance((0, 0, 240, 160), (240, 160)), 240)
+
+    def test_auto_place_uses_quiet_band(self):
+        """Test that a lone caption goes to the less busy band"""
+        plain = np.asarray(busy_top(), dtype=int)
+        job = build_render_job(self.path, top_text='HELLO', output_format='PNG', layers=[], auto_place=True)
+        with Image.open(io.BytesIO(render_job(job)['data'])) as im:
+            drawn = np.asarray(im.convert('RGB'), dtype=int)
+
+        rows = np.argwhere(np.any(drawn != plain, axis=(1, 2)))
+        self.assertGreater(len(rows), 0)
+        self.assertGreaterEqual(rows.min(), 80)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests for the template name index used by autocomplete.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes.template_search import TemplateNameIndex
+
+TEMPLATES = [
+    {'id': 1, 'name': 'Drake Hotline Bling', 'usage_count': 5},
+    {'id': 2, 'name': 'Distracted Boyfriend', 'usage_count': 40},
+    {'id': 3, 'name': 'Hotline Drake', 'usage_count': 50},
+    {'id': 4, 'name': 'Drakeposting', 'usage_count': 1},
+    {'id': 5, 'name': 'Two Buttons', 'usage_count': 12},
+]
+
+def names(results):
+    return [t['name'] for t in results]
+
+class TestTemplateSearch(unittest.TestCase):
+    """Test cases for prefix, word and trigram matches and their ranking"""
+
+    def setUp(self):
+        """Load the index"""
+        self.index = TemplateNameIndex()
+        self.index.load(TEMPLATES)
+
+    def test_prefix_ranking(self):
+        """Test that name prefixes beat word prefixes and usage breaks ties"""
+        self.assertEqual(names(self.index.search('drake')),
+                         ['Drake Hotline Bling', 'Drakeposting', 'Hotline Drake'])
+        self.assertEqual(names(self.index.search('  HOTLINE ')), ['Hotline Drake', 'Drake Hotline Bling'])
+        self.assertEqual(names(self.index.search('', limit=2)), ['Hotline Drake', 'Distracted Boyfriend'])
+        self.assertEqual(self.index.search('d', limit=1)[0], {'id': 2, 'name': 'Distracted Boyfriend',
+                                                              'usage_count': 40})
+
+    def test_trigram_fallback(self):
+        """Test that typos and mid-word fragments still find a template"""
+        self.assertEqual(names(self.index.search('boyfirend')), ['Distracted Boyfriend'])
+        self.assertEqual(names(self.index.search('uttons')), ['Two Buttons'])
+        self.assertEqual(self.index.search('zzzz'), [])
+
+    def test_updates(self):
+        """Test that inserts, deletes and uses are reflected immediately"""
+        self.index.add(6, 'Drake Meme')
+        self.assertIn('Drake Meme', names(self.index.search('drake m')))
+
+        self.index.remove(1)
+        self.assertEqual(names(self.index.search('drake')), ['Drakeposting', 'Drake Meme', 'Hotline Drake'])
+        self.assertNotIn('Drake Hotline Bling', names(self.index.search('drake hot')))
+        self.assertNotIn('Drake Hotline Bling', names(self.index.search('bling')))
+
+        for _ in range(3):
+            self.index.record_use(6)
+        self.assertEqual(names(self.index.search('drake'))[0], 'Drake Meme')
+
+        # Removing everything leaves an empty trie
+        for template_id in (2, 3, 4, 5, 6):
+            self.index.remove(template_id)
+        self.assertEqual(self.index._root, [{}, set()])
+        self.assertEqual(self.index._trigrams, {})
+
+if __name__ == "__main__":
+    unittest.main()
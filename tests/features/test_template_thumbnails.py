@@ -0,0 +1,122 @@
+"""
+Tests for template thumbnails and contact sheets.
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import unittest
+from unittest.mock import patch
+from PIL import Image
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes import template_thumbnails
+from bot.features.memes.template_thumbnails import (
+    generate_thumbnails, get_thumbnail, sheet_page, render_contact_sheet, ContactSheetCache,
+    THUMBNAIL_SIZES, SHEET_COLUMNS, SHEET_CELL, SHEET_LABEL_HEIGHT, SHEET_PADDING
+)
+
+class TestTemplateThumbnails(unittest.TestCase):
+    """Test cases for the thumbnail pyramid and contact sheets"""
+
+    def setUp(self):
+        """Create templates and a temporary thumbnail directory"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = patch.object(template_thumbnails, 'THUMBNAIL_DIR', os.path.join(self.temp_dir.name, 'thumbs'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.templates = []
+        for i in range(5):
+            path = os.path.join(self.temp_dir.name, f'template_{i}.png')
+            Image.new('RGB', (1200, 600), (40 * i, 100, 200)).save(path)
+            self.templates.append({'id': i + 1, 'name': f'template {i}', 'file_path': path})
+
+    def tearDown(self):
+        """Remove the temporary files"""
+        self.temp_dir.cleanup()
+
+    def test_pyramid_sizes(self):
+        """Test that every level fits its size and keeps the aspect ratio"""
+        paths = generate_thumbnails(1, self.templates[0]['file_path'])
+
+        self.assertEqual(sorted(paths), sorted(THUMBNAIL_SIZES))
+        for size, path in paths.items():
+            with Image.open(path) as thumb:
+                self.assertEqual(thumb.size, (size, size // 2))
+
+    def test_thumbnail_built_lazily_and_refreshed(self):
+        """Test that a missing or stale thumbnail is regenerated"""
+        template = self.templates[0]
+        path = get_thumbnail(template, 128)
+        self.assertTrue(os.path.exists(path))
+
+        # Replace the template with a newer, square image
+        later = os.path.getmtime(path) + 10
+        Image.new('RGB', (300, 300)).save(template['file_path'])
+        os.utime(template['file_path'], (later, later))
+        with Image.open(get_thumbnail(template, 128)) as thumb:
+            self.assertEqual(thumb.size, (128, 128))
+
+    def test_missing_template(self):
+        """Test that a missing template file gives no thumbnail"""
+        template = {'id': 99, 'name': 'gone', 'file_path': os.path.join(self.temp_dir.name, 'gone.png')}
+        self.assertIsNone(get_thumbnail(template))
+
+    def test_sheet_page_clamps(self):
+        """Test that out-of-range pages are clamped"""
+        page_templates, page, max_pages = sheet_page(self.templates, 9, per_page=2)
+        self.assertEqual((page, max_pages), (3, 3))
+        self.assertEqual([t['id'] for t in page_templates], [5])
+        self.assertEqual(sheet_page([], 0, per_page=2)[1:], (1, 1))
+
+    def test_contact_sheet_layout(self):
+        """Test the size of a rendered sheet"""
+        sheet = Image.open(io.BytesIO(render_contact_sheet(self.templates)))
+        rows = (len(self.templates) + SHEET_COLUMNS - 1) // SHEET_COLUMNS
+        self.assertEqual(sheet.size, (
+            SHEET_COLUMNS * (SHEET_CELL + SHEET_PADDING) + SHEET_PADDING,
+            rows * (SHEET_CELL + SHEET_LABEL_HEIGHT + SHEET_PADDING) + SHEET_PADDING
+        ))
+
+    def test_sheet_cache(self):
+        """Test that sheets are rendered once and keys follow the templates"""
+        cache = ContactSheetCache(max_sheets=2)
+        key = cache.make_key(self.templates[:3])
+        first = cache.get_sheet(key, self.templates[:3])
+        second = cache.get_sheet(key, self.templates[:3])
+
+        self.assertIs(first, second)
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 1))
+        self.assertNotEqual(cache.make_key(self.templates[1:4]), key)
+
+    def test_expired_sheet_url_is_not_reused(self):
+        """Test that uploaded sheet URLs are dropped before they expire"""
+        cache = ContactSheetCache()
+        fresh = f'https://cdn.discordapp.com/attachments/1/2/a.jpg?ex={int(time.time()) + 86400:x}'
+        stale = f'https://cdn.discordapp.com/attachments/1/2/b.jpg?ex={int(time.time()) + 60:x}'
+        cache.put_url('a', fresh)
+        cache.put_url('b', stale)
+
+        self.assertEqual(cache.get_url('a'), fresh)
+        self.assertIsNone(cache.get_url('b'))
+
+    def test_sheet_urls_are_capped(self):
+        """Test that the least recently used sheet URLs are dropped past the cap"""
+        cache = ContactSheetCache(max_urls=2)
+        url = f'https://cdn.discordapp.com/attachments/1/2/a.jpg?ex={int(time.time()) + 86400:x}'
+        cache.put_url('a', url)
+        cache.put_url('b', url)
+        cache.get_url('a')
+        cache.put_url('c', url)
+
+        self.assertEqual(cache.stats()['urls'], 2)
+        self.assertEqual(cache.get_url('a'), url)
+        self.assertIsNone(cache.get_url('b'))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+Tests for video captions.
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+from fractions import Fraction
+from unittest.mock import patch
+from PIL import Image
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from bot.features.memes import video
+from bot.features.memes.animation import caption_pieces
+from bot.features.memes.video import (
+    VideoError, check_source, output_geometry, video_bitrate, composite_captions,
+    decoder_command, encoder_command, build_video_job, render_video_job
+)
+
+class TestVideo(unittest.TestCase):
+    """Test cases for the video caption pipeline"""
+
+    def test_only_allowed_hosts(self):
+        """Test that only HTTPS links on allowed hosts are fetched"""
+        check_source('https://v.redd.it/abc123/DASH_720.mp4?source=fallback')
+        for url in ('http://v.redd.it/abc/DASH_720.mp4', 'https://example.com/a.mp4',
+                    'file:///etc/passwd', 'concat:a.mp4|b.mp4'):
+            with self.assertRaises(VideoError):
+                check_source(url)
+
+    def test_geometry_caps(self):
+        """Test that large, fast clips are scaled to the caps with even sizes"""
+        width, height, fps = output_geometry(1921, 1081, Fraction(60))
+        self.assertLessEqual(max(width, height), video.VIDEO_MAX_DIMENSION)
+        self.assertEqual((width % 2, height % 2), (0, 0))
+        self.assertEqual(fps, Fraction(video.VIDEO_MAX_FPS))
+        self.assertEqual(output_geometry(320, 240, Fraction(24000, 1001)), (320, 240, Fraction(24000, 1001)))
+
+    def test_bitrate_fits_budget(self):
+        """Test that the bitrate leaves room for audio within the byte budget"""
+        kbps = video_bitrate(30, 8 * 1024 * 1024, has_audio=True)
+        self.assertLessEqual((kbps + video.AUDIO_KBPS) * 30 * 1000 / 8, 8 * 1024 * 1024)
+        self.assertEqual(video_bitrate(600, 1024, has_audio=False), video.MIN_VIDEO_KBPS)
+
+    def test_commands_use_pipes_and_copy_audio(self):
+        """Test that frames go through pipes and audio is not re-encoded"""
+        decoder = decoder_command('https://v.redd.it/a/DASH_720.mp4', 640, 360, Fraction(30), 12.5)
+        encoder = encoder_command('https://v.redd.it/a/DASH_720.mp4', '/tmp/out.mp4', 640, 360,
+                                  Fraction(30), 12.5, 1500, audio=True)
+
+        self.assertEqual(decoder[-1], 'pipe:1')
+        self.assertIn('scale=640:360:flags=bicubic,fps=30', decoder)
+        self.assertIn('12.500', decoder)
+        self.assertIn('pipe:0', encoder)
+        self.assertEqual(encoder[encoder.index('-c:a') + 1], 'copy')
+        self.assertNotIn('1:a:0', encoder_command('u', 'o.mp4', 2, 2, Fraction(30), 1, 100, audio=False))
+
+    def test_composite_matches_full_frame_paste(self):
+        """Test that pasting caption bands into raw bytes matches pasting on the image"""
+        frame = Image.radial_gradient('L').convert('RGB').resize((200, 150))
+        pieces = caption_pieces({'top_text': 'top', 'bottom_text': 'bottom'}, frame)
+        expected = frame.copy()
+        for piece, box in pieces:
+            expected.paste(piece, box[:2], piece)
+
+        raw = bytearray(frame.tobytes())
+        composite_captions(raw, frame.width, pieces)
+        self.assertEqual(bytes(raw), expected.tobytes())
+
+    def test_missing_ffmpeg(self):
+        """Test that a missing ffmpeg is reported, not crashed on"""
+        with patch.object(video.shutil, 'which', return_value=None):
+            with self.assertRaises(VideoError):
+                render_video_job(build_video_job('https://v.redd.it/a/DASH_720.mp4', top_text='hi'))
+
+    @unittest.skipUnless(shutil.which('ffmpeg') and shutil.which('ffprobe'), "ffmpeg is not installed")
+    def test_caption_clip(self):
+        """Test captioning a generated clip end to end"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, 'clip.mp4')
+            subprocess.run([
+                'ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc=size=320x240:rate=25:duration=2',
+                '-f', 'lavfi', '-i', 'sine=duration=2', '-shortest', '-c:a', 'aac', source
+            ], check=True)
+
+            with patch.object(video, 'check_source'), patch.object(video, 'PROTOCOLS', 'file'):
+                result = render_video_job(build_video_job(source, top_text='HELLO'))
+
+            self.assertEqual(result['frames'], 50)
+            self.assertEqual(result['size'], (320, 240))
+            self.assertGreater(result['fps'], 0)
+            self.assertEqual(os.listdir(temp_dir), ['clip.mp4'])
+
+if __name__ == "__main__":
+    unittest.main()
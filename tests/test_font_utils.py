@@ -0,0 +1,56 @@
+"""
+Tests for the font registry and best-fit font sizing.
+"""
+
+import os
+import sys
+import unittest
+from PIL import Image, ImageDraw, ImageFont
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from bot.utils.font_utils import FontRegistry, get_best_fit_font
+
+def linear_best_fit_size(text, max_width, max_height, start_size=48, min_size=10):
+    """Reference linear search over Pillow's bundled font"""
+    draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+    for size in range(start_size, min_size - 1, -2):
+        font = ImageFont.load_default(size=size)
+        lines = text.split('\n')
+        boxes = [draw.textbbox((0, 0), line, font=font) for line in lines if line]
+        width = max([b[2] - b[0] for b in boxes] + [0])
+        height = sum(b[3] - b[1] for b in boxes) + size * lines.count('')
+        if width <= max_width and height <= max_height:
+            return size
+    return min_size
+
+class TestFontRegistry(unittest.TestCase):
+    """Test cases for the FontRegistry class"""
+
+    def test_fonts_are_cached_per_size(self):
+        """Test that a (face, size) pair is only loaded once"""
+        registry = FontRegistry()
+        first = registry.get_font('no-such-face.ttf', 20)
+        second = registry.get_font('no-such-face.ttf', 20)
+        registry.get_font('no-such-face.ttf', 22)
+
+        self.assertIs(first, second)
+        self.assertEqual(registry.stats()['loads'], 2)
+        self.assertEqual(registry.stats()['hits'], 1)
+
+    def test_best_fit_matches_linear_search(self):
+        """Test that the binary search picks the same size as the linear search"""
+        cases = [
+            ("me when", 580, 120),
+            ("when the code compiles on the first try", 300, 80),
+            ("nobody:\n\nme at 3am", 400, 200),
+            ("WWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWWW", 100, 50),
+        ]
+        for text, w, h in cases:
+            with self.subTest(text=text):
+                font = get_best_fit_font(text, 'no-such-face.ttf', w, h)
+                self.assertEqual(font.size, linear_best_fit_size(text, w, h))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for the reduced-resolution image loader.
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+from PIL import Image
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from bot.utils.image_loader import load_image, get_image_size, ImageTooLargeError
+
+class TestImageLoader(unittest.TestCase):
+    """Test cases for load_image and get_image_size"""
+
+    def setUp(self):
+        """Create a large JPEG and a small PNG"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.jpeg_path = os.path.join(self.temp_dir.name, 'big.jpg')
+        self.png_path = os.path.join(self.temp_dir.name, 'small.png')
+        Image.linear_gradient('L').resize((3000, 2000)).convert('RGB').save(self.jpeg_path)
+        Image.new('RGBA', (300, 200), (10, 20, 30, 128)).save(self.png_path)
+
+    def tearDown(self):
+        """Remove the images"""
+        self.temp_dir.cleanup()
+
+    def test_large_image_is_fit_to_box(self):
+        """Test that a large JPEG is decoded at the target size"""
+        img = load_image(self.jpeg_path, max_size=(800, 800))
+        self.assertEqual(img.size, (800, 533))
+        self.assertEqual(img.mode, 'RGB')
+
+    def test_small_image_is_untouched(self):
+        """Test that images inside the box keep their size and get the requested mode"""
+        img = load_image(self.png_path, mode='RGBA')
+        self.assertEqual(img.size, (300, 200))
+        self.assertEqual(img.getpixel((0, 0)), (10, 20, 30, 128))
+
+    def test_loads_from_bytes(self):
+        """Test decoding from an in-memory buffer"""
+        with open(self.png_path, 'rb') as f:
+            img = load_image(f.read(), max_size=(150, 150))
+        self.assertEqual(img.size, (150, 100))
+
+    def test_pixel_ceiling(self):
+        """Test that oversized images are rejected from the header"""
+        self.assertEqual(get_image_size(self.jpeg_path), (3000, 2000))
+        with self.assertRaises(ImageTooLargeError):
+            load_image(self.jpeg_path, max_pixels=1_000_000)
+
+    def test_byte_ceiling(self):
+        """Test that oversized files are rejected before decoding"""
+        with self.assertRaises(ImageTooLargeError):
+            get_image_size(self.jpeg_path, max_bytes=100)
+
+    def test_file_is_closed(self):
+        """Test that files are closed on return and the image stays usable"""
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', ResourceWarning)
+            images = [load_image(self.png_path), load_image(self.jpeg_path, max_size=(100, 100))]
+            gc.collect()
+
+        self.assertFalse([w for w in caught if issubclass(w.category, ResourceWarning)])
+        for img in images:
+            self.assertEqual(len(img.tobytes()), img.width * img.height * 3)
+
+if __name__ == "__main__":
+    unittest.main()
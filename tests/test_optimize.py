@@ -0,0 +1,82 @@
+"""
+Tests for the adaptive output encoder.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from bot.utils.optimize import encode_image, choose_format, optimize_image, MAX_QUALITY
+
+def photo_image(width=400, height=300):
+    """A smooth gradient with grain, like a photo"""
+    rng = np.random.default_rng(1)
+    x = np.linspace(0, 200, width)[None, :, None]
+    y = np.linspace(0, 50, height)[:, None, None]
+    data = x + y + rng.normal(0, 12, (height, width, 3))
+    return Image.fromarray(np.clip(data, 0, 255).astype(np.uint8))
+
+def flat_image(width=400, height=300):
+    """A few solid shapes, like a drawn comic"""
+    img = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((20, 20, 200, 150), fill=(220, 40, 40))
+    draw.ellipse((180, 100, 380, 280), fill=(30, 60, 200))
+    return img
+
+class TestEncoder(unittest.TestCase):
+    """Test cases for encode_image"""
+
+    def test_format_follows_content(self):
+        """Test that flat artwork and photos get different formats"""
+        self.assertEqual(choose_format(flat_image()), 'PNG')
+        self.assertEqual(choose_format(photo_image()), 'JPEG')
+
+    def test_flat_image_is_lossless(self):
+        """Test that palette-sized images round-trip exactly"""
+        img = flat_image()
+        result = encode_image(img, report_savings=True)
+        decoded = Image.open(io.BytesIO(result['data'])).convert('RGB')
+
+        self.assertEqual(result['extension'], 'png')
+        self.assertEqual(decoded.tobytes(), img.tobytes())
+        self.assertLess(result['bytes'], result['baseline_bytes'])
+
+    def test_quality_search_meets_budget(self):
+        """Test that quality is lowered, not the size, when that is enough"""
+        img = photo_image()
+        full = encode_image(img)
+        budget = int(full['bytes'] * 0.7)
+        result = encode_image(img, max_bytes=budget)
+
+        self.assertLessEqual(result['bytes'], budget)
+        self.assertLess(result['quality'], MAX_QUALITY)
+        self.assertEqual(result['size'], img.size)
+
+    def test_downsizes_only_when_needed(self):
+        """Test that a tiny budget shrinks the image"""
+        img = photo_image()
+        result = encode_image(img, max_bytes=3000)
+
+        self.assertLessEqual(result['bytes'], 3000)
+        self.assertLess(result['size'][0], img.width)
+        self.assertEqual(Image.open(io.BytesIO(result['data'])).size, result['size'])
+
+    def test_optimize_image(self):
+        """Test the file-based helper"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, 'in.png')
+            target = os.path.join(temp_dir, 'out.jpg')
+            photo_image(1600, 1200).save(source)
+            optimize_image(source, target)
+            self.assertEqual(Image.open(target).size, (1024, 768))
+
+if __name__ == "__main__":
+    unittest.main()
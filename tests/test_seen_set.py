@@ -0,0 +1,134 @@
+"""
+Tests for seen-post sets and their storage.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from bot.utils import autopost_store
+from bot.utils.seen_set import SeenSet, post_id_to_int, int_to_post_id
+
+class TestSeenSet(unittest.TestCase):
+    """Test cases for the ring, the Bloom filter and unsaved IDs"""
+
+    def test_ids_round_trip(self):
+        """Test that base-36 post IDs decode to ints and back"""
+        for post_id in ('0', 'abc123', '1kz9qx', 'zzzzzzz'):
+            self.assertEqual(int_to_post_id(post_id_to_int(post_id)), post_id)
+        self.assertEqual(post_id_to_int('t3_abc123'), post_id_to_int('abc123'))
+        self.assertLess(post_id_to_int('not-base36!'), 0)
+
+    def test_ring_evicts_oldest(self):
+        """Test that a full ring forgets its oldest IDs"""
+        seen = SeenSet(capacity=3, bloom_bits=0)
+        for post_id in ('a1', 'a2', 'a3', 'a4'):
+            seen.add(post_id)
+        seen.add('a4')
+        self.assertEqual(list(seen), ['a2', 'a3', 'a4'])
+        self.assertEqual(len(seen), 3)
+        self.assertNotIn('a1', seen)
+        self.assertIn('a4', seen)
+        self.assertNotIn(None, seen)
+
+    def test_bloom_remembers_evicted(self):
+        """Test that the Bloom filter still recognizes IDs that left the ring"""
+        seen = SeenSet(capacity=10, bloom_bits=1 << 16)
+        for value in range(1000):
+            seen.add(int_to_post_id(value + 50000))
+        self.assertEqual(len(seen), 10)
+        self.assertTrue(all(int_to_post_id(value + 50000) in seen for value in range(1000)))
+        false_positives = sum(int_to_post_id(value + 900000) in seen for value in range(1000))
+        self.assertLess(false_positives, 20)
+
+    def test_unsaved(self):
+        """Test that only IDs added since the last save are reported"""
+        seen = SeenSet(['a1', 'a2'], capacity=10, bloom_bits=0)
+        self.assertEqual(seen.unsaved(), [])
+        seen.add('a3')
+        seen.add('a1')
+        self.assertEqual(seen.unsaved(), ['a3'])
+        seen.add('a4')
+        seen.mark_saved(1)
+        self.assertEqual(seen.unsaved(), ['a4'])
+
+class TestSeenPostStorage(unittest.TestCase):
+    """Test cases for loading, saving and compacting seen posts"""
+
+    def setUp(self):
+        """Point the store at a temporary database"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'autopost.db')
+        self.patchers = [
+            patch.object(autopost_store, 'DB_PATH', self.db_path),
+            patch.object(autopost_store, 'SEEN_POSTS_CAPACITY', 3),
+            patch.object(autopost_store, 'SEEN_POSTS_BLOOM_BITS', 0),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    def tearDown(self):
+        """Remove the database"""
+        for patcher in self.patchers:
+            patcher.stop()
+        self.temp_dir.cleanup()
+
+    def rows(self):
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT guild_id, subreddit, post_id FROM seen_posts ORDER BY seen_at, rowid").fetchall()
+        conn.close()
+        return rows
+
+    def test_save_load_and_compact(self):
+        """Test that saves write only new IDs and loads keep the newest"""
+        autopost_store._ensure_tables()
+        autopost_store.add_subreddit(1, 'memes', 10)
+        autopost_store.add_subreddit(2, 'memes', 20)
+
+        store = autopost_store.load_store()
+        for post_id in ('a1', 'a2', 'a3', 'a4'):
+            store['1']['memes']['seen_ids'].add(post_id)
+        store['2']['memes']['seen_ids'].add('b1')
+        autopost_store.save_store(store)
+        self.assertEqual(store['1']['memes']['seen_ids'].unsaved(), [])
+        self.assertEqual(len(self.rows()), 5)
+
+        # Saving again writes nothing new
+        with patch.object(autopost_store.time, 'time', return_value=time.time() + 10):
+            autopost_store.save_store(store)
+        self.assertEqual(len(self.rows()), 5)
+
+        loaded = autopost_store.load_store()
+        self.assertEqual(list(loaded['1']['memes']['seen_ids']), ['a2', 'a3', 'a4'])
+        self.assertEqual(list(loaded['2']['memes']['seen_ids']), ['b1'])
+
+        # Rows past the capacity are dropped, then everything once it is older than the retention
+        self.assertEqual(autopost_store.compact_seen_posts(), 1)
+        self.assertNotIn(('1', 'memes', 'a1'), self.rows())
+        with patch.object(autopost_store.time, 'time', return_value=time.time() + 31 * 86400):
+            self.assertEqual(autopost_store.compact_seen_posts(retention_days=30), 4)
+        self.assertEqual(self.rows(), [])
+
+    def test_migration(self):
+        """Test that an old seen_posts table gets a seen_at column"""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE seen_posts (guild_id TEXT NOT NULL, subreddit TEXT NOT NULL, "
+                     "post_id TEXT NOT NULL, PRIMARY KEY (guild_id, subreddit, post_id))")
+        conn.execute("INSERT INTO seen_posts VALUES ('1', 'memes', 'old1')")
+        conn.commit()
+        conn.close()
+
+        autopost_store._ensure_tables()
+        autopost_store.add_subreddit(1, 'memes', 10)
+        self.assertEqual(list(autopost_store.load_store()['1']['memes']['seen_ids']), ['old1'])
+        self.assertEqual(autopost_store.compact_seen_posts(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
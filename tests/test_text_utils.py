@@ -0,0 +1,68 @@
+"""
+Tests for caption line breaking and layout memoization.
+"""
+
+import os
+import sys
+import unittest
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the path so we can import the bot modules
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from bot.utils.font_utils import get_font
+from bot.utils.text_utils import (
+    break_lines, layout_text, layout_cache, draw_wrapped_text, draw_caption
+)
+
+class TestTextLayout(unittest.TestCase):
+    """Test cases for the text layout engine"""
+
+    def setUp(self):
+        """Load a font"""
+        self.font = get_font(None, 32)
+
+    def test_lines_fit_width(self):
+        """Test that every line fits the box in measured pixels"""
+        text = "when the code compiles on the first try but the tests still fail"
+        for width in (120, 250, 400):
+            with self.subTest(width=width):
+                lines = break_lines(text, self.font, width)
+                self.assertEqual(''.join(lines).replace(' ', ''), text.replace(' ', ''))
+                for line in lines:
+                    self.assertLessEqual(self.font.getlength(line), width)
+
+    def test_long_word_is_split(self):
+        """Test that a word wider than the box is split between characters"""
+        lines = break_lines("a" * 60, self.font, 100)
+        self.assertGreater(len(lines), 1)
+        self.assertEqual(''.join(lines), "a" * 60)
+        for line in lines:
+            self.assertLessEqual(self.font.getlength(line), 100)
+
+    def test_layout_is_memoized(self):
+        """Test that the same caption and box size reuse one layout"""
+        first = layout_text("me when unique caption 1", self.font, (0, 0, 300, 100))
+        hits = layout_cache.stats()['hits']
+        second = layout_text("me when unique caption 1", self.font, (50, 80, 300, 100))
+
+        self.assertIs(first, second)
+        self.assertEqual(layout_cache.stats()['hits'], hits + 1)
+        self.assertEqual(len(first['lines']), len(first['positions']))
+
+    def test_draw_wrapped_text_returns_bottom(self):
+        """Test that drawing returns the y position after the last line"""
+        img = Image.new('RGB', (300, 200))
+        box = (10, 20, 280, 150)
+        bottom = draw_wrapped_text(ImageDraw.Draw(img), "me when", self.font, box, (255, 255, 255))
+
+        self.assertEqual(bottom, 20 + layout_text("me when", self.font, box)['height'])
+        self.assertIsNotNone(img.getbbox())
+
+    def test_draw_caption_bottom(self):
+        """Test that a bottom caption is drawn in the lower part of the image"""
+        img = draw_caption(Image.new('RGB', (300, 300)), "bottom text", position='bottom')
+        self.assertGreater(img.getbbox()[1], 150)
+
+if __name__ == "__main__":
+    unittest.main()